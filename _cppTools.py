@@ -5,6 +5,9 @@ import typing
 import regex as re
 from paths import FileLocation
 from paths.urlTyping import UrlCompatible, asURL
+from .stdio import decodeCEscapeSequences
+from .instrumentation import instrumented, registry
+from .lruCache import LruCache
 
 
 _multiLineCommentRe=r"""(?:/[*](?P<multiLineComment>.*?)[*]/)"""
@@ -23,6 +26,7 @@ def cppSeparateComments(code:str)->typing.Generator[str,None,None]:
             comment=m.group('singleLineComment')
         if comment is not None:
             yield comment
+@instrumented('_cppTools.cppRemoveComments',sizeArg=0)
 def cppRemoveComments(code:str)->str:
     """
     Removes all comments from a block of code
@@ -34,104 +38,316 @@ def cppRemoveComments(code:str)->str:
             ret.append(txt)
     return ''.join(ret)
 
-def cppValue2PyValue(code:str)->str:
+_intSuffixRe=r"""(?:[uU](?:ll|LL|[lLzZ])?|(?:ll|LL|[lLzZ])[uU]?)?"""
+_literalRe=re.compile(r"""\s*(?:
+    (?P<hexFloat>[+-]?0[xX](?:[0-9a-fA-F']*[.][0-9a-fA-F']*|[0-9a-fA-F']+)[pP][+-]?[0-9]+)[fFlL]?
+    |(?P<hex>[+-]?0[xX][0-9a-fA-F']+)"""+_intSuffixRe+r"""
+    |(?P<bin>[+-]?0[bB][01']+)"""+_intSuffixRe+r"""
+    |(?P<float>[+-]?(?:
+        (?:[0-9][0-9']*[.][0-9']*|[.][0-9][0-9']*)(?:[eE][+-]?[0-9]+)?
+        |[0-9][0-9']*[eE][+-]?[0-9]+))[fFlL]?
+    |(?P<oct>[+-]?0[0-7']*)"""+_intSuffixRe+r"""
+    |(?P<dec>[+-]?[1-9][0-9']*)"""+_intSuffixRe+r"""
+    |(?P<decFloat>[+-]?[0-9]+)[fF]
+    |(?P<special>[+-]?(?:inf|INF|Inf|nan|NAN|NaN)(?:[(]0x[0-9a-fA-F]+[)])?)
+    |(?:u8|[uUL])?'(?P<char>(?:[^'\\]|\\.)*)'
+    |(?:u8|[uUL])?"(?P<string>(?:[^"\\]|\\.)*)"
+    |(?P<keyword>true|false|TRUE|FALSE|True|False|NULL|null|nullptr)
+    )\s*""",re.VERBOSE|re.DOTALL)
+_keywordValues:typing.Dict[str,typing.Any]={
+    'true':True,'TRUE':True,'True':True,
+    'false':False,'FALSE':False,'False':False,
+    'NULL':None,'null':None,'nullptr':None}
+
+def _literalMatch2PyValue(m:typing.Any)->typing.Any:
+    """
+    Convert a match from _literalRe into a python value
+    """
+    kind=m.lastgroup
+    v=m.group(kind)
+    if kind=='dec':
+        return int(v.replace("'",''))
+    if kind=='hex':
+        return int(v.replace("'",''),16)
+    if kind=='oct':
+        return int(v.replace("'",''),8)
+    if kind=='bin':
+        return int(v.replace("'",''),2)
+    if kind in ('float','decFloat','special'):
+        return float(v.replace("'",'').split('(',1)[0])
+    if kind=='hexFloat':
+        return float.fromhex(v.replace("'",''))
+    if kind in ('char','string'):
+        return decodeCEscapeSequences(v)
+    return _keywordValues[v]
+
+@instrumented('_cppTools.cppValue2PyValue',sizeArg=0)
+def cppValue2PyValue(code:str)->typing.Any:
     """
     Attempt to convert the value of a cpp variable (eg, as found in a debugger)
     into a first-class python value.
+
+    Understands all c/c++ literals:
+        integers (decimal, hex, octal, binary, with any suffix)
+        floats (decimal and hex, with any suffix)
+        char and string literals (with escapes and encoding prefixes)
+        true/false/NULL/nullptr
     """
-    v=code.strip()
-    if v[0] in ('\'','"'):
-        vv:typing.Any=v[1:-1]
-    else:
-        vv=v.lower()
-        if vv=='null':
-            vv=None
-        elif vv=='true':
-            vv=True
-        elif vv=='false':
-            vv=False
-        elif vv.startswith('0x'):
-            raise NotImplementedError('hex')
-        elif vv.startswith('0'):
-            raise NotImplementedError('octal')
-        elif vv.isnumeric():
-            vv=int(vv)
-        else:
-            if vv.endswith('f'):
-                vv=v[0:-1]
-            try:
-                vv=float(vv)
-            except ValueError as e:
-                raise ValueError(f'Unknown python data type for "{v}"') from e # noqa: E501 # pylint: disable=line-too-long
-    return vv
+    m=_literalRe.fullmatch(code)
+    if m is None:
+        raise ValueError(f'Unknown python data type for "{code.strip()}"')
+    return _literalMatch2PyValue(m)
+
+@instrumented('_cppTools.cppValues2PyValues')
+def cppValues2PyValues(codes:typing.Iterable[str]
+    )->typing.Generator[typing.Any,None,None]:
+    """
+    Same as cppValue2PyValue() but for a lot of values at once
+    (such as a whole debugger watch-window dump)
+    """
+    fullmatch=_literalRe.fullmatch
+    for code in codes:
+        m=fullmatch(code)
+        if m is None:
+            raise ValueError(f'Unknown python data type for "{code.strip()}"') # noqa: E501 # pylint: disable=line-too-long
+        yield _literalMatch2PyValue(m)
 
 _varnameRe=re.compile(r"""(?P<name>[A-Za-z_][A-Za-z0-9_]*)""")
-def cppIsLeagalVarName(varname:str)->bool:
+cppKeywords=frozenset((
+    # c
+    'auto','break','case','char','const','continue','default','do',
+    'double','else','enum','extern','float','for','goto','if','inline',
+    'int','long','register','restrict','return','short','signed','sizeof',
+    'static','struct','switch','typedef','union','unsigned','void',
+    'volatile','while','_Alignas','_Alignof','_Atomic','_Bool','_Complex',
+    '_Generic','_Imaginary','_Noreturn','_Static_assert','_Thread_local',
+    'alignas','alignof','bool','constexpr','false','nullptr',
+    'static_assert','thread_local','true','typeof','typeof_unqual',
+    # c++
+    'and','and_eq','asm','bitand','bitor','catch','char8_t','char16_t',
+    'char32_t','class','compl','concept','consteval','constinit',
+    'const_cast','co_await','co_return','co_yield','decltype','delete',
+    'dynamic_cast','explicit','export','friend','mutable','namespace',
+    'new','noexcept','not','not_eq','operator','or','or_eq','private',
+    'protected','public','reinterpret_cast','requires','static_cast',
+    'template','this','throw','try','typeid','typename','using',
+    'virtual','wchar_t','xor','xor_eq'))
+# everything that is not legal in a name becomes "_"
+_varnameTranslation={i:'_' for i in range(128)
+    if not (chr(i).isalnum() or chr(i)=='_')}
+_nonAsciiRe=re.compile(r"""[^\x00-\x7f]""")
+_reservedVarnameRe=re.compile(r"""_[A-Z_]""")
+
+def _isReservedVarName(varname:str)->bool:
+    """
+    obscure c rule that names beginning with _ are reserved
+    (here, those followed by a capital or a _, or without
+    any lowercase letters)
+    """
+    return varname[:1]=='_' and (varname==varname.upper() or
+        _reservedVarnameRe.match(varname) is not None)
+
+def cppIsLeagalVarName(varname:str,allowReserved:bool=True)->bool:
     """
     Check to see if a variable name is legal
+    (including that it is not a c/c++ keyword)
+
+    :allowReserved: whether names reserved for the implementation,
+        eg "_Foo", count as legal (cppMakeLegalVarName() and
+        cppMakeLegalVarNames() treat them as not legal)
     """
-    return _varnameRe.match(varname) is not None
+    return _varnameRe.fullmatch(varname) is not None \
+        and varname not in cppKeywords \
+        and (allowReserved or not _isReservedVarName(varname))
+
 def cppMakeLegalVarName(varname:str)->str:
     """
     Make a variable name legal
     """
-    varname=''.join([
-        (c if c.isalpha() or c.isdigit() else '_')
-        for c in varname.strip()])
+    varname=varname.strip().translate(_varnameTranslation)
+    if not varname.isascii():
+        varname=_nonAsciiRe.sub('_',varname)
     if not varname:
         varname='_'
     else:
         # can't start with a number
         if varname[0].isdigit():
             varname='number'+varname
-    # obscure c rule that #defines beginning with _ are reserved
-    if varname[0]=='_' and varname==varname.upper():
+    if _isReservedVarName(varname):
         varname='X'+varname
+    if varname in cppKeywords:
+        varname+='_'
     return varname
 
+def cppMakeLegalVarNames(varnames:typing.Iterable[str],
+    taken:typing.Optional[typing.Iterable[str]]=None
+    )->typing.Dict[str,str]:
+    """
+    Make a whole batch of variable names legal, and unique, eg
+        ["foo-bar","foo_bar","int"]
+        returns
+        {"foo-bar":"foo_bar_2","foo_bar":"foo_bar","int":"int_"}
+
+    Names that are already legal are never changed, any others
+    that collide get a suffix "_2","_3",etc in the order given,
+    so the result is always the same for the same input and
+    can be reversed with {v:k for k,v in result.items()}
+
+    NOTE: names starting with "_" that are reserved (or have no
+        lowercase letters) do not count as legal, eg "_Foo"->"X_Foo"
+        (the same as cppIsLeagalVarName(varname,allowReserved=False))
+
+    :taken: names that are already in use and must be avoided
+    """
+    varnames=list(dict.fromkeys(varnames))
+    used:typing.Set[str]=set() if taken is None else set(taken)
+    ret:typing.Dict[str,str]={}
+    # reserve the names that are already legal first
+    for varname in varnames:
+        if varname not in used and cppIsLeagalVarName(varname,False):
+            ret[varname]=varname
+            used.add(varname)
+    nextSuffix:typing.Dict[str,int]={}
+    for varname in varnames:
+        if varname in ret:
+            continue
+        legal=cppMakeLegalVarName(varname)
+        if legal in used:
+            n=nextSuffix.get(legal,2)
+            while f'{legal}_{n}' in used:
+                n+=1
+            nextSuffix[legal]=n+1
+            legal=f'{legal}_{n}'
+        ret[varname]=legal
+        used.add(legal)
+    # keep the original order
+    return {varname:ret[varname] for varname in varnames}
+
 _declRe=r"""(?:(?P<type>[a-z_]+(\s*[*]+)?)?\s*"""+_varnameRe.pattern+')'
-_paramRe='(?P<param>'+_declRe+r"""(?:\s*=\s*(?P<default>[^\s\n$]))?)"""
+_paramRe='(?P<param>'+_declRe+r"""(?:\s*=\s*(?P<default>[^,]*[^\s,]))?)"""
 _paramsListRe=re.compile(r"(?:^\s*|\s*,\s*)"+_paramRe,re.DOTALL)
 _funcParseReStr=_declRe+r"?\s*[(]\s*(?P<params>[^)]*)\s*[)]"
 _funcParseRe=re.compile(_funcParseReStr,re.DOTALL)
-def cppFunctionInfo(functionDefinition:str
-    )->typing.Tuple[
-        str,
-        str,
-        typing.Dict[str,
-            typing.Union[typing.Tuple[str,typing.Any],typing.Tuple[str]]]]:
+class CppParameter(typing.NamedTuple):
+    """
+    A single function parameter
+    """
+    name:str
+    dataType:typing.Optional[str]
+    default:typing.Any=None
+    hasDefault:bool=False
+
+
+class CppFunctionInfo(typing.NamedTuple):
+    """
+    Information about a function, as returned by cppFunctionInfo()
+
+    (immutable, so the same one can be handed out from the cache)
+    """
+    returnType:str
+    name:str
+    parameters:typing.Tuple[CppParameter,...]
+
+    def parametersDict(self)->typing.Dict[str,
+            typing.Union[typing.Tuple[str,typing.Any],typing.Tuple[str]]]:
+        """
+        get the parameters as
+            {"a":("int",),"b":("float",10)}
+        """
+        ret:typing.Dict[str,
+            typing.Union[typing.Tuple[str,typing.Any],typing.Tuple[str]]]={}
+        for p in self.parameters:
+            if p.hasDefault:
+                ret[p.name]=(p.dataType,p.default) # type: ignore
+            else:
+                ret[p.name]=(p.dataType,) # type: ignore
+        return ret
+
+
+functionInfoCache:'LruCache[str,CppFunctionInfo]'=LruCache(
+    4096,'_cppTools.cppFunctionInfo')
+
+# whitespace between a word and punctuation, eg "myfunc( int a , float b )"
+# (but not between two punctuation marks, eg "> >" or "/ *")
+_punctuationSpaceRe=re.compile(r"""(?<=\w) (?=[^\w\s])|(?<=[^\w\s]) (?=\w)""")
+
+def _normalizeDeclaration(functionDefinition:str)->str:
+    """
+    normalize the whitespace in a declaration
+    to use as a cache key
+
+    eg "void   myfunc( int a , float b = 10 )"
+        -> "void myfunc(int a,float b=10)"
+    """
+    if '//' in functionDefinition or '"' in functionDefinition or \
+            "'" in functionDefinition:
+        # whitespace is significant
+        return functionDefinition.strip()
+    return _punctuationSpaceRe.sub('',' '.join(functionDefinition.split()))
+
+@instrumented('_cppTools.cppFunctionInfo',sizeArg=0)
+def cppFunctionInfo(functionDefinition:str,
+    defines:typing.Optional[typing.Any]=None
+    )->CppFunctionInfo:
     """
     given a funcion header like
         "void myfunc(int a,float b=10)"
         returns
-        {"a":("int"),"b":("float",10)}
-    returns (returnType,name,parameters{name:(datatype,default)})
+        CppFunctionInfo("void","myfunc",(
+            CppParameter("a","int"),
+            CppParameter("b","float",10,True)))
+
+    Results are cached (see functionInfoCache) so repeated
+    declarations are only parsed once
+
+    :defines: if specified, resolve #if/#ifdef regions using
+        this macro environment (eg, a CompileCommand)
+        (these are not cached, since the defines can change)
+    """
+    if defines is not None:
+        from .preprocessor import preprocessConditionals
+        return _parseFunctionInfo('\n'.join(
+            preprocessConditionals(functionDefinition,defines)))
+    # (parse the normalized text so every spelling that shares a
+    # cache entry gets the same result)
+    functionDefinition=_normalizeDeclaration(functionDefinition)
+    return functionInfoCache.getOrCompute(functionDefinition,
+        lambda:_parseFunctionInfo(cppRemoveComments(functionDefinition)))
+
+def _parseFunctionInfo(functionDefinition:str)->CppFunctionInfo:
+    """
+    the uncached part of cppFunctionInfo()
     """
     returnType=''
     name=''
-    parameters:typing.Dict[str,
-        typing.Union[typing.Tuple[str,typing.Any],typing.Tuple[str]]]={}
-    m=_funcParseRe.search(cppRemoveComments(functionDefinition))
+    parameters:typing.List[CppParameter]=[]
+    m=_funcParseRe.search(functionDefinition)
     if m.group('type') is not None:
         returnType=m.group('type')
     if m.group('name') is not None:
         name=m.group('name')
     if m.group('params') is not None:
         for mm in _paramsListRe.finditer(m.group('params')):
+            if registry.enabled:
+                registry.count('_cppTools.cppFunctionInfo','matches')
             if mm.group('default') is None:
-                parameters[mm.group('name')]=(mm.group('type'),)
+                parameters.append(CppParameter(mm.group('name'),
+                    mm.group('type')))
             else:
                 val=cppValue2PyValue(mm.group('default'))
-                parameters[mm.group('name')]=(mm.group('type'),val)
-    return (returnType,name,parameters)
+                parameters.append(CppParameter(mm.group('name'),
+                    mm.group('type'),val,True))
+    return CppFunctionInfo(returnType,name,tuple(parameters))
 
 def cppFunctionParameters(functionDefinition:str
     )->typing.Dict[str,
         typing.Union[typing.Tuple[str,typing.Any],typing.Tuple[str]]]:
     """
     Extract funtion parameters from a funtion definition
+
+    returns {name:(datatype,)} or {name:(datatype,default)}
     """
-    return cppFunctionInfo(functionDefinition)[2]
+    return cppFunctionInfo(functionDefinition).parametersDict()
 
 class CppScope:
     """
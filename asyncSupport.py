@@ -0,0 +1,93 @@
+"""
+Shared plumbing for the async variants of the blocking tools
+(aloadCEnums, afindHeader, CompileCommand.acompile, etc)
+
+Blocking work is run in a single shared thread pool and the number
+of operations in flight at once is bounded, so that one slow
+(eg, NFS-mounted) include directory or long compile cannot stall
+the event loop or starve everything else.
+"""
+import typing
+import asyncio
+import functools
+import threading
+import contextvars
+import contextlib
+import weakref
+import concurrent.futures
+
+
+T=typing.TypeVar('T')
+
+_lock=threading.Lock()
+_executor:typing.Optional[concurrent.futures.ThreadPoolExecutor]=None
+_concurrencyLimit=8
+# one semaphore per event loop, since they cannot be shared between loops
+_semaphores:'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop,asyncio.Semaphore]'=weakref.WeakKeyDictionary() # noqa: E501 # pylint: disable=line-too-long
+
+
+def sharedExecutor()->concurrent.futures.ThreadPoolExecutor:
+    """
+    get the thread pool that all blocking work is run in
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor=concurrent.futures.ThreadPoolExecutor(
+                _concurrencyLimit,thread_name_prefix='cppTools')
+        return _executor
+
+def setConcurrencyLimit(limit:int)->None:
+    """
+    set the maximum number of blocking operations
+    (file reads, directory scans, compiles) in flight at once
+
+    NOTE: applies to every event loop from the next slot acquired,
+        operations already in flight are allowed to finish
+    """
+    global _executor,_concurrencyLimit
+    if limit<1:
+        raise ValueError(f'Concurrency limit must be at least 1, not {limit}')
+    with _lock:
+        _concurrencyLimit=limit
+        old=_executor
+        _executor=None
+        _semaphores.clear()
+    if old is not None:
+        old.shutdown(wait=False)
+
+def _semaphore()->asyncio.Semaphore:
+    """
+    get the semaphore for the running event loop
+    """
+    loop=asyncio.get_running_loop()
+    with _lock:
+        sem=_semaphores.get(loop)
+        if sem is None:
+            sem=asyncio.Semaphore(_concurrencyLimit)
+            _semaphores[loop]=sem
+        return sem
+
+@contextlib.asynccontextmanager
+async def concurrencySlot()->typing.AsyncGenerator[None,None]:
+    """
+    wait for (and hold) one of the limited slots, eg
+        async with concurrencySlot():
+            proc=await asyncio.create_subprocess_shell(...)
+    """
+    async with _semaphore():
+        yield
+
+async def runBlocking(func:typing.Callable[...,T],*args,**kwargs)->T:
+    """
+    run a blocking function in the shared executor without
+    blocking the event loop
+
+    (the current context is carried over, so instrumentation
+    labels still apply)
+    """
+    ctx=contextvars.copy_context()
+    call=functools.partial(ctx.run,func,*args,**kwargs)
+    async with _semaphore():
+        return await asyncio.get_running_loop().run_in_executor(
+            sharedExecutor(),call)
@@ -0,0 +1,12 @@
+"""
+Benchmarks for all of the parsing and formatting hot paths
+
+Benchmarks are written asv-style: classes with an optional
+setup(param) and one or more time_*() methods, optionally
+parameterized by a "params" list (usually the corpus size).
+
+Run them with:
+    python -m cppTools.benchmarks --output results.json
+and compare against an earlier run with:
+    python -m cppTools.benchmarks --compare results.json
+"""
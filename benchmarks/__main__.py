@@ -0,0 +1,210 @@
+"""
+Runs all of the benchmarks and saves the results as json
+
+usage:
+    python -m cppTools.benchmarks [--output results.json]
+        [--compare baseline.json] [--threshold 1.25]
+        [--filter pattern] [--repeat 5]
+"""
+import typing
+import sys
+import os
+import re
+import json
+import math
+import time
+import timeit
+import inspect
+import platform
+import importlib
+import pkgutil
+import statistics
+
+
+def discover(pattern:typing.Optional[str]=None
+    )->typing.Generator[typing.Tuple[str,typing.Type],None,None]:
+    """
+    yield (benchmarkClassName,benchmarkClass) for all benchmark classes
+    """
+    pkgName=__package__ or __name__.rsplit('.',1)[0]
+    pkgDir=os.path.dirname(os.path.abspath(__file__))
+    for mod in pkgutil.iter_modules([pkgDir]):
+        if not mod.name.startswith('bench'):
+            continue
+        module=importlib.import_module(f'{pkgName}.{mod.name}')
+        for name,cls in inspect.getmembers(module,inspect.isclass):
+            if cls.__module__!=module.__name__:
+                continue
+            fullName=f'{mod.name}.{name}'
+            if pattern is not None and re.search(pattern,fullName) is None:
+                continue
+            yield (fullName,cls)
+
+def timeMethod(
+    method:typing.Callable,
+    param:typing.Any,
+    repeat:int=5
+    )->typing.Dict[str,typing.Any]:
+    """
+    time a single benchmark method
+
+    returns {"min":seconds,"median":seconds,"stdev":seconds,"number":n}
+    where all times are per call
+    """
+    timer=timeit.Timer(lambda:method(param))
+    number,_=timer.autorange()
+    times=[t/number for t in timer.repeat(repeat=repeat,number=number)]
+    return {
+        'min':min(times),
+        'median':statistics.median(times),
+        'stdev':statistics.stdev(times) if len(times)>1 else 0.0,
+        'number':number}
+
+def scalingExponent(
+    timings:typing.Dict[str,typing.Dict[str,typing.Any]]
+    )->typing.Optional[float]:
+    """
+    how time grows with the (numeric) parameter, eg
+        1.0 = linear, 2.0 = quadratic (probably regex backtracking!)
+    """
+    points=[]
+    for p,t in timings.items():
+        try:
+            points.append((float(p),t['min']))
+        except (TypeError,ValueError):
+            return None
+    if len(points)<2:
+        return None
+    points.sort()
+    (p0,t0),(p1,t1)=points[0],points[-1]
+    if p0<=0 or t0<=0 or p1==p0:
+        return None
+    return math.log(t1/t0)/math.log(p1/p0)
+
+def run(
+    pattern:typing.Optional[str]=None,
+    repeat:int=5,
+    out:typing.TextIO=sys.stdout
+    )->typing.Dict[str,typing.Any]:
+    """
+    run all benchmarks
+
+    returns the results as a json-compatible dict
+    """
+    results:typing.Dict[str,typing.Any]={}
+    for className,cls in discover(pattern):
+        params=getattr(cls,'params',[None])
+        methods=[name for name,_ in inspect.getmembers(cls,callable)
+            if name.startswith('time_')]
+        timings:typing.Dict[str,typing.Dict[str,typing.Any]]={
+            m:{} for m in methods}
+        for param in params:
+            bench=cls()
+            if hasattr(bench,'setup'):
+                bench.setup(param)
+            try:
+                for m in methods:
+                    t=timeMethod(getattr(bench,m),param,repeat)
+                    timings[m][str(param)]=t
+                    out.write(f'{className}.{m}[{param}]: {t["min"]*1000:.3f} ms\n') # noqa: E501 # pylint: disable=line-too-long
+                    out.flush()
+            finally:
+                if hasattr(bench,'teardown'):
+                    bench.teardown(param)
+        for m in methods:
+            results[f'{className}.{m}']={
+                'params':timings[m],
+                'scaling':scalingExponent(timings[m])}
+    return {
+        'version':1,
+        'meta':{
+            'timestamp':time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python':platform.python_version(),
+            'implementation':platform.python_implementation(),
+            'platform':platform.platform(),
+            'machine':platform.machine()},
+        'results':results}
+
+def compare(
+    old:typing.Dict[str,typing.Any],
+    new:typing.Dict[str,typing.Any],
+    threshold:float=1.25,
+    maxScaling:float=1.5,
+    out:typing.TextIO=sys.stdout
+    )->int:
+    """
+    compare two sets of results
+
+    returns the number of problems found
+    (regressions beyond threshold, or superlinear scaling)
+    """
+    problems=0
+    oldResults=old.get('results',{}) if old else {}
+    for name,result in new['results'].items():
+        scaling=result.get('scaling')
+        if scaling is not None and scaling>maxScaling:
+            out.write(f'SUPERLINEAR {name}: time grows as size^{scaling:.2f}\n') # noqa: E501 # pylint: disable=line-too-long
+            problems+=1
+        oldParams=oldResults.get(name,{}).get('params',{})
+        for param,t in result['params'].items():
+            if param not in oldParams:
+                continue
+            ratio=t['min']/oldParams[param]['min']
+            if ratio>threshold:
+                out.write(f'REGRESSION {name}[{param}]: {ratio:.2f}x slower\n') # noqa: E501 # pylint: disable=line-too-long
+                problems+=1
+            elif ratio<1/threshold:
+                out.write(f'improved {name}[{param}]: {1/ratio:.2f}x faster\n') # noqa: E501 # pylint: disable=line-too-long
+    return problems
+
+def cmdline(args:typing.Iterable[str])->int:
+    """
+    Run the command line
+
+    :param args: command line arguments (WITHOUT the filename)
+    """
+    printhelp=False
+    output=None
+    baseline=None
+    pattern=None
+    threshold=1.25
+    repeat=5
+    args=list(args)
+    while args:
+        arg=args.pop(0)
+        if arg in ('-h','--help'):
+            printhelp=True
+        elif arg in ('--output','--compare','--filter',
+                '--threshold','--repeat') and not args:
+            print(f'ERR: {arg} requires a value')
+            printhelp=True
+        elif arg=='--output':
+            output=args.pop(0)
+        elif arg=='--compare':
+            baseline=args.pop(0)
+        elif arg=='--filter':
+            pattern=args.pop(0)
+        elif arg=='--threshold':
+            threshold=float(args.pop(0))
+        elif arg=='--repeat':
+            repeat=int(args.pop(0))
+        else:
+            print(f'ERR: unknown argument "{arg}"')
+            printhelp=True
+    if printhelp:
+        print(__doc__.strip())
+        return 1
+    old=None
+    if baseline is not None:
+        with open(baseline,'r',encoding='utf-8') as f:
+            old=json.load(f)
+    new=run(pattern,repeat)
+    if output is not None:
+        with open(output,'w',encoding='utf-8') as f:
+            json.dump(new,f,indent=2)
+    problems=compare(old,new,threshold) # type: ignore
+    return 1 if problems else 0
+
+
+if __name__=='__main__':
+    sys.exit(cmdline(sys.argv[1:]))
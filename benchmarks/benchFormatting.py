@@ -0,0 +1,36 @@
+"""
+Benchmarks for printf formatting
+"""
+import typing
+from ..stdio import Printf
+from . import corpus
+
+
+class PrintfLog:
+    """
+    formatting a log's worth of printf statements
+    """
+    params=[1000,10000]
+    lines:typing.List[typing.Tuple[str,tuple]]
+    compiled:typing.List[typing.Tuple[Printf,tuple]]
+
+    def setup(self,num:int):
+        """
+        generate the formats and their values
+        """
+        self.lines=corpus.printfFormats(num)
+        self.compiled=[(Printf(fmt),values) for fmt,values in self.lines]
+
+    def time_Printf_parse(self,_):
+        """
+        parse every format
+        """
+        for fmt,_ in self.lines:
+            Printf(fmt)
+
+    def time_Printf_sprintf(self,_):
+        """
+        apply every pre-parsed format to its values
+        """
+        for p,values in self.compiled:
+            p.sprintf(*values)
@@ -0,0 +1,81 @@
+"""
+Benchmarks for header searching and compile command parsing
+"""
+import typing
+import tempfile
+from ..includes import headersAvailable, findHeader
+from ..compileCommands import CompileCommand, parsedCommandCache
+from . import corpus
+
+
+class HeaderSearch:
+    """
+    headersAvailable() and findHeader() over a deep include tree
+    """
+    params=[20,200]
+    tmp:tempfile.TemporaryDirectory
+    dirs:typing.List[str]
+    lastHeader:str
+
+    def setup(self,headersPerDir:int):
+        """
+        create the include tree on disk
+        """
+        self.tmp=tempfile.TemporaryDirectory() # noqa: E501 # pylint: disable=consider-using-with
+        self.dirs=corpus.includeTree(self.tmp.name,3,3,headersPerDir)
+        # worst case, the header is in the last directory searched
+        self.lastHeader=f'header3_{headersPerDir-1}.h'
+
+    def teardown(self,_):
+        """
+        remove the include tree
+        """
+        self.tmp.cleanup()
+
+    def time_headersAvailable(self,_):
+        """
+        list every header in the tree
+        """
+        for _ in headersAvailable(self.dirs):
+            pass
+
+    def time_findHeader(self,_):
+        """
+        find a header in the last directory searched
+        """
+        findHeader(self.lastHeader,self.dirs)
+
+
+class CompileCommandParsing:
+    """
+    pulling information out of long compile commands
+    """
+    params=[10,100]
+    cc:CompileCommand
+
+    def setup(self,numIncludes:int):
+        """
+        generate a compile command
+        """
+        self.cc=CompileCommand(
+            corpus.compileCommand(numIncludes,numIncludes),'/tmp')
+
+    def time_parse(self,_):
+        """
+        parse the command (without the cache)
+        """
+        parsedCommandCache.clear()
+        _=self.cc.parsed
+
+    def time_includePaths(self,_):
+        """
+        get the include paths (from the cache)
+        """
+        for _ in self.cc.includePaths:
+            pass
+
+    def time_defines(self,_):
+        """
+        get the defines (from the cache)
+        """
+        _=self.cc.defines
@@ -0,0 +1,163 @@
+"""
+Benchmarks for comment removal, enum/define extraction,
+function prototype parsing and branch extraction
+"""
+import typing
+import os
+import tempfile
+from .._cppTools import cppRemoveComments, cppFunctionInfo, \
+    functionInfoCache
+from ..cEnums import stripCComments, loadCEnums
+from ..branching import branches
+from . import corpus
+
+
+class RemoveComments:
+    """
+    cppRemoveComments() and stripCComments() on comment-heavy code
+    """
+    params=[1000,10000]
+    code:str
+
+    def setup(self,numLines:int):
+        """
+        generate the code
+        """
+        self.code=corpus.commentHeavy(numLines)
+
+    def time_cppRemoveComments(self,_):
+        """
+        remove comments with cppRemoveComments()
+        """
+        cppRemoveComments(self.code)
+
+    def time_stripCComments(self,_):
+        """
+        remove comments with stripCComments()
+        """
+        stripCComments(self.code)
+
+
+class RemoveCommentsPathological:
+    """
+    inputs that tend to cause regex backtracking
+    (watch how these scale with size)
+    """
+    params=[500,2000]
+    unterminated:str
+    slashes:str
+
+    def setup(self,numLines:int):
+        """
+        generate the pathological inputs
+        """
+        self.unterminated=corpus.unterminatedComment(numLines)
+        self.slashes=corpus.manySlashes(numLines)
+
+    def time_cppRemoveComments_unterminated(self,_):
+        """
+        cppRemoveComments() on a comment that never ends
+        """
+        cppRemoveComments(self.unterminated)
+
+    def time_cppRemoveComments_slashes(self,_):
+        """
+        cppRemoveComments() on runs of slashes
+        """
+        cppRemoveComments(self.slashes)
+
+    def time_stripCComments_unterminated(self,_):
+        """
+        stripCComments() on a comment that never ends
+        """
+        stripCComments(self.unterminated)
+
+
+class LoadCEnums:
+    """
+    loadCEnums() on a large header full of enums and #defines
+    """
+    params=[100,1000]
+    tmp:tempfile.TemporaryDirectory
+    filename:str
+
+    def setup(self,numEnums:int):
+        """
+        write the header to disk
+        """
+        self.tmp=tempfile.TemporaryDirectory() # noqa: E501 # pylint: disable=consider-using-with
+        self.filename=os.path.join(self.tmp.name,'enums.h')
+        with open(self.filename,'w',encoding='utf-8') as f:
+            f.write(corpus.enumHeader(numEnums,16,numEnums*4))
+
+    def teardown(self,_):
+        """
+        remove the header
+        """
+        self.tmp.cleanup()
+
+    def time_loadCEnums(self,_):
+        """
+        load the header
+        """
+        loadCEnums(self.filename)
+
+    def time_loadCEnums_preprocessed(self,_):
+        """
+        load the header, evaluating its #if's
+        """
+        loadCEnums(self.filename,defines={})
+
+
+class FunctionInfo:
+    """
+    cppFunctionInfo() on lots of prototypes
+    """
+    params=[1000,10000]
+
+    prototypes:typing.List[str]
+    repeated:typing.List[str]
+
+    def setup(self,num:int):
+        """
+        generate the prototypes
+        """
+        self.prototypes=corpus.functionPrototypes(num)
+        # the same few prototypes over and over, like repeated includes
+        self.repeated=self.prototypes[:500]*(num//500)
+
+    def time_cppFunctionInfo(self,_):
+        """
+        parse every prototype
+        """
+        # parsing cost, not cache hits
+        functionInfoCache.clear()
+        for p in self.prototypes:
+            cppFunctionInfo(p)
+
+    def time_cppFunctionInfoCached(self,_):
+        """
+        parse the same prototypes over and over
+        """
+        for p in self.repeated:
+            cppFunctionInfo(p)
+
+
+class Branches:
+    """
+    branching.branches() on branch-heavy code
+    """
+    params=[1000,10000]
+    code:str
+
+    def setup(self,numLines:int):
+        """
+        generate the code
+        """
+        self.code=corpus.branchyCode(numLines)
+
+    def time_branches(self,_):
+        """
+        find all the branches
+        """
+        branches(self.code)
@@ -0,0 +1,163 @@
+"""
+Synthetic corpus generators for the benchmarks
+
+Everything is deterministic (seeded) so that results
+are comparable from run to run.
+"""
+import typing
+import os
+import random
+
+
+def enumHeader(numEnums:int,valuesPerEnum:int=16,numDefines:int=0)->str:
+    """
+    a header full of typedef enums and #defines
+    """
+    rng=random.Random(numEnums)
+    ret=[f'#ifndef ENUMS_{numEnums}_H\n#define ENUMS_{numEnums}_H\n']
+    for i in range(numDefines):
+        if i%4==0:
+            ret.append(f'#define DEF_{i} 0x{rng.randrange(1<<32):08X}u\n')
+        elif i%4==1:
+            ret.append(f'#define DEF_{i} (DEF_{i-1} | (1<<{i%31}))\n')
+        elif i%4==2:
+            ret.append(f'#define DEF_{i} "string {i}"\n')
+        else:
+            ret.append(f'#define DEF_{i} {rng.randrange(-1000,1000)}\n')
+    for i in range(numEnums):
+        ret.append(f'typedef enum Enum{chr(65+i%26)}{"x"*(i//26)} {{\n')
+        for j in range(valuesPerEnum):
+            if j%5==0:
+                ret.append(f'    E{i}_V{j} = {rng.randrange(1000)},\n')
+            else:
+                ret.append(f'    E{i}_V{j},\n')
+        ret.append(f'}} Enum{chr(65+i%26)}{"x"*(i//26)};\n\n')
+    ret.append('#endif\n')
+    return ''.join(ret)
+
+def commentHeavy(numLines:int)->str:
+    """
+    code where most of the bytes are comments
+    """
+    ret=[]
+    for i in range(numLines):
+        kind=i%4
+        if kind==0:
+            ret.append(f'int value{i}=0; // trailing comment number {i}\n')
+        elif kind==1:
+            ret.append(f'/* block comment {i}\n * spanning\n * lines */\n')
+        elif kind==2:
+            ret.append(f'/** doc {i} */ void func{i}(int a /* inline */);\n')
+        else:
+            ret.append(f'// {"-"*60}\n')
+    return ''.join(ret)
+
+def unterminatedComment(numLines:int)->str:
+    """
+    pathological: a block comment that never closes
+    """
+    return 'int x;\n/* never closed\n'+('* * * / / *\n'*numLines)
+
+def manySlashes(numLines:int)->str:
+    """
+    pathological: lots of near-miss comment starts
+    """
+    return ('a / b / c * d / * e /\n'*numLines)
+
+def functionPrototypes(num:int)->typing.List[str]:
+    """
+    a bunch of function prototypes
+    """
+    types=['int','float','char *','unsigned','double','void *','long']
+    rng=random.Random(num)
+    ret=[]
+    for i in range(num):
+        params=[]
+        for j in range(rng.randrange(0,6)):
+            p=f'{rng.choice(types)} arg{j}'
+            if rng.random()<0.3:
+                p+=f'={rng.randrange(10)}'
+            params.append(p)
+        ret.append(f'/* proto {i} */ {rng.choice(types)} func{i}({", ".join(params)});') # noqa: E501 # pylint: disable=line-too-long
+    return ret
+
+def branchyCode(numLines:int)->str:
+    """
+    code full of if/else/switch statements
+    """
+    ret=[]
+    for i in range(numLines):
+        kind=i%5
+        if kind==0:
+            ret.append(f'if (a{i} > {i} && b) {{\n')
+        elif kind==1:
+            ret.append(f'}} else if (check(a{i}, "x")) {{\n')
+        elif kind==2:
+            ret.append('} else {\n')
+        elif kind==3:
+            ret.append(f'switch (state{i}) {{ case {i}: break; }}\n')
+        else:
+            ret.append(f'    value{i} = compute(value{i-1});\n}}\n')
+    return ''.join(ret)
+
+def printfFormats(num:int)->typing.List[typing.Tuple[str,tuple]]:
+    """
+    printf formats with matching values, like a log file's worth
+    """
+    ret:typing.List[typing.Tuple[str,tuple]]=[]
+    for i in range(num):
+        kind=i%4
+        if kind==0:
+            ret.append((r'[%08d] value=%d\n',(i,i*3)))
+        elif kind==1:
+            ret.append((r'%s: %5.2f percent done\t(%x)\n',(f'task{i}',i/7,i)))
+        elif kind==2:
+            ret.append((r'\"%s\" -> %c \\ %lu\n',('name',65,i)))
+        else:
+            ret.append((r'plain text line with no placeholders\n',()))
+    return ret
+
+def includeTree(
+    root:str,
+    depth:int,
+    breadth:int,
+    headersPerDir:int
+    )->typing.List[str]:
+    """
+    create a directory tree of headers on disk
+
+    returns all the directories created (to use as include paths)
+    """
+    dirs=[]
+    def make(path:str,level:int)->None:
+        os.makedirs(path,exist_ok=True)
+        dirs.append(path)
+        for h in range(headersPerDir):
+            with open(os.path.join(path,f'header{level}_{h}.h'),'w',
+                    encoding='utf-8') as f:
+                f.write(f'#define H{level}_{h} {h}\n')
+        with open(os.path.join(path,'notAHeader.c'),'w',
+                encoding='utf-8') as f:
+            f.write('int main(){return 0;}\n')
+        if level<depth:
+            for b in range(breadth):
+                make(os.path.join(path,f'd{b}'),level+1)
+    make(root,0)
+    return dirs
+
+def compileCommand(numIncludes:int,numDefines:int=0)->str:
+    """
+    a long compile command line
+    """
+    ret=['gcc -O2 -std=c11']
+    for i in range(numIncludes):
+        if i%3==0:
+            ret.append(f'-Iinclude/dir{i}')
+        elif i%3==1:
+            ret.append(f'-I "path with spaces/dir{i}"')
+        else:
+            ret.append(f'-I../relative/dir{i}')
+    for i in range(numDefines):
+        ret.append(f'-DDEFINE_{i}={i}')
+    ret.append('-c foo.c -o foo.o')
+    return ' '.join(ret)
@@ -0,0 +1,107 @@
+"""
+The sizes and alignments of primitive c types on various platforms
+"""
+import typing
+import sys
+import ctypes
+
+
+class CAbi:
+    """
+    The sizes and alignments of primitive types
+    for a given platform/compiler combination
+    """
+
+    def __init__(self,
+        name:str,
+        byteOrder:str='little',
+        pointerSize:int=8,
+        primitives:typing.Optional[typing.Dict[str,typing.Tuple[int,int]]]=None, # noqa: E501 # pylint: disable=line-too-long
+        msBitfields:bool=False):
+        """
+        :byteOrder: 'little' or 'big'
+        :primitives: {canonicalTypeName:(size,alignment)}
+            any primitive not listed is given its natural
+            size and alignment
+        :msBitfields: pack bitfields the way msvc does (a new storage
+            unit whenever the declared type size changes) rather than
+            the way gcc/clang do
+        """
+        self.name=name
+        self.byteOrder=byteOrder
+        self.pointerSize=pointerSize
+        self.msBitfields=msBitfields
+        self.primitives:typing.Dict[str,typing.Tuple[int,int]]={
+            'char':(1,1),
+            'short':(2,2),
+            'int':(4,4),
+            'long':(8,8),
+            'long long':(8,8),
+            'float':(4,4),
+            'double':(8,8),
+            'long double':(16,16),
+            '_Bool':(1,1),
+            'wchar_t':(4,4),
+            'size_t':(pointerSize,pointerSize),
+            'ptrdiff_t':(pointerSize,pointerSize),
+            'intptr_t':(pointerSize,pointerSize),
+            'pointer':(pointerSize,pointerSize)}
+        if primitives is not None:
+            self.primitives.update(primitives)
+
+    @property
+    def structByteOrder(self)->str:
+        """
+        the byte order character used by the python struct module
+        """
+        if self.byteOrder=='big':
+            return '>'
+        return '<'
+
+    @property
+    def numpyByteOrder(self)->str:
+        """
+        the byte order character used by numpy dtypes
+        """
+        return self.structByteOrder
+
+    def sizeAndAlignment(self,primitive:str)->typing.Tuple[int,int]:
+        """
+        get the (size,alignment) of a canonical primitive type name
+        """
+        return self.primitives[primitive]
+
+    def __repr__(self):
+        return f'CAbi("{self.name}")'
+
+
+def _nativeAbi()->CAbi:
+    """
+    build an abi describing the running python interpreter
+    """
+    def sa(t)->typing.Tuple[int,int]:
+        return (ctypes.sizeof(t),ctypes.alignment(t))
+    return CAbi('native',sys.byteorder,ctypes.sizeof(ctypes.c_void_p),{
+        'short':sa(ctypes.c_short),
+        'int':sa(ctypes.c_int),
+        'long':sa(ctypes.c_long),
+        'long long':sa(ctypes.c_longlong),
+        'float':sa(ctypes.c_float),
+        'double':sa(ctypes.c_double),
+        'long double':sa(ctypes.c_longdouble),
+        '_Bool':sa(ctypes.c_bool),
+        'wchar_t':sa(ctypes.c_wchar)},
+        msBitfields=sys.platform=='win32')
+
+# 64 bit linux/macos (gcc, clang)
+ABI_LP64=CAbi('LP64')
+# 64 bit windows (msvc)
+ABI_LLP64=CAbi('LLP64',primitives={
+    'long':(4,4),'long double':(8,8),'wchar_t':(2,2)},msBitfields=True)
+# 32 bit x86 linux (i386 System V)
+ABI_ILP32=CAbi('ILP32',pointerSize=4,primitives={
+    'long':(4,4),'long long':(8,4),'double':(8,4),'long double':(12,4)})
+# 32 bit arm (AAPCS)
+ABI_ARM32=CAbi('ARM32',pointerSize=4,primitives={
+    'long':(4,4),'long double':(8,8),'wchar_t':(4,4)})
+ABI_NATIVE=_nativeAbi()
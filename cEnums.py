@@ -3,9 +3,17 @@ Tools for extracting enums (and simple value defines)
 from a c file
 """
 import typing
+import math
+import warnings
 from collections.abc import Mapping
 from enum import Enum
 import re
+from .preprocessor import MacroDefinitionsCompatible, \
+    preprocessConditionals, evaluateCValue
+from .macros import MacroTable
+from .instrumentation import instrumented, registry
+from .c_integral_types import IntegralCType, IntegralCTypeGoal
+from .stdio import encodeCEscapeSequences
 
 
 def globalize(thing:typing.Union[typing.Dict,Enum,typing.List])->None:
@@ -27,6 +35,7 @@ def globalize(thing:typing.Union[typing.Dict,Enum,typing.List])->None:
         for k,v in thing.__dict__.items():
             g[k]=v
 
+@instrumented('cEnums.stripCComments',sizeArg=0)
 def stripCComments(cCode:str)->str:
     """
     removes all comments from code to make it better to parse
@@ -40,6 +49,7 @@ def stripCComments(cCode:str)->str:
             if len(cols)>1:
                 result.append(cols[-1])
     cCode=''.join(result)
+    result=[]
     for item in cCode.split('//'):
         if not result:
             result=[item]
@@ -50,65 +60,140 @@ def stripCComments(cCode:str)->str:
                 result.append(cols[-1])
     return ''.join(result)
 
-def loadCEnums(filename:str,globalizeAll:bool=False
-    )->typing.Dict[typing.Optional[str],
-        typing.Dict[str,typing.Union[str,int]]]:
+_lineContinuationRe=re.compile(r"""\\\r?\n""")
+_defineRe=re.compile(r"""^[ \t]*#[ \t]*(?P<directive>define|undef)[ \t]+(?P<args>[^\r\n]*)""",re.MULTILINE) # noqa: E501 # pylint: disable=line-too-long
+
+_headerGuardRe=re.compile(r"""^[ \t]*#[ \t]*ifndef[ \t]+(?P<name>[A-Za-z_][A-Za-z0-9_]*)[ \t]*\r?\n[ \t]*#[ \t]*define[ \t]+(?P=name)[ \t]*$""",re.MULTILINE) # noqa: E501 # pylint: disable=line-too-long
+
+_typedefEnumRe=re.compile(r"""\n\s*typedef\s+enum\s+(?P<name>[a-zA-Z_][a-zA-Z0-9_]*)\s*\{\s*(?P<values>[^}]+)\}\s*(?P<name2>[a-zA-Z_][a-zA-Z0-9_]*)""",re.DOTALL) # noqa: E501 # pylint: disable=line-too-long
+
+def parseCEnumTypedefs(cCode:str,
+    macros:typing.Optional[MacroTable]=None,
+    known:typing.Optional[typing.MutableMapping[str,typing.Any]]=None
+    )->typing.Dict[str,typing.Dict[str,typing.Union[str,int]]]:
     """
-    Loads all enums from a c file.
+    Parse only the typedef enums out of a block of (comment-free) code
 
-    :globalizeAll: will add all enums and all of their
-        values to the global namespace
+    :macros: macros used by the enum initializers
+    :known: values that initializers can refer to
+        (this is updated with all of the new enum values)
+
+    returns {enumName:{k:v}}
     """
-    enums:typing.Dict[typing.Optional[str],
-        typing.Dict[str,typing.Union[str,int]]]={} # {enum_name:{k:v}} or for #defines {None:{k:v}} # noqa: E501 # pylint: disable=line-too-long
-    with open(filename,'r',encoding="utf-8") as f:
-        cCode=f.read()
-    cCode=stripCComments(cCode)
-    # grab all the #defines
-    poundDefines:typing.Dict[str,typing.Union[str,int]]={}
-    regexStr=r"""\n#define\s+(?P<name>[a-zA-Z_]+)\s*(?P<value>[0-9.]+)"""
-    regex=re.compile(regexStr)
-    for m in regex.finditer(cCode):
+    if known is None:
+        known={}
+    enums:typing.Dict[str,typing.Dict[str,typing.Union[str,int]]]={}
+    for m in _typedefEnumRe.finditer(cCode):
+        if registry.enabled:
+            registry.count('cEnums.parseCEnums','matches')
         name=m.group('name')
-        value=int(m.group('value'))
-        poundDefines[name]=value
-    enums[None]=poundDefines
-    # next grab all the enums
-    typedefRegexStr=r"""\n\s*typedef\s+enum\s+(?P<name>[a-zA-Z_]+)\s+\{\s+(?P<values>[^}]+)\}\s*(?P<name2>[a-zA-Z_]+)""" # noqa: E501 # pylint: disable=line-too-long
-    typedefRegex=re.compile(typedefRegexStr,re.DOTALL)
-    for m in typedefRegex.finditer(cCode):
-        name=m.group('name')
-        values=''.join(m.group('values').split()).split(',')
+        values=m.group('values').split(',')
         mapping:typing.Dict[str,typing.Union[str,int]]={}
         currentVal=0
         for item in values:
             kv=item.split('=',1)
-            k=kv[0]
+            k=kv[0].strip()
             if not k:
                 continue
             if len(kv)>1:
-                v:typing.Union[str,int]=kv[1]
-                if not kv[1].isdecimal():
-                    if kv[1][0]=='-' and kv[1][1:].isdecimal():
-                        v=int(kv[1])
-                    elif v in mapping:
-                        v=mapping[kv[1]]
-                    else:
-                        # find in all known enums
-                        for e in enums.values():
-                            if v in e:
-                                v=e[kv[1]]
-                                break
-                else:
-                    v=int(kv[1])
+                try:
+                    v:typing.Union[str,int]=evaluateCValue(
+                        kv[1],macros,known)
+                except SyntaxError:
+                    # eg, a bad function-like macro call
+                    v=kv[1].strip()
             else:
                 v=currentVal
             if isinstance(v,int):
                 currentVal=v+1
             else:
-                print(f'WARN: possible error parsing {v}')
+                # (not printed, since stdout may be a language server pipe)
+                warnings.warn(f'possible error parsing {v}',stacklevel=2)
             mapping[k]=v
+            known[k]=v
             enums[name]=mapping
+    return enums
+
+@instrumented('cEnums.loadCEnums',labelArg='filename')
+def loadCEnums(filename:str,globalizeAll:bool=False,
+    defines:typing.Optional[MacroDefinitionsCompatible]=None
+    )->typing.Dict[typing.Optional[str],
+        typing.Dict[str,typing.Union[str,int]]]:
+    """
+    Loads all enums from a c file.
+
+    :globalizeAll: will add all enums and all of their
+        values to the global namespace
+    :defines: if specified, resolve #if/#ifdef regions using
+        this macro environment (eg, a CompileCommand)
+        so that only live code is parsed
+    """
+    with open(filename,'r',encoding="utf-8") as f:
+        cCode=f.read()
+    return parseCEnums(cCode,globalizeAll,defines)
+
+async def aloadCEnums(filename:str,globalizeAll:bool=False,
+    defines:typing.Optional[MacroDefinitionsCompatible]=None
+    )->typing.Dict[typing.Optional[str],
+        typing.Dict[str,typing.Union[str,int]]]:
+    """
+    Same as loadCEnums() but without blocking the event loop
+
+    (the file is read and parsed in the shared executor)
+    """
+    from .asyncSupport import runBlocking
+    return await runBlocking(loadCEnums,filename,globalizeAll,defines)
+
+@instrumented('cEnums.parseCEnums',sizeArg='cCode')
+def parseCEnums(cCode:str,globalizeAll:bool=False,
+    defines:typing.Optional[MacroDefinitionsCompatible]=None
+    )->typing.Dict[typing.Optional[str],
+        typing.Dict[str,typing.Union[str,int]]]:
+    """
+    Loads all enums from a block of c code.
+
+    :globalizeAll: will add all enums and all of their
+        values to the global namespace
+    :defines: if specified, resolve #if/#ifdef regions using
+        this macro environment (eg, a CompileCommand)
+        so that only live code is parsed
+
+    NOTE: header guards (an empty #define right after an #ifndef
+    of the same name) are not reported as #defines
+    """
+    enums:typing.Dict[typing.Optional[str],
+        typing.Dict[str,typing.Union[str,int]]]={} # {enum_name:{k:v}} or for #defines {None:{k:v}} # noqa: E501 # pylint: disable=line-too-long
+    headerGuards=set(_headerGuardRe.findall(cCode))
+    if defines is not None:
+        cCode='\n'.join(preprocessConditionals(cCode,defines))
+    cCode=stripCComments(cCode)
+    # grab all the #defines (honoring #undef) and report the
+    # final, fully-expanded value of every object-like macro
+    cCode=_lineContinuationRe.sub(' ',cCode)
+    macros=MacroTable()
+    for m in _defineRe.finditer(cCode):
+        if m.group('directive')=='define':
+            macros.define(m.group('args'))
+        else:
+            macros.undefine(m.group('args'))
+    if registry.enabled:
+        registry.count('cEnums.parseCEnums','matches',len(macros))
+    poundDefines:typing.Dict[str,typing.Union[str,int]]={}
+    for name,macro in macros.macros.items():
+        if name in headerGuards and not macro.value.strip():
+            continue
+        if not macro.isFunctionLike:
+            try:
+                poundDefines[name]=evaluateCValue(name,macros)
+            except SyntaxError:
+                # eg, a bad function-like macro call,
+                # which shouldn't spoil the rest of the file
+                poundDefines[name]=macro.value
+    enums[None]=poundDefines
+    # next grab all the enums
+    # (every value seen so far, for initializers that refer to them)
+    known:typing.Dict[str,typing.Union[str,int]]=dict(poundDefines)
+    enums.update(parseCEnumTypedefs(cCode,macros,known))
     if globalizeAll:
         valDict:typing.Dict[str,typing.Any]
         for enumName,valDict in enums.items():
@@ -123,3 +208,150 @@ def loadCEnums(filename:str,globalizeAll:bool=False
                 for kk,vv in valDict.items():
                     setattr(targetModule,kk,vv)
     return enums
+
+# python's % formatting does not understand printf length modifiers
+_printfLengthRe=re.compile(r"""%([-+ #0-9.]*)(?:hh|h|ll|l|j|z|t|L)""")
+
+class _IntegralFormatter:
+    """
+    Formats ints as c literals, picking the smallest exact-width
+    type for each value with IntegralCType
+
+    (the python % formats are cached per type, so this stays fast
+    for hundreds of thousands of values)
+    """
+
+    def __init__(self,baseFormat:str='int',typed:bool=True):
+        """
+        :baseFormat: "int", "hex", or "oct"
+        :typed: cast each value to its type, eg "((uint16_t)0x1234)"
+        """
+        if baseFormat not in ('int','hex','oct'):
+            raise ValueError(f'Unsupported base format "{baseFormat}"')
+        self.baseFormat=baseFormat
+        self.typed=typed
+        self._formats:typing.Dict[typing.Tuple[int,bool],
+            typing.Tuple[str,str,str]]={}
+
+    def _format(self,numBits:int,signed:bool)->typing.Tuple[str,str,str]:
+        """
+        get (cTypeName,pythonFormat,suffix) for a type
+        """
+        key=(numBits,signed)
+        fmt=self._formats.get(key)
+        if fmt is None:
+            baseFormat='int' if signed else self.baseFormat
+            ct=IntegralCType(numBits,signed,IntegralCTypeGoal.EXACT,
+                baseFormat=baseFormat)
+            pyFormat=_printfLengthRe.sub(r'%\1',ct.printfString)
+            suffix=''
+            if not signed and numBits>16:
+                suffix='U'
+            if numBits>32:
+                suffix+='LL'
+            fmt=(ct.cTypeName,pyFormat,suffix)
+            self._formats[key]=fmt
+        return fmt
+
+    def __call__(self,value:int)->str:
+        signed=value<0
+        for numBits in (8,16,32,64):
+            if signed:
+                if value>=-(1<<(numBits-1)):
+                    break
+            elif value<(1<<numBits):
+                break
+        else:
+            raise ValueError(f'{value} does not fit in any c integral type')
+        cTypeName,pyFormat,suffix=self._format(numBits,signed)
+        if value==-(1<<63):
+            # the literal would overflow before it was negated
+            literal=f'({pyFormat%(value+1)}{suffix}-1)'
+        else:
+            literal=(pyFormat%value)+suffix
+            if signed and self.typed:
+                literal=f'({literal})'
+        if not self.typed:
+            return literal
+        return f'(({cTypeName}){literal})'
+
+def _cValueLiteral(value:typing.Any,formatInt:_IntegralFormatter)->str:
+    """
+    get the c spelling of a python value
+    """
+    if isinstance(value,bool):
+        return '1' if value else '0'
+    if isinstance(value,int):
+        return formatInt(value)
+    if isinstance(value,float):
+        if math.isnan(value) or math.isinf(value):
+            raise ValueError(f'{value} has no c literal')
+        return repr(value)
+    if isinstance(value,bytes):
+        value=value.decode('latin-1')
+    return f'"{encodeCEscapeSequences(str(value))}"'
+
+def writeCEnums(
+    mapping:typing.Mapping[typing.Optional[str],
+        typing.Mapping[str,typing.Any]],
+    out:typing.Union[str,typing.TextIO],
+    baseFormat:str='int',
+    typedDefines:bool=True,
+    headerGuard:typing.Optional[str]=None,
+    chunkSize:int=4096)->None:
+    """
+    Write a c header from python values.  The opposite of loadCEnums().
+
+    :mapping: in the same form that loadCEnums() returns
+        {enumName:{k:v},None:{defineName:value}}
+        where #define values can be int, float, or str (a string literal)
+        and enum values are int (or str for an initializer to write as-is)
+    :out: a filename or an open text file
+    :baseFormat: how to write ints, "int", "hex", or "oct"
+    :typedDefines: cast each #define to the smallest type that holds it,
+        eg "((uint16_t)0x1234)"
+    :headerGuard: if specified, wrap the header in an #ifndef guard
+        (which loadCEnums() knows not to report as a #define)
+    :chunkSize: number of lines to buffer between writes
+
+    Everything is streamed out, so this is fine for enormous mappings
+    """
+    if isinstance(out,str):
+        with open(out,'w',encoding='utf-8') as f:
+            writeCEnums(mapping,f,baseFormat,typedDefines,headerGuard,
+                chunkSize)
+        return
+    formatDefine=_IntegralFormatter(baseFormat,typedDefines)
+    formatEnum=_IntegralFormatter(baseFormat,False)
+    buf:typing.List[str]=['/* generated by cppTools.writeCEnums */\n']
+    def emit(line:str)->None:
+        buf.append(line)
+        if len(buf)>=chunkSize:
+            out.write(''.join(buf))
+            buf.clear()
+    if headerGuard is not None:
+        emit(f'#ifndef {headerGuard}\n#define {headerGuard}\n')
+    defines=mapping.get(None)
+    if defines:
+        emit('\n')
+        for name,value in defines.items():
+            emit(f'#define {name} {_cValueLiteral(value,formatDefine)}\n')
+    for enumName,values in mapping.items():
+        if enumName is None:
+            continue
+        emit(f'\ntypedef enum {enumName} {{\n')
+        nextValue:typing.Optional[int]=0
+        for name,value in values.items():
+            if isinstance(value,int) and not isinstance(value,bool):
+                if value==nextValue:
+                    emit(f'    {name},\n')
+                else:
+                    emit(f'    {name} = {formatEnum(value)},\n')
+                nextValue=value+1
+            else:
+                emit(f'    {name} = {value},\n')
+                nextValue=None
+        emit(f'}} {enumName};\n')
+    if headerGuard is not None:
+        emit(f'\n#endif /* {headerGuard} */\n')
+    out.write(''.join(buf))
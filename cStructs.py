@@ -0,0 +1,999 @@
+"""
+Tools for laying out c structs (sizeof, alignment and field offsets)
+under a given ABI and decoding binary records that use them.
+
+Can do helpful things like:
+    layouts=loadCStructs("telemetry.h",abi=ABI_LP64)
+    records=layouts['TelemetryRecord'].readRecords("capture.bin")
+"""
+import typing
+import copy
+import struct
+import mmap
+import re
+from ._cppTools import cppRemoveComments
+from .cAbi import CAbi,ABI_LP64,ABI_LLP64,ABI_ILP32,ABI_ARM32,ABI_NATIVE # noqa: E501,F401 # pylint: disable=line-too-long,unused-import
+from .c_integral_types import IntegralCType
+from .preprocessor import evaluateCValue
+
+
+class _Primitive:
+    """
+    how a canonical primitive type is decoded
+    """
+    __slots__=('name','kind','signed','numBits')
+
+    def __init__(self,name:str,kind:str,signed:bool=True,numBits:int=0):
+        """
+        :kind: 'int','float','char','bool','pointer', or 'raw'
+        :numBits: fixed size (for stdint types), 0 means ask the abi
+        """
+        self.name=name
+        self.kind=kind
+        self.signed=signed
+        self.numBits=numBits
+
+
+_primitives:typing.Dict[str,_Primitive]={
+    'char':_Primitive('char','char'),
+    'signed char':_Primitive('char','int',True,8),
+    'unsigned char':_Primitive('char','int',False,8),
+    'short':_Primitive('short','int'),
+    'unsigned short':_Primitive('short','int',False),
+    'int':_Primitive('int','int'),
+    'unsigned int':_Primitive('int','int',False),
+    'long':_Primitive('long','int'),
+    'unsigned long':_Primitive('long','int',False),
+    'long long':_Primitive('long long','int'),
+    'unsigned long long':_Primitive('long long','int',False),
+    'float':_Primitive('float','float'),
+    'double':_Primitive('double','float'),
+    'long double':_Primitive('long double','raw'),
+    '_Bool':_Primitive('_Bool','bool'),
+    'bool':_Primitive('_Bool','bool'),
+    'wchar_t':_Primitive('wchar_t','int',False),
+    'size_t':_Primitive('size_t','int',False),
+    'ssize_t':_Primitive('size_t','int'),
+    'ptrdiff_t':_Primitive('ptrdiff_t','int'),
+    'intptr_t':_Primitive('intptr_t','int'),
+    'uintptr_t':_Primitive('intptr_t','int',False),
+    'pointer':_Primitive('pointer','pointer',False)}
+_stdintRe=re.compile(r"""(?P<unsigned>u?)int(?:_least|_fast)?(?P<numBits>8|16|32|64)_t""") # noqa: E501 # pylint: disable=line-too-long
+_typeAliases={
+    'signed':'int',
+    'unsigned':'unsigned int',
+    'short int':'short',
+    'signed short':'short',
+    'signed short int':'short',
+    'short unsigned':'unsigned short',
+    'unsigned short int':'unsigned short',
+    'signed int':'int',
+    'long int':'long',
+    'signed long':'long',
+    'signed long int':'long',
+    'unsigned long int':'unsigned long',
+    'long unsigned':'unsigned long',
+    'long long int':'long long',
+    'signed long long':'long long',
+    'signed long long int':'long long',
+    'unsigned long long int':'unsigned long long',
+    'long long unsigned':'unsigned long long'}
+_qualifiersRe=re.compile(r"""\b(?:const|volatile|register|restrict|__restrict|mutable)\b""") # noqa: E501 # pylint: disable=line-too-long
+
+def _canonicalTypeName(typeName:str)->str:
+    """
+    collapse a type name down to something we can look up
+
+    eg "const unsigned   long int" -> "unsigned long"
+    """
+    typeName=' '.join(_qualifiersRe.sub(' ',typeName).split())
+    return _typeAliases.get(typeName,typeName)
+
+def _structFmtChar(kind:str,signed:bool,size:int)->str:
+    """
+    the python struct format character for a primitive
+    """
+    if kind=='float':
+        return {2:'e',4:'f',8:'d'}[size]
+    if kind=='bool':
+        return '?'
+    if kind=='char':
+        return 'c'
+    if kind=='raw':
+        return f'{size}s'
+    fmt={1:'b',2:'h',4:'i',8:'q'}[size]
+    if not signed:
+        fmt=fmt.upper()
+    return fmt
+
+def _numpyFmt(kind:str,signed:bool,size:int,byteOrder:str)->str:
+    """
+    the numpy dtype string for a primitive
+    """
+    if kind=='float':
+        return f'{byteOrder}f{size}'
+    if kind=='bool':
+        return 'b1'
+    if kind=='char':
+        return 'S1'
+    if kind=='raw':
+        return f'V{size}'
+    if signed:
+        return f'{byteOrder}i{size}'
+    return f'{byteOrder}u{size}'
+
+
+class CStructField:
+    """
+    A single field within a laid-out c struct
+    """
+
+    def __init__(self,
+        name:str,
+        typeName:str,
+        offset:int,
+        size:int,
+        alignment:int,
+        dims:typing.Tuple[int,...]=(),
+        kind:str='int',
+        signed:bool=True,
+        layout:typing.Optional['CStructLayout']=None,
+        numBits:typing.Optional[int]=None,
+        bitOffset:int=0):
+        """
+        :size: the size of the whole field, including all array elements
+            (for a bitfield, the bytes that its bits touch)
+        :dims: array dimensions, eg "int a[2][3]" is (2,3)
+        :layout: the layout of the field's type if it is a struct/union
+        :numBits: the width of a bitfield, eg "int a:3" is 3
+        :bitOffset: where a bitfield starts within its first byte
+            (counting in allocation order)
+        """
+        self.name=name
+        self.typeName=typeName
+        self.offset=offset
+        self.size=size
+        self.alignment=alignment
+        self.dims=dims
+        self.kind=kind
+        self.signed=signed
+        self.layout=layout
+        self.numBits=numBits
+        self.bitOffset=bitOffset
+
+    @property
+    def isBitfield(self)->bool:
+        """
+        whether this is a bitfield, eg "unsigned int flag:1"
+        """
+        return self.numBits is not None
+
+    @property
+    def count(self)->int:
+        """
+        total number of array elements (1 if not an array)
+        """
+        n=1
+        for d in self.dims:
+            n*=d
+        return n
+
+    @property
+    def elementSize(self)->int:
+        """
+        size of a single element of the field
+        """
+        return self.size//max(self.count,1)
+
+    @property
+    def isCharArray(self)->bool:
+        """
+        char arrays are decoded as byte strings
+        """
+        return self.kind=='char' and bool(self.dims)
+
+    def bitfieldValue(self,data:typing.Any,offset:int,byteOrder:str)->typing.Any: # noqa: E501 # pylint: disable=line-too-long
+        """
+        decode this bitfield out of a record that starts at offset
+
+        :byteOrder: 'little' or 'big' (bits are allocated starting
+            from the least significant bit on little endian platforms
+            and from the most significant one on big endian ones)
+        """
+        start=offset+self.offset
+        raw=int.from_bytes(bytes(data[start:start+self.size]),byteOrder) # type: ignore # noqa: E501 # pylint: disable=line-too-long
+        numBits=self.numBits or 0
+        shift=self.bitOffset
+        if byteOrder=='big':
+            shift=self.size*8-self.bitOffset-numBits
+        value=(raw>>shift)&((1<<numBits)-1)
+        if self.kind=='bool':
+            return bool(value)
+        if self.signed and numBits and value>>(numBits-1):
+            value-=1<<numBits
+        return value
+
+    def bitfieldValues(self,
+        data:typing.Any,
+        offset:int,
+        byteOrder:str,
+        prefix:str=''
+        )->typing.Generator[typing.Tuple[str,typing.Any],None,None]:
+        """
+        yield (flatFieldName,value) for this bitfield, or for
+        all bitfields within this field if it is a struct
+        """
+        if self.isBitfield:
+            yield (prefix+self.name,self.bitfieldValue(data,offset,byteOrder))
+        elif self.layout is not None:
+            for i,idx in enumerate(self._indices(self.dims)):
+                for f in self.layout.fields:
+                    yield from f.bitfieldValues(data,
+                        offset+self.offset+i*self.elementSize,byteOrder,
+                        f'{prefix}{self.name}{idx}.')
+
+    def _indices(self,dims:typing.Tuple[int,...]
+        )->typing.Generator[str,None,None]:
+        """
+        yield "[0][0]","[0][1]",... for the given dims
+        """
+        if not dims:
+            yield ''
+            return
+        for i in range(dims[0]):
+            for rest in self._indices(dims[1:]):
+                yield f'[{i}]{rest}'
+
+    def structFormat(self,byteOrder:str)->typing.Tuple[str,typing.List[str]]:
+        """
+        returns (structFormat,flatFieldNames) for this field
+        """
+        if self.layout is not None:
+            fmts=[]
+            names=[]
+            for idx in self._indices(self.dims):
+                fmt,subNames=self.layout.structFormat(byteOrder)
+                fmts.append(fmt)
+                names.extend([f'{self.name}{idx}.{n}' for n in subNames])
+            return (''.join(fmts),names)
+        if self.isCharArray:
+            strLen=self.dims[-1]
+            idxs=list(self._indices(self.dims[:-1]))
+            return (f'{strLen}s'*len(idxs),[f'{self.name}{i}' for i in idxs])
+        fmt=_structFmtChar(self.kind,self.signed,self.elementSize)
+        if not self.dims:
+            return (fmt,[self.name])
+        if self.kind=='raw':
+            fmt=fmt*self.count
+        else:
+            fmt=f'{self.count}{fmt}'
+        return (fmt,[f'{self.name}{i}' for i in self._indices(self.dims)])
+
+    def numpyFormat(self,byteOrder:str)->typing.Any:
+        """
+        numpy dtype format for this field
+        """
+        if self.layout is not None:
+            fmt=self.layout.dtype
+        elif self.isCharArray:
+            fmt=f'S{self.dims[-1]}'
+            if len(self.dims)>1:
+                return (fmt,self.dims[:-1])
+            return fmt
+        else:
+            fmt=_numpyFmt(self.kind,self.signed,self.elementSize,byteOrder)
+        if self.dims:
+            return (fmt,self.dims)
+        return fmt
+
+    def __repr__(self):
+        if self.isBitfield:
+            return f'{self.typeName} {self.name}:{self.numBits}; // offset={self.offset} bit={self.bitOffset} size={self.size}' # noqa: E501 # pylint: disable=line-too-long
+        dims=''.join([f'[{d}]' for d in self.dims])
+        if '(*)' in self.typeName:
+            # function pointer, eg "int (*callback)(int)"
+            decl=self.typeName.replace('(*)',f'(*{self.name}{dims})',1)
+            return f'{decl}; // offset={self.offset} size={self.size}'
+        return f'{self.typeName} {self.name}{dims}; // offset={self.offset} size={self.size}' # noqa: E501 # pylint: disable=line-too-long
+
+
+class CStructLayout:
+    """
+    The computed memory layout of a c struct (or union)
+
+    Also acts as a compiled decoder for binary records
+    of this struct type.
+    """
+
+    def __init__(self,
+        name:str,
+        fields:typing.List[CStructField],
+        size:int,
+        alignment:int,
+        abi:CAbi,
+        isUnion:bool=False):
+        """ """
+        self.name=name
+        self.fields=fields
+        self.size=size
+        self.alignment=alignment
+        self.abi=abi
+        self.isUnion=isUnion
+        self._struct:typing.Optional[struct.Struct]=None
+        self._flatFieldNames:typing.Optional[typing.List[str]]=None
+        self._dtype:typing.Any=None
+
+    def offsetof(self,fieldName:str)->int:
+        """
+        get the offset of a field
+        """
+        for f in self.fields:
+            if f.name==fieldName:
+                return f.offset
+        raise KeyError(fieldName)
+
+    def structFormat(self,byteOrder:str)->typing.Tuple[str,typing.List[str]]:
+        """
+        returns (structFormat,flatFieldNames) not including byte order
+
+        NOTE: the struct module can't decode the same bytes twice,
+        so a union is decoded as its first member (as a c initializer
+        would be) and bitfields are left to unpack()
+        """
+        fmts=[]
+        names=[]
+        pos=0
+        for f in self.fields:
+            if not f.count or f.isBitfield:
+                continue # flexible array member, eg "int data[]"
+            if f.offset<pos:
+                continue # overlaps an earlier union member
+            if f.offset>pos:
+                fmts.append(f'{f.offset-pos}x')
+            fmt,fNames=f.structFormat(byteOrder)
+            fmts.append(fmt)
+            names.extend(fNames)
+            pos=f.offset+f.size
+        if self.size>pos:
+            fmts.append(f'{self.size-pos}x')
+        return (''.join(fmts),names)
+
+    @property
+    def formatString(self)->str:
+        """
+        a python struct module format string for this struct
+        including all padding
+        """
+        return self.struct.format
+
+    @property
+    def struct(self)->struct.Struct:
+        """
+        precompiled python struct decoder for this struct
+
+        NOTE: values come out flattened, see flatFieldNames
+        """
+        if self._struct is None:
+            fmt,self._flatFieldNames=self.structFormat(
+                self.abi.structByteOrder)
+            self._struct=struct.Struct(self.abi.structByteOrder+fmt)
+        return self._struct
+
+    @property
+    def flatFieldNames(self)->typing.List[str]:
+        """
+        the name of each value that comes out of the struct decoder
+        eg ["id","pos.x","pos.y","samples[0]","samples[1]"]
+        """
+        if self._flatFieldNames is None:
+            _=self.struct
+        return self._flatFieldNames # type: ignore
+
+    @property
+    def dtype(self)->typing.Any:
+        """
+        numpy structured dtype for this struct
+
+        (requires numpy)
+        """
+        if self._dtype is None:
+            import numpy as np
+            byteOrder=self.abi.numpyByteOrder
+            fields=[f for f in self.fields
+                if f.count and not f.isBitfield]
+            self._dtype=np.dtype({
+                'names':[f.name for f in fields],
+                'formats':[f.numpyFormat(byteOrder) for f in fields],
+                'offsets':[f.offset for f in fields],
+                'itemsize':self.size})
+        return self._dtype
+
+    def unpack(self,data:typing.Any,offset:int=0)->typing.Dict[str,typing.Any]:
+        """
+        decode a single record into {flatFieldName:value}
+
+        (bitfields are included too, eg {"flags.ready":True})
+        """
+        values=self.struct.unpack_from(data,offset)
+        ret=dict(zip(self.flatFieldNames,values))
+        for f in self.fields:
+            ret.update(f.bitfieldValues(data,offset,self.abi.byteOrder))
+        return ret
+
+    def iterUnpack(self,data:typing.Any
+        )->typing.Iterator[typing.Tuple[typing.Any,...]]:
+        """
+        decode back-to-back records as flat tuples
+        (any trailing partial record is ignored)
+        """
+        usable=len(data)-len(data)%self.size
+        return self.struct.iter_unpack(memoryview(data)[0:usable])
+
+    def readRecords(self,
+        filename:str,
+        count:typing.Optional[int]=None,
+        offset:int=0)->typing.Any:
+        """
+        read back-to-back records from a binary file using a memory map
+
+        If numpy is available, returns a read-only memory-mapped
+        structured array (nothing is read until it is accessed),
+        otherwise returns a list of flat tuples (see flatFieldNames).
+
+        :count: max number of records to read (None=all of them)
+        :offset: byte offset within the file where the records start
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            np=None
+        with open(filename,'rb') as f:
+            f.seek(0,2)
+            available=(f.tell()-offset)//self.size
+            if count is None or count>available:
+                count=available
+            if count<=0:
+                return [] if np is None else np.empty(0,dtype=self.dtype)
+            if np is not None:
+                return np.memmap(f,dtype=self.dtype,mode='r',
+                    offset=offset,shape=(count,))
+            with mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ) as mm:
+                view=memoryview(mm)[offset:offset+count*self.size]
+                try:
+                    return list(self.struct.iter_unpack(view))
+                finally:
+                    view.release()
+
+    def __repr__(self):
+        keyword='union' if self.isUnion else 'struct'
+        ret=[f'{keyword} {self.name} {{ // size={self.size} align={self.alignment}'] # noqa: E501 # pylint: disable=line-too-long
+        ret.extend([f'    {f!r}' for f in self.fields])
+        ret.append('};')
+        return '\n'.join(ret)
+
+
+_structStartRe=re.compile(
+    r"""(?P<pragma>#\s*pragma\s+pack\s*\((?P<pack>[^)]*)\))|"""
+    r"""(?P<typedef>\btypedef\s+)?\b(?P<kind>struct|union)\s+(?P<attrs>(?:__attribute__\s*\(\(.*?\)\)\s*)*)(?P<name>[A-Za-z_][A-Za-z0-9_]*)?\s*\{""", # noqa: E501 # pylint: disable=line-too-long
+    re.DOTALL)
+_memberRe=re.compile(
+    r"""^(?P<type>.*?)(?P<pointer>[*\s]*?)\s*\b(?P<name>[A-Za-z_][A-Za-z0-9_]*)\s*(?P<dims>(?:\[[^\]]*\]\s*)*)(?P<bits>:.+)?$""", # noqa: E501 # pylint: disable=line-too-long
+    re.DOTALL)
+_funcPtrRe=re.compile(
+    r"""^(?P<type>[^()]*?)\(\s*\*\s*(?P<name>[A-Za-z_][A-Za-z0-9_]*)\s*(?P<dims>(?:\[[^\]]*\]\s*)*)\)\s*(?P<signature>[(\[].*)$""", # noqa: E501 # pylint: disable=line-too-long
+    re.DOTALL)
+_unnamedBitsRe=re.compile(r"""^(?P<type>[^:]*?)\s*:(?P<bits>.+)$""",re.DOTALL) # noqa: E501 # pylint: disable=line-too-long
+_dimRe=re.compile(r"""\[([^\]]*)\]""")
+_typedefRe=re.compile(r"""\btypedef\s+(?P<decl>[^;{}()]*);""")
+_funcPtrTypedefRe=re.compile(r"""\btypedef\s+[^;{}()]*\(\s*\*\s*(?P<name>[A-Za-z_][A-Za-z0-9_]*)\s*\)\s*\([^;{}]*\)\s*;""") # noqa: E501 # pylint: disable=line-too-long
+_enumRe=re.compile(r"""\b(?P<typedef>typedef\s+)?enum\s+(?:(?P<name>[A-Za-z_][A-Za-z0-9_]*)\s*)?\{[^}]*\}(?P<trailer>[^;]*);""") # noqa: E501 # pylint: disable=line-too-long
+_attrRe=re.compile(r"""__attribute__\s*\(\((?P<attrs>.*?)\)\)|__packed\b""",re.DOTALL) # noqa: E501 # pylint: disable=line-too-long
+_alignedRe=re.compile(r"""\baligned\s*\(\s*(?P<n>[0-9]+)\s*\)""")
+
+def _matchingBrace(code:str,openPos:int)->int:
+    """
+    given the position of a "{" return the position of its "}"
+    """
+    depth=0
+    for i in range(openPos,len(code)):
+        c=code[i]
+        if c=='{':
+            depth+=1
+        elif c=='}':
+            depth-=1
+            if depth==0:
+                return i
+    raise SyntaxError(f'Unmatched "{{" at position {openPos}')
+
+def _splitTopLevel(code:str,sep:str)->typing.List[str]:
+    """
+    split code on sep, but not within braces or parentheses
+    """
+    ret=[]
+    depth=0
+    start=0
+    for i,c in enumerate(code):
+        if c in '{(':
+            depth+=1
+        elif c in '})':
+            depth-=1
+        elif c==sep and depth==0:
+            ret.append(code[start:i])
+            start=i+1
+    ret.append(code[start:])
+    return ret
+
+def _roundUp(n:int,align:int)->int:
+    """
+    round n up to a multiple of align
+    """
+    return (n+align-1)//align*align
+
+def _isPacked(attrText:str)->bool:
+    """
+    whether attribute text contains a packed attribute
+    """
+    for m in _attrRe.finditer(attrText):
+        if m.group('attrs') is None or 'packed' in m.group('attrs'):
+            return True
+    return False
+
+
+class _StructParser:
+    """
+    Parses struct definitions and computes their layouts
+    """
+
+    def __init__(self,
+        abi:CAbi,
+        constants:typing.Optional[typing.Mapping[str,typing.Any]]=None):
+        """ """
+        self.abi=abi
+        self.constants:typing.Mapping[str,typing.Any]={}
+        if constants is not None:
+            self.constants=constants
+        self.layouts:typing.Dict[str,CStructLayout]={}
+        # {alias:(baseType,isPointer,dims)} for non-struct typedefs
+        self.typedefs:typing.Dict[str,typing.Tuple[str,bool,typing.List[str]]]={} # noqa: E501 # pylint: disable=line-too-long
+        self.enums:typing.Set[str]=set()
+        self.packStack:typing.List[typing.Optional[int]]=[]
+        self.pack:typing.Optional[int]=None
+
+    def _pragmaPack(self,args:str)->None:
+        """
+        handle #pragma pack(...)
+        """
+        params=[a.strip() for a in args.split(',') if a.strip()]
+        if not params:
+            self.pack=None
+            return
+        if params[0]=='push':
+            self.packStack.append(self.pack)
+            if len(params)>1 and params[-1].isdigit():
+                self.pack=int(params[-1])
+        elif params[0]=='pop':
+            self.pack=self.packStack.pop() if self.packStack else None
+        elif params[0].isdigit():
+            self.pack=int(params[0])
+
+    def _dimension(self,text:str)->int:
+        """
+        evaluate an array dimension like "16", "MAX_SAMPLES",
+        or "MAX_SAMPLES*2"
+
+        (an empty dimension, as in a flexible array member
+        like "int data[]", is 0)
+        """
+        text=text.strip()
+        if not text:
+            return 0
+        if text in self.constants:
+            return int(self.constants[text])
+        value=evaluateCValue(text,known=self.constants)
+        if not isinstance(value,int):
+            raise ValueError(f'Unable to determine array size "[{text}]"')
+        return int(value)
+
+    def _bitWidth(self,text:str)->int:
+        """
+        evaluate a bitfield width like "3" or "FLAG_BITS"
+        """
+        text=text.strip()
+        value=self.constants.get(text)
+        if value is None:
+            value=evaluateCValue(text,known=self.constants)
+        if not isinstance(value,int):
+            raise ValueError(f'Unable to determine bitfield width ":{text}"')
+        return int(value)
+
+    def _scanTypedefs(self,code:str)->None:
+        """
+        find all enums and non-struct typedefs, eg
+            "typedef unsigned int u32;"
+            "typedef enum {RED,GREEN} Color;"
+            "typedef void (*Callback)(int);"
+        """
+        for m in _funcPtrTypedefRe.finditer(code):
+            self.typedefs[m.group('name')]=('void',True,[])
+        for m in _enumRe.finditer(code):
+            if m.group('name') is not None:
+                self.enums.add(m.group('name'))
+            if m.group('typedef') is not None:
+                for alias in _attrRe.sub(' ',m.group('trailer')).split(','):
+                    alias=alias.strip()
+                    if alias:
+                        self.typedefs[alias.lstrip('*').strip()]=(
+                            'enum',alias[0]=='*',[])
+        for m in _typedefRe.finditer(code):
+            baseType=''
+            decls=_attrRe.sub(' ',m.group('decl'))
+            for i,decl in enumerate(decls.split(',')):
+                decl=decl.strip()
+                if i==0:
+                    mm=_memberRe.match(decl)
+                    if mm is None:
+                        break
+                    baseType=mm.group('type')
+                    decl=decl[len(baseType):]
+                mm=_memberRe.match(f'x {decl}')
+                if mm is None or not baseType.strip():
+                    continue
+                pointer='*' in mm.group('pointer') or '*' in mm.group('type')
+                self.typedefs[mm.group('name')]=(baseType,pointer,
+                    _dimRe.findall(mm.group('dims')))
+
+    def _resolveTypedef(self,typeName:str
+        )->typing.Tuple[str,bool,typing.Tuple[int,...]]:
+        """
+        follow typedefs down to the underlying type
+
+        returns (canonicalTypeName,isPointer,extraDims)
+        where extraDims come from array typedefs
+        """
+        dims:typing.Tuple[int,...]=()
+        seen=set()
+        while typeName in self.typedefs and typeName not in seen:
+            seen.add(typeName)
+            baseType,pointer,dimTexts=self.typedefs[typeName]
+            if pointer:
+                return (typeName,True,dims)
+            dims=dims+tuple([self._dimension(d) for d in dimTexts])
+            typeName=_canonicalTypeName(baseType)
+        return (typeName,False,dims)
+
+    def _primitive(self,typeName:str)->typing.Tuple[str,bool,int,int]:
+        """
+        returns (kind,signed,size,alignment) for a primitive type
+        """
+        m=_stdintRe.fullmatch(typeName)
+        if m is not None:
+            ct=IntegralCType(int(m.group('numBits')),not m.group('unsigned'))
+            # alignment comes from whatever the abi uses to house it
+            # (eg, int64_t is only 4-byte aligned on i386)
+            for housing in ('char','short','int','long long'):
+                size,align=self.abi.sizeAndAlignment(housing)
+                if size==ct.numBytes:
+                    return ('int',ct.signed,size,align)
+            return ('int',ct.signed,ct.numBytes,ct.numBytes)
+        prim=_primitives.get(typeName)
+        if prim is None:
+            raise KeyError(f'Unknown c type "{typeName}"')
+        size,align=self.abi.sizeAndAlignment(prim.name)
+        if prim.numBits:
+            size=align=IntegralCType(prim.numBits,prim.signed).numBytes
+        return (prim.kind,prim.signed,size,align)
+
+    def parse(self,code:str)->typing.Dict[str,CStructLayout]:
+        """
+        parse all struct (and union) definitions in a (comment-free)
+        block of code
+        """
+        self._scanTypedefs(code)
+        pos=0
+        while True:
+            m=_structStartRe.search(code,pos)
+            if m is None:
+                break
+            if m.group('pragma') is not None:
+                self._pragmaPack(m.group('pack'))
+                pos=m.end()
+                continue
+            close=_matchingBrace(code,m.end()-1)
+            end=code.find(';',close)
+            if end<0:
+                end=len(code)
+            trailer=code[close+1:end]
+            packed=_isPacked(m.group('attrs') or '') or _isPacked(trailer)
+            name=m.group('name')
+            layout=self._layout(name or '',code[m.end():close],packed,
+                m.group('kind')=='union')
+            if name:
+                self.layouts[name]=layout
+            if m.group('typedef') is not None:
+                for alias in _attrRe.sub(' ',trailer).split(','):
+                    alias=alias.strip()
+                    if alias and alias[0]!='*':
+                        self.layouts[alias]=layout
+            pos=end+1
+        return self.layouts
+
+    def _layout(self,
+        name:str,
+        body:str,
+        packed:bool=False,
+        isUnion:bool=False)->CStructLayout:
+        """
+        compute the layout for a struct (or union) body
+        """
+        maxAlign=self.pack
+        if packed:
+            maxAlign=1
+        fields:typing.List[CStructField]=[]
+        bitPos=0 # counted in bits, since bitfields can share bytes
+        unit:typing.Optional[typing.Tuple[int,int]]=None
+        end=0
+        structAlign=1
+        for member in _splitTopLevel(body,';'):
+            member=member.strip()
+            if not member:
+                continue
+            for field in self._members(member):
+                align=field.alignment
+                if field.numBits==0 and not self.abi.msBitfields:
+                    pass # gcc doesn't pack zero-width bitfields
+                elif field.isBitfield and self.pack is not None:
+                    # (for bitfields, #pragma pack wins over packed)
+                    align=min(align,self.pack)
+                elif maxAlign is not None:
+                    align=min(align,maxAlign)
+                field.alignment=align
+                if isUnion:
+                    bitPos,unit=0,None
+                if field.isBitfield:
+                    endsUnit=unit is not None
+                    bitPos,unit=self._placeBitfield(field,bitPos,unit,
+                        maxAlign is not None)
+                    if self.abi.msBitfields:
+                        # msvc ignores zero-width ones that don't end a unit
+                        affectsAlign=bool(field.numBits) or endsUnit
+                    else:
+                        # gcc ignores unnamed ones
+                        affectsAlign=bool(field.numBits and field.name)
+                    if affectsAlign:
+                        structAlign=max(structAlign,align)
+                else:
+                    if unit is not None:
+                        bitPos=unit[0]+unit[1]
+                        unit=None
+                    field.offset=_roundUp((bitPos+7)//8,align)
+                    bitPos=(field.offset+field.size)*8
+                    structAlign=max(structAlign,align)
+                if unit is not None and not isUnion:
+                    end=max(end,unit[0]+unit[1])
+                end=max(end,bitPos)
+                if field.name:
+                    fields.append(field)
+                elif field.layout is not None:
+                    # members of an anonymous struct/union are our members
+                    for f in field.layout.fields:
+                        f=copy.copy(f)
+                        f.offset+=field.offset
+                        fields.append(f)
+        size=_roundUp((end+7)//8,structAlign)
+        return CStructLayout(name,fields,size,structAlign,self.abi,isUnion)
+
+    def _placeBitfield(self,
+        field:CStructField,
+        bitPos:int,
+        unit:typing.Optional[typing.Tuple[int,int]],
+        packed:bool
+        )->typing.Tuple[int,typing.Optional[typing.Tuple[int,int]]]:
+        """
+        place a bitfield at or after bitPos
+
+        :field: the bitfield, whose size is still that of its declared type
+        :unit: the open msvc storage unit as (startBit,numBits)
+        :packed: whether the packed attribute or #pragma pack is in effect
+
+        returns (bitPos,unit) for whatever comes next
+        """
+        numBits=field.numBits or 0
+        typeBits=field.size*8
+        alignBits=field.alignment*8
+        if self.abi.msBitfields:
+            # msvc houses bitfields in a unit of the declared type and
+            # starts a new one when the type size changes or it is full
+            if unit is not None:
+                full=bitPos+numBits>unit[0]+unit[1]
+                if full or not numBits or unit[1]!=typeBits:
+                    bitPos=unit[0]+unit[1]
+                    unit=None
+                    if not numBits:
+                        bitPos=_roundUp(bitPos,alignBits)
+            if not numBits:
+                return (bitPos,None)
+            if unit is None:
+                bitPos=_roundUp(bitPos,alignBits)
+                unit=(bitPos,typeBits)
+        elif not numBits:
+            bitPos=_roundUp(bitPos,alignBits)
+        elif not packed:
+            # gcc lets a bitfield share bytes with whatever precedes it
+            # so long as it doesn't span more alignment units than its type
+            spans=(bitPos%alignBits+numBits+alignBits-1)//alignBits
+            if spans>typeBits//alignBits:
+                bitPos=_roundUp(bitPos,alignBits)
+        field.offset=bitPos//8
+        field.bitOffset=bitPos%8
+        field.size=(field.bitOffset+numBits+7)//8
+        return (bitPos+numBits,unit)
+
+    def _isTypeName(self,text:str)->bool:
+        """
+        whether text names a type (rather than declaring a member)
+        """
+        typeName=_canonicalTypeName(text)
+        if typeName in _primitives or typeName in self.typedefs:
+            return True
+        if _stdintRe.fullmatch(typeName) is not None:
+            return True
+        return typeName=='enum' or typeName.startswith('enum ')
+
+    def _members(self,member:str)->typing.Generator[CStructField,None,None]:
+        """
+        yield the fields from a member declaration like
+            "unsigned int a,b[4]"
+            "unsigned int flag:1,:7"
+            "int (*callback)(int)"
+            "union {int i; float f;} value"
+
+        (unnamed bitfields and anonymous structs/unions come out
+        with no name)
+        """
+        explicitAlign=0
+        for attr in _attrRe.finditer(member):
+            aligned=_alignedRe.search(attr.group('attrs') or '')
+            if aligned is not None:
+                explicitAlign=int(aligned.group('n'))
+        member=_attrRe.sub(' ',member)
+        nested:typing.Optional[CStructLayout]=None
+        baseType:typing.Optional[str]=None
+        if '{' in member:
+            openPos=member.index('{')
+            close=_matchingBrace(member,openPos)
+            declarators=member[close+1:]
+            if re.match(r"""\s*enum\b""",member):
+                # inline enum definition, eg "enum {RED,GREEN} color"
+                baseType='enum'
+            else:
+                # inline struct definition, eg "struct {int x,y;} pos"
+                isUnion=re.match(r"""\s*union\b""",member) is not None
+                nested=self._layout('',member[openPos+1:close],
+                    isUnion=isUnion)
+                baseType='union' if isUnion else 'struct'
+                if not declarators.strip():
+                    yield self._field('',baseType,False,(),nested,
+                        explicitAlign)
+                    return
+        else:
+            declarators=member
+        for decl in _splitTopLevel(declarators,','):
+            decl=decl.strip()
+            if not decl:
+                continue
+            m=_funcPtrRe.match(decl)
+            if m is not None:
+                # function pointer, eg "int (*callback)(int)"
+                if baseType is None:
+                    baseType=m.group('type')
+                field=self._field(m.group('name'),baseType,True,
+                    self._dims(m.group('dims')),None,explicitAlign)
+                field.typeName=f"{_canonicalTypeName(baseType)} (*){m.group('signature')}" # noqa: E501 # pylint: disable=line-too-long
+                yield field
+                continue
+            if baseType is None:
+                m=_unnamedBitsRe.match(decl)
+                if m is None or not self._isTypeName(m.group('type')):
+                    m=_memberRe.match(decl)
+                    if m is None:
+                        raise SyntaxError(f'Unable to parse struct member "{decl}"') # noqa: E501 # pylint: disable=line-too-long
+                baseType=m.group('type')
+                decl=decl[len(baseType):].strip()
+            if decl.startswith(':'):
+                # unnamed bitfield, eg "int :3", which only takes up space
+                yield self._field('',baseType,False,(),nested,
+                    explicitAlign,self._bitWidth(decl[1:]))
+                continue
+            m=_memberRe.match(f'x {decl}')
+            if m is None:
+                raise SyntaxError(f'Unable to parse struct member "{decl}"')
+            numBits=None
+            if m.group('bits') is not None:
+                numBits=self._bitWidth(m.group('bits')[1:])
+            pointer='*' in m.group('pointer') or '*' in m.group('type')
+            yield self._field(m.group('name'),baseType,pointer,
+                self._dims(m.group('dims')),nested,explicitAlign,numBits)
+
+    def _dims(self,dimsText:str)->typing.Tuple[int,...]:
+        """
+        evaluate array dimensions like "[2][MAX_SAMPLES]"
+        """
+        return tuple([self._dimension(d) for d in _dimRe.findall(dimsText)])
+
+    def _field(self,
+        name:str,
+        baseType:str,
+        pointer:bool,
+        dims:typing.Tuple[int,...],
+        nested:typing.Optional[CStructLayout],
+        explicitAlign:int,
+        numBits:typing.Optional[int]=None)->CStructField:
+        """
+        create a field (offset is filled in later)
+        """
+        typeName=_canonicalTypeName(baseType.replace('*',' '))
+        layout=None
+        signed=True
+        if pointer:
+            kind,signed,size,align=self._primitive('pointer')
+            typeName=typeName+' *'
+        elif nested is not None:
+            layout=nested
+            kind,size,align=baseType,nested.size,nested.alignment
+        else:
+            structName,pointer,extraDims=self._resolveTypedef(typeName)
+            dims=dims+extraDims
+            for keyword in ('struct ','union '):
+                if structName.startswith(keyword):
+                    structName=structName[len(keyword):].strip()
+            if pointer:
+                kind,signed,size,align=self._primitive('pointer')
+            elif structName in self.layouts:
+                layout=self.layouts[structName]
+                kind='union' if layout.isUnion else 'struct'
+                size,align=layout.size,layout.alignment
+            elif structName in self.enums or structName=='enum' \
+                    or structName.startswith('enum '):
+                # enums are housed in an int
+                kind,signed,size,align=self._primitive('int')
+            else:
+                kind,signed,size,align=self._primitive(structName)
+        align=max(align,explicitAlign)
+        count=1
+        for d in dims:
+            count*=d
+        return CStructField(name,typeName,0,size*count,align,
+            dims,kind,signed,layout,numBits)
+
+
+def parseCStructs(
+    cCode:str,
+    abi:CAbi=ABI_NATIVE,
+    constants:typing.Optional[typing.Mapping[str,typing.Any]]=None
+    )->typing.Dict[str,CStructLayout]:
+    """
+    Compute layouts for all struct and union definitions in a block of c code.
+
+    :abi: the platform to compute sizes/alignments for
+    :constants: known values used for array sizes (eg, loadCEnums()[None])
+
+    returns {name:CStructLayout} (typedef names are included too)
+    """
+    return _StructParser(abi,constants).parse(cppRemoveComments(cCode))
+
+def loadCStructs(
+    filename:str,
+    abi:CAbi=ABI_NATIVE,
+    constants:typing.Optional[typing.Mapping[str,typing.Any]]=None
+    )->typing.Dict[str,CStructLayout]:
+    """
+    Compute layouts for all struct and union definitions in a c file.
+
+    :abi: the platform to compute sizes/alignments for
+    :constants: known values used for array sizes (eg, loadCEnums()[None])
+
+    returns {name:CStructLayout} (typedef names are included too)
+    """
+    with open(filename,'r',encoding="utf-8") as f:
+        cCode=f.read()
+    return parseCStructs(cCode,abi,constants)
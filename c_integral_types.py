@@ -60,8 +60,8 @@ class IntegralCType:
         the actual max value based on the number of bits
         """
         if self.signed:
-            return pow(2,self.numBits)//2
-        return pow(2,self.numBits)
+            return pow(2,self.numBits-1)-1
+        return pow(2,self.numBits)-1
 
     @property
     def minValue(self)->int:
@@ -69,7 +69,7 @@ class IntegralCType:
         the actual min value based on the number of bits
         """
         if self.signed:
-            return pow(2,self.numBits)//2-1
+            return -pow(2,self.numBits-1)
         return 0
 
     @property
@@ -102,15 +102,15 @@ class IntegralCType:
     @property
     def printfString(self)->str:
         """
-        get a string to be used in a scanf, eg
-            printf(scanfString,val);
+        get a string to be used in a printf, eg
+            printf(printfString,val);
 
         NOTE: scanf string and printf
             string may not always be the same
         """
         pLen=self._printfLengthSpec
         if self.baseFormat=='oct':
-            return f'0%0{self.numBits<<2}{pLen}o'
+            return f'0%0{ceil(self.numBits/3)}{pLen}o'
         if self.baseFormat=='hex':
             if self.preferCaps:
                 return f'0x%0{self.numBytes<<1}{pLen}X'
@@ -137,8 +137,8 @@ class IntegralCType:
         if self.signed:
             prefix=''
         else:
-            prefix='1'
-        return f'{prefix}int{goal}{self.fullNumBits}'
+            prefix='u'
+        return f'{prefix}int{goal}{self.fullNumBits}_t'
 
     @property
     def cMinValueName(self)->str:
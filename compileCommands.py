@@ -1,9 +1,175 @@
 """
 Tools for managing compile commands
+
+The command line is only broken down once (per unique command
+and baseDir) into an immutable ParsedCompileCommand, so that
+tools going through thousands of compile commands, most of which
+are the same, don't keep reparsing them.
 """
 import typing
 import os
-from includes import headersAvailable
+from .includes import headersAvailable
+from .lruCache import LruCache
+from .instrumentation import instrumented
+
+
+class ParsedCompileCommand(typing.NamedTuple):
+    """
+    Everything useful that was pulled out of a compile command line
+
+    (this is immutable so that it can be shared by everything
+    using the same command)
+    """
+    compiler:str=''
+    # include directories, in command line order, by kind
+    iquoteDirs:typing.Tuple[str,...]=() # -iquote
+    includeDirs:typing.Tuple[str,...]=() # -I
+    systemDirs:typing.Tuple[str,...]=() # -isystem
+    afterDirs:typing.Tuple[str,...]=() # -idirafter
+    # ((name,value),...) left defined after all -D and -U flags
+    defines:typing.Tuple[typing.Tuple[str,str],...]=()
+    # names left undefined by -U flags
+    undefines:typing.Tuple[str,...]=()
+    standard:typing.Optional[str]=None # eg "c11" from -std=c11
+    target:typing.Optional[str]=None # eg "arm-none-eabi" from --target
+
+    @property
+    def includePaths(self)->typing.Tuple[str,...]:
+        """
+        all include directories in the order the compiler
+        searches them for a #include "quoted" header
+        (-iquote, -I, -isystem, then -idirafter, without duplicates)
+        """
+        return tuple(dict.fromkeys(self.iquoteDirs+self.includeDirs+
+            self.systemDirs+self.afterDirs))
+
+    @property
+    def systemIncludePaths(self)->typing.Tuple[str,...]:
+        """
+        all include directories in the order the compiler
+        searches them for a #include <bracketed> header
+        (-I, -isystem, then -idirafter, without duplicates)
+        """
+        return tuple(dict.fromkeys(self.includeDirs+
+            self.systemDirs+self.afterDirs))
+
+
+# flags that take a directory, either attached or as the next arg
+_includeDirFlags:typing.Dict[str,str]={
+    '-iquote':'iquoteDirs',
+    '-isystem':'systemDirs',
+    '-idirafter':'afterDirs',
+    '-I':'includeDirs'}
+
+parsedCommandCache:'LruCache[typing.Tuple[str,str],ParsedCompileCommand]'=LruCache( # noqa: E501 # pylint: disable=line-too-long
+    4096,'compileCommands.parseCompileCommand')
+
+def parseCompileCommand(compileCommand:str,baseDir:str)->ParsedCompileCommand:
+    """
+    break down a compile command line
+
+    (if the command's quoting is broken, eg an unterminated quote,
+    it is split on whitespace rather than raising)
+
+    Results are cached (see parsedCommandCache) so repeated
+    commands are only parsed once
+
+    :baseDir: the directory relative include paths are relative to
+    """
+    return parsedCommandCache.getOrCompute((compileCommand,baseDir),
+        lambda:_parseCompileCommand(compileCommand,baseDir))
+
+@instrumented('compileCommands.parseCompileCommand',sizeArg=0)
+def _parseCompileCommand(compileCommand:str,baseDir:str
+    )->ParsedCompileCommand:
+    """
+    the uncached part of parseCompileCommand()
+    """
+    args=_splitCommandLine(compileCommand,os.sep=='/')
+    dirs:typing.Dict[str,typing.List[str]]={
+        kind:[] for kind in _includeDirFlags.values()}
+    defines:typing.Dict[str,str]={}
+    undefines:typing.Dict[str,None]={}
+    standard=None
+    target=None
+    # (the command may be only flags, without a compiler)
+    compiler=''
+    if args and not args[0].startswith('-'):
+        compiler=args[0]
+    i=1 if compiler else 0
+    while i<len(args):
+        arg=args[i]
+        i+=1
+        if not arg.startswith('-'):
+            continue
+        for flag,kind in _includeDirFlags.items():
+            if arg.startswith(flag):
+                value=arg[len(flag):]
+                if not value and i<len(args):
+                    value=args[i]
+                    i+=1
+                if value and value!='-': # -I- is an obsolete separator
+                    dirs[kind].append(_resolvePath(value,baseDir))
+                break
+        else:
+            if arg in ('-D','-U','-target','--target','-std','--std') \
+                    and i<len(args):
+                value=args[i]
+                i+=1
+            else:
+                value=arg[2:]
+            if arg.startswith('-D') and value:
+                kv=value.split('=',1)
+                defines.pop(kv[0],None) # so it is ordered by the last -D
+                defines[kv[0]]=kv[1] if len(kv)>1 else '1'
+                undefines.pop(kv[0],None)
+            elif arg.startswith('-U') and value:
+                defines.pop(value,None)
+                undefines[value]=None
+            elif arg in ('-std','--std') or \
+                    arg.startswith(('-std=','--std=')):
+                standard=value.split('=',1)[-1]
+            elif arg in ('-target','--target') or \
+                    arg.startswith('--target='):
+                target=value.split('=',1)[-1]
+    return ParsedCompileCommand(
+        compiler,
+        tuple(dirs['iquoteDirs']),
+        tuple(dirs['includeDirs']),
+        tuple(dirs['systemDirs']),
+        tuple(dirs['afterDirs']),
+        tuple(defines.items()),
+        tuple(undefines),
+        standard,target)
+
+def _splitCommandLine(commandLine:str,posix:bool)->typing.List[str]:
+    """
+    split a command line into args the way a shell would
+
+    NOTE: if the quoting is broken (eg, an unterminated quote)
+        this falls back to splitting on whitespace
+    """
+    import shlex
+    try:
+        args=shlex.split(commandLine,posix=posix)
+    except ValueError:
+        return commandLine.split()
+    if not posix:
+        # non-posix mode keeps the quotes, eg "path with spaces"
+        args=[arg[1:-1] if len(arg)>1 and arg[0]==arg[-1] and
+            arg[0] in '"\'' else arg for arg in args]
+    return args
+
+def _resolvePath(path:str,baseDir:str)->str:
+    """
+    make a path from a compile command absolute
+    """
+    if os.sep!='/':
+        path=path.replace('/',os.sep)
+    path=os.path.expandvars(path)
+    if not os.path.isabs(path):
+        path=os.path.join(baseDir,path)
+    return os.path.normpath(path)
 
 
 class CompileCommand:
@@ -21,42 +187,62 @@ class CompileCommand:
         self.compileCommand=compileCommand
 
     @property
-    def includePaths(self)->typing.Generator[str,None,None]:
+    def parsed(self)->ParsedCompileCommand:
         """
-        Yield up a list of include paths found in the command
+        the broken down command line
+
+        (shared with every other CompileCommand with
+        the same command and baseDir)
         """
-        for p in self.compileCommand.split(' -I')[1:]:
-            p=p[2:]
-            if p[0]=='"':
-                p=p.split('"',2)[1]
-            else:
-                p=p.split(' ',1)[0]
-            if os.sep!='/':
-                p=p.replace('/',os.sep)
-            p=os.path.expandvars(p)
-            if p[0]!='/' and p[1]!=':':
-                p=f'{self.baseDir}{os.sep}{p}'
-            yield os.path.normpath(p)
+        return parseCompileCommand(self.compileCommand,self.baseDir)
 
-    def compile(self,*args,**kwargs)->typing.Tuple[int,str]:
+    @property
+    def includePaths(self)->typing.Tuple[str,...]:
         """
-        run the compile command
+        All include paths found in the command,
+        in the order the compiler searches them
+        """
+        return self.parsed.includePaths
+
+    @property
+    def defines(self)->typing.Dict[str,str]:
+        """
+        All macros defined (and not later undefined)
+        by -D and -U flags in the command
+
+        returns {name:value}
+        """
+        return dict(self.parsed.defines)
+
+    @property
+    def standard(self)->typing.Optional[str]:
+        """
+        the language standard (eg "c11"), if specified
+        """
+        return self.parsed.standard
+
+    @property
+    def target(self)->typing.Optional[str]:
+        """
+        the target triple (eg "arm-none-eabi"), if specified
+        """
+        return self.parsed.target
+
+    def commandLine(self,*args,**kwargs)->str:
+        """
+        get the full command line that compile() would run
 
         any extra params will attempt to be
         added to the compile command, such as
             cc=CompileCommand("gcc")
-            compile(self,"foo.c","bar.out",I="../includes")
-            "gcc -I../Includes foo.c bar.out"
-        (But it's generally better to include that stuff in the
-        original compile command so you're sure to get it the
-        way you want intend to!)
-
-        returns (return_code,output)
+            cc.commandLine("foo.c","bar.out",I="../includes")
+            "gcc -I../includes foo.c bar.out"
         """
-        import subprocess
+        import shlex
+        quote=shlex.quote if os.sep=='/' else lambda x:f'"{x}"' if ' ' in x else x # noqa: E501 # pylint: disable=line-too-long
         cmd=[self.compileCommand]
         if kwargs:
-            for k,v in kwargs:
+            for k,v in kwargs.items():
                 k=str(k)
                 if v is None:
                     v=''
@@ -64,22 +250,67 @@ class CompileCommand:
                     v=str(v)
                 if k.startswith('--'):
                     cmd.append(k)
-                    cmd.append(v)
+                    cmd.append(quote(v))
                 elif k.startswith('-'):
-                    cmd.append(k+v)
+                    cmd.append(quote(k+v))
                 elif len(k)==1:
-                    cmd.append(f'-{k}{v}')
+                    cmd.append(quote(f'-{k}{v}'))
                 else:
                     cmd.append(f'--{k}')
-                    cmd.append(v)
+                    cmd.append(quote(v))
         if args:
-            cmd.extend([str(x) for x in args])
-        po=subprocess.Popen(cmd,shell=True,
+            cmd.extend([quote(str(x)) for x in args])
+        return ' '.join(cmd)
+
+    def compile(self,*args,**kwargs)->typing.Tuple[int,str]:
+        """
+        run the compile command
+
+        any extra params will attempt to be
+        added to the compile command, such as
+            cc=CompileCommand("gcc")
+            compile(self,"foo.c","bar.out",I="../includes")
+            "gcc -I../Includes foo.c bar.out"
+        (But it's generally better to include that stuff in the
+        original compile command so you're sure to get it the
+        way you want intend to!)
+
+        returns (return_code,output)
+        """
+        import subprocess
+        po=subprocess.Popen(self.commandLine(*args,**kwargs),shell=True,
             stdout=subprocess.PIPE,stderr=subprocess.STDOUT)
         out,_=po.communicate()
         ret=po.returncode
         out=out.strip().decode('utf-8',errors='ignore')
         return (ret,out)
+
+    async def acompile(self,*args,**kwargs)->typing.Tuple[int,str]:
+        """
+        Same as compile() but without blocking the event loop
+
+        The number of compiles (and other blocking operations)
+        running at once is bounded, see asyncSupport.setConcurrencyLimit()
+
+        returns (return_code,output)
+        """
+        import asyncio
+        from .asyncSupport import concurrencySlot
+        async with concurrencySlot():
+            proc=await asyncio.create_subprocess_shell(
+                self.commandLine(*args,**kwargs),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT)
+            try:
+                out,_=await proc.communicate()
+            except asyncio.CancelledError:
+                # don't leave the compiler running
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+                raise
+        return (proc.returncode or 0,
+            out.strip().decode('utf-8',errors='ignore'))
     run=compile
     def __call__(self,*args,**argv)->typing.Tuple[int,str]:
         """
@@ -103,4 +334,4 @@ class CompileCommand:
         """
         yield all headers available in the include paths
         """
-        yield from headersAvailable(self.baseDir)
+        yield from headersAvailable(self.includePaths)
@@ -0,0 +1,779 @@
+"""
+An incrementally re-parsed c/c++ document, for editors and watch-mode tools
+
+Rather than re-parsing the whole buffer on every keystroke, the document
+keeps per-line lexer state (block comment and brace nesting) and after an
+edit only re-lexes lines until that state converges with what it was before.
+The document is divided into top-level items (declarations, definitions,
+directives) and only the items touched by an edit are re-analyzed, so the
+cost of an edit depends on the size of the item, not the size of the file.
+
+Can do helpful things like:
+    doc=ParsedCppDocument(code)
+    doc.applyEdit(TextEdit(10,4,10,9,'RED_ALT'))
+    doc.enums,doc.functions,doc.scopeAt(12)
+"""
+import typing
+import re
+import collections
+from ._cppTools import cppFunctionInfo
+from .cEnums import parseCEnumTypedefs
+from .macros import MacroTable
+from .preprocessor import evaluateCValue
+
+
+class TextEdit(typing.NamedTuple):
+    """
+    Replace a range of text with new text
+
+    Lines and columns are 0-based and the end is exclusive
+    (the same as the language server protocol)
+    """
+    startLine:int
+    startCol:int
+    endLine:int
+    endCol:int
+    text:str
+
+
+# lexer state at the start of a line is (inBlockComment,braceStack)
+# where braceStack has a "b" for each open brace and a "t" for each
+# transparent one (extern "C" {, namespace x {) that does not
+# count towards the nesting depth
+_LexState=typing.Tuple[bool,str]
+_initialState:_LexState=(False,'')
+_lexRe=re.compile(r"""//|/[*]|"(?:[^"\\]|\\.)*"?|'(?:[^'\\]|\\.)*'?|[{};]""")
+_braceRe=re.compile(r""""(?:[^"\\]|\\.)*"?|'(?:[^'\\]|\\.)*'?|[{};]""")
+_transparentRe=re.compile(r"""(?:\bextern\s*"C(?:\+\+)?"|\bnamespace\b[^;{}"]*)\s*$""") # noqa: E501 # pylint: disable=line-too-long
+_scopeNameRe=re.compile(r"""\b(?P<kind>struct|union|class|enum)\s+(?P<name>[A-Za-z_][A-Za-z0-9_]*)|(?P<func>[A-Za-z_][A-Za-z0-9_:~]*)\s*[(]""") # noqa: E501 # pylint: disable=line-too-long
+_notFunctionRe=re.compile(r"""\s*(?:typedef|struct|union|enum|class|namespace|template|using|return|extern\s*")""") # noqa: E501 # pylint: disable=line-too-long
+# how many times an item's enums can be re-evaluated for a single edit
+_maxReparses=8
+_identifierRe=re.compile(r"""[A-Za-z_][A-Za-z0-9_]*""")
+_defineRe=re.compile(r"""^[ \t]*#[ \t]*define[ \t]+(?P<args>(?P<name>[A-Za-z_][A-Za-z0-9_]*)[^\n]*)""",re.MULTILINE) # noqa: E501 # pylint: disable=line-too-long
+
+def _lexLine(text:str,state:_LexState,prevCode:str
+    )->typing.Tuple[str,_LexState]:
+    """
+    Lex a single line
+
+    :state: the lexer state at the start of the line
+    :prevCode: the last non-blank code before this line
+        (to decide what a "{" at the start of a line belongs to)
+
+    returns (codeWithoutComments,stateAtEndOfLine)
+    """
+    inComment,stack=state
+    out:typing.List[str]=[]
+    outLen=0
+    headerStart=0 # where the code since the last ; { or } starts
+    pos=0
+    n=len(text)
+    while pos<n:
+        if inComment:
+            e=text.find('*/',pos)
+            if e<0:
+                break
+            inComment=False
+            out.append(' ')
+            outLen+=1
+            pos=e+2
+            continue
+        m=_lexRe.search(text,pos)
+        if m is None:
+            out.append(text[pos:])
+            break
+        out.append(text[pos:m.start()])
+        outLen+=m.start()-pos
+        tok=m.group(0)
+        pos=m.end()
+        if tok=='//':
+            break
+        if tok=='/*':
+            inComment=True
+            continue
+        if tok=='{':
+            header=''.join(out)[headerStart:]
+            if not header.strip():
+                header=prevCode
+            stack+='t' if _transparentRe.search(header) else 'b'
+        elif tok=='}':
+            stack=stack[:-1]
+        out.append(tok)
+        outLen+=len(tok)
+        if tok in '{};':
+            headerStart=outLen
+    return (''.join(out),(inComment,stack))
+
+
+class _Line:
+    """
+    A single line of the document and its lexer state
+    """
+    __slots__=('text','code','prevCode','startState','endState',
+        'itemStart','item')
+
+    def __init__(self,text:str):
+        self.text=text
+        self.code=''
+        self.prevCode:typing.Optional[str]=None
+        self.startState:typing.Optional[_LexState]=None
+        self.endState:_LexState=_initialState
+        self.itemStart=False
+        self.item:typing.Optional['_ItemInfo']=None
+
+
+class _ItemInfo:
+    """
+    What a single top-level item contributed to the document
+    """
+    __slots__=('defines','enums','enumCode','enumRefs','parsedAt',
+        'functions','scopes')
+
+    def __init__(self):
+        self.defines:typing.List[str]=[]
+        self.enums:typing.Dict[str,typing.Dict[str,typing.Any]]={}
+        # the code the enums came from and the names their
+        # initializers (may) refer to, to re-evaluate them
+        # when any of those change
+        self.enumCode=''
+        self.enumRefs:typing.FrozenSet[str]=frozenset()
+        self.parsedAt=0
+        self.functions:typing.List[str]=[]
+        # [(kind,name,startLineOffset,endLineOffset)] within the item
+        self.scopes:typing.List[typing.Tuple[str,str,int,int]]=[]
+
+
+class _OwnedTable(typing.Mapping[str,typing.Any]):
+    """
+    {key:value} where each value is owned by the item (line) that
+    contributed it, so that when an item goes away only what it
+    contributed goes with it
+
+    If more than one item contributes the same key, the one
+    latest in the document wins
+    """
+
+    def __init__(self,position:typing.Callable[[_Line],int]):
+        """
+        :position: get the line number of an owner
+            (only called when a key has more than one owner)
+        """
+        self._position=position
+        self._owners:typing.Dict[str,
+            typing.Dict[int,typing.Tuple[_Line,typing.Any]]]={}
+
+    def add(self,owner:_Line,key:str,value:typing.Any)->None:
+        """
+        add a value for a key
+        """
+        self._owners.setdefault(key,{})[id(owner)]=(owner,value)
+
+    def remove(self,owner:_Line,key:str)->None:
+        """
+        remove the value an owner contributed for a key
+        """
+        owners=self._owners.get(key)
+        if owners is not None:
+            owners.pop(id(owner),None)
+            if not owners:
+                del self._owners[key]
+
+    def __getitem__(self,key:str)->typing.Any:
+        owners=self._owners[key]
+        if len(owners)==1:
+            return next(iter(owners.values()))[1]
+        return max(owners.values(),key=lambda ov:self._position(ov[0]))[1]
+
+    def owners(self,key:str)->typing.List[_Line]:
+        """
+        all of the owners that contributed a key
+        """
+        return [owner for owner,_ in self._owners.get(key,{}).values()]
+
+    def __contains__(self,key:typing.Any)->bool:
+        return key in self._owners
+
+    def __iter__(self)->typing.Iterator[str]:
+        return iter(self._owners)
+
+    def __len__(self)->int:
+        return len(self._owners)
+
+
+class ParsedCppDocument:
+    """
+    A c/c++ document that can be edited and
+    only re-parses what each edit affects
+
+    Values that refer to other items (a #define that uses another
+    macro, an enum initializer that uses a #define or another enum's
+    value) are re-evaluated when what they refer to changes, so the
+    document always matches a fresh parse of its text.
+    """
+
+    def __init__(self,code:str=''):
+        self._lines:typing.List[_Line]=[_Line(t) for t in code.split('\n')]
+        self.macros=MacroTable()
+        self._defines=_OwnedTable(self._lines.index)
+        self._enums=_OwnedTable(self._lines.index)
+        self._enumValues=_OwnedTable(self._lines.index)
+        self._functions=_OwnedTable(self._lines.index)
+        # {name:value} of object-like macros, and the macros whose
+        # values need to be evaluated again before it can be used
+        self._defineValues:typing.Dict[str,typing.Any]={}
+        self._dirtyDefines:typing.Set[str]=set()
+        # {enumName:{k:v},None:defineValues} as returned by enums
+        self._enumTable:typing.Dict[typing.Optional[str],
+            typing.Dict[str,typing.Any]]={None:self._defineValues}
+        self._dirtyEnums:typing.Set[str]=set()
+        # {macroName:identifiersInItsBody}
+        self._macroRefs:typing.Dict[str,typing.FrozenSet[str]]={}
+        # {identifier:{macroNames that use it}}
+        self._macroUsers:typing.Dict[str,typing.Set[str]]={}
+        # {identifier:{id(owner):owner}} of items whose enums use it
+        self._enumUsers:typing.Dict[str,typing.Dict[int,_Line]]={}
+        # {name:whenItChanged} of names (macros or enum values) that
+        # changed since the values depending on them were last updated
+        # (when is a counter, so that items that were parsed after
+        # a change don't need to be parsed again)
+        self._changedNames:typing.Dict[str,int]={}
+        self._changedMacros:typing.Dict[str,int]={}
+        self._now=0
+        end=self._relex(0,len(self._lines))
+        self._analyze(0,end)
+        self._propagate()
+
+    @property
+    def text(self)->str:
+        """
+        the full text of the document
+        """
+        return '\n'.join([line.text for line in self._lines])
+
+    @property
+    def code(self)->str:
+        """
+        the full text of the document with all comments removed
+        """
+        return '\n'.join([line.code for line in self._lines])
+
+    @property
+    def lineCount(self)->int:
+        """
+        number of lines in the document
+        """
+        return len(self._lines)
+
+    def line(self,lineNumber:int)->str:
+        """
+        get the text of a single line
+        """
+        return self._lines[lineNumber].text
+
+    @property
+    def enums(self)->typing.Dict[typing.Optional[str],
+            typing.Dict[str,typing.Any]]:
+        """
+        all enums in the same form as loadCEnums()
+            {enumName:{k:v},None:{defineName:value}}
+
+        NOTE: this is the document's own (live) table,
+        so copy it before changing it
+        """
+        self._updateDefines()
+        for name in self._dirtyEnums:
+            if name in self._enums:
+                self._enumTable[name]=self._enums[name]
+            else:
+                self._enumTable.pop(name,None)
+        self._dirtyEnums.clear()
+        return self._enumTable
+
+    @property
+    def defines(self)->typing.Dict[str,typing.Any]:
+        """
+        the final value of every object-like #define
+
+        NOTE: this is the document's own (live) table,
+        so copy it before changing it
+        """
+        self._updateDefines()
+        return self._defineValues
+
+    def _updateDefines(self)->None:
+        """
+        evaluate the macros that changed (or use ones that changed)
+        since the defines were last looked at
+        """
+        if not self._dirtyDefines:
+            return
+        for name in self._macroClosure(self._dirtyDefines):
+            macro=self.macros.get(name)
+            if macro is None or macro.isFunctionLike:
+                self._defineValues.pop(name,None)
+                continue
+            try:
+                self._defineValues[name]=evaluateCValue(name,self.macros)
+            except SyntaxError:
+                # eg, a bad function-like macro call
+                self._defineValues[name]=macro.value
+        self._dirtyDefines.clear()
+
+    def _macroClosure(self,names:typing.Iterable[str])->typing.Dict[str,None]:
+        """
+        the names along with every macro that uses them,
+        directly or through other macros
+        """
+        ret=dict.fromkeys(names)
+        todo=list(ret)
+        while todo:
+            for user in self._macroUsers.get(todo.pop(),()):
+                if user not in ret:
+                    ret[user]=None
+                    todo.append(user)
+        return ret
+
+    @property
+    def functions(self)->typing.Dict[str,typing.Any]:
+        """
+        all functions declared or defined at the top level
+            {name:CppFunctionInfo}
+        as returned by cppFunctionInfo()
+        """
+        return dict(self._functions.items())
+
+    @property
+    def scopes(self)->typing.List[typing.Tuple[str,str,int,int]]:
+        """
+        all top-level brace scopes as
+            [(kind,name,startLine,endLine)]
+        where kind is "function","struct","enum",etc
+
+        NOTE: this walks the whole document, use scopeAt()
+        for per-keystroke lookups
+        """
+        ret=[]
+        for i,line in enumerate(self._lines):
+            if line.item is not None:
+                for kind,name,start,end in line.item.scopes:
+                    ret.append((kind,name,i+start,i+end))
+        return ret
+
+    def scopeAt(self,lineNumber:int
+        )->typing.Optional[typing.Tuple[str,str,int,int]]:
+        """
+        the top-level scope containing a line, if any
+            (kind,name,startLine,endLine)
+        """
+        start=self._itemStartBefore(lineNumber)
+        item=self._lines[start].item
+        if item is not None:
+            for kind,name,s,e in item.scopes:
+                if start+s<=lineNumber<=start+e:
+                    return (kind,name,start+s,start+e)
+        return None
+
+    def applyEdits(self,edits:typing.Iterable[TextEdit])->None:
+        """
+        apply a series of edits, in order
+        """
+        for edit in edits:
+            self.applyEdit(edit)
+
+    def applyEdit(self,edit:TextEdit)->None:
+        """
+        apply a single edit and update everything it affects
+        """
+        startLine,startCol,endLine,endCol,text=edit
+        lines=self._lines
+        if not 0<=startLine<=endLine<len(lines):
+            raise IndexError(f'Edit lines {startLine}-{endLine} are outside of the document (0-{len(lines)-1})') # noqa: E501 # pylint: disable=line-too-long
+        newText=lines[startLine].text[:startCol]+text+\
+            lines[endLine].text[endCol:]
+        newLines=[_Line(t) for t in newText.split('\n')]
+        # forget everything the items in the edited region contributed
+        itemStart=self._itemStartBefore(startLine)
+        for line in lines[itemStart:endLine+1]:
+            self._forget(line)
+        lines[startLine:endLine+1]=newLines
+        end=self._relex(startLine,startLine+len(newLines))
+        for line in lines[startLine+len(newLines):end]:
+            self._forget(line)
+        # the edit may have merged the item with the one before it
+        start=self._itemStartBefore(startLine)
+        for line in lines[start:itemStart]:
+            self._forget(line)
+        self._analyze(min(start,itemStart),end)
+        self._propagate()
+
+    def _itemStartBefore(self,lineNumber:int)->int:
+        """
+        find the line that starts the item containing a line
+        """
+        while lineNumber>0 and not self._lines[lineNumber].itemStart:
+            lineNumber-=1
+        return lineNumber
+
+    def _relex(self,start:int,changedEnd:int)->int:
+        """
+        re-lex lines starting at start until past changedEnd
+        and the lexer state matches what it was before
+
+        returns the line where the next unaffected item starts
+        """
+        lines=self._lines
+        state=lines[start-1].endState if start>0 else _initialState
+        prevCode=''
+        if start>0:
+            prevCode=lines[start-1].code.strip() or \
+                lines[start-1].prevCode or ''
+        i=start
+        while i<len(lines):
+            line=lines[i]
+            itemStart=self._isItemStart(state,prevCode,line.text)
+            if i>=changedEnd and line.startState==state and \
+                    line.prevCode==prevCode and line.itemStart==itemStart:
+                break
+            line.startState=state
+            line.prevCode=prevCode
+            line.itemStart=itemStart
+            line.code,state=_lexLine(line.text,state,prevCode)
+            line.endState=state
+            prevCode=line.code.strip() or prevCode
+            i+=1
+        # extend to the end of whatever item we stopped inside of
+        while i<len(lines) and not lines[i].itemStart:
+            i+=1
+        return i
+
+    @staticmethod
+    def _isItemStart(state:_LexState,prevCode:str,text:str)->bool:
+        """
+        whether a line starts a new top-level item
+        """
+        inComment,stack=state
+        if inComment or 'b' in stack:
+            return False
+        if not prevCode or text.lstrip().startswith('#'):
+            return True
+        if prevCode.startswith('#'):
+            return not prevCode.endswith('\\')
+        return prevCode[-1] in ';{}'
+
+    def _forget(self,line:_Line)->None:
+        """
+        remove everything an item contributed to the tables
+        """
+        item=line.item
+        if item is None:
+            return
+        line.item=None
+        for name in item.defines:
+            self._defines.remove(line,name)
+            self._redefine(name)
+        self._removeEnums(line,item)
+        for ref in item.enumRefs:
+            users=self._enumUsers.get(ref)
+            if users is not None:
+                users.pop(id(line),None)
+                if not users:
+                    del self._enumUsers[ref]
+        for name in item.functions:
+            self._functions.remove(line,name)
+
+    def _redefine(self,name:str)->None:
+        """
+        update a macro to whatever (remaining) item defines it
+        """
+        args=self._defines.get(name)
+        if args is None:
+            self.macros.undefine(name)
+        else:
+            self.macros.define(args)
+        # keep track of what uses what
+        for ref in self._macroRefs.pop(name,()):
+            self._macroUsers[ref].discard(name)
+            if not self._macroUsers[ref]:
+                del self._macroUsers[ref]
+        macro=self.macros.get(name)
+        if macro is not None:
+            refs=frozenset([t[0] for t in macro.body
+                if _identifierRe.fullmatch(t[0])])
+            self._macroRefs[name]=refs
+            for ref in refs:
+                self._macroUsers.setdefault(ref,set()).add(name)
+        self._dirtyDefines.add(name)
+        self._changed(name,True)
+
+    def _changed(self,name:str,isMacro:bool=False)->None:
+        """
+        note that a name (an enum value or a macro) changed
+        """
+        self._now+=1
+        if isMacro:
+            self._changedMacros[name]=self._now
+        else:
+            self._changedNames[name]=self._now
+
+    def _addEnums(self,owner:_Line,item:_ItemInfo,notify:bool=True)->None:
+        """
+        add the enums an item contributes to the tables
+
+        :notify: whether the values that use them need updating
+        """
+        for name,mapping in item.enums.items():
+            self._enums.add(owner,name,mapping)
+            self._dirtyEnums.add(name)
+            for k,v in mapping.items():
+                self._enumValues.add(owner,k,v)
+                if notify:
+                    self._changed(k)
+
+    def _removeEnums(self,owner:_Line,item:_ItemInfo,notify:bool=True
+        )->None:
+        """
+        remove the enums an item contributed from the tables
+
+        :notify: whether the values that use them need updating
+        """
+        for name,mapping in item.enums.items():
+            self._enums.remove(owner,name)
+            self._dirtyEnums.add(name)
+            for k in mapping:
+                self._enumValues.remove(owner,k)
+                if notify:
+                    self._changed(k)
+
+    def _parseEnums(self,item:_ItemInfo
+        )->typing.Dict[str,typing.Dict[str,typing.Any]]:
+        """
+        parse an item's enums using the current macros and enum values
+        """
+        # (new values go in the front map, not the table)
+        known:typing.ChainMap[str,typing.Any]=collections.ChainMap({},
+            typing.cast(typing.MutableMapping[str,typing.Any],
+                self._enumValues))
+        return parseCEnumTypedefs(item.enumCode,self.macros,known)
+
+    def _propagate(self)->None:
+        """
+        re-evaluate the enums of every item that uses a name
+        that changed, in dependency order, until nothing changes
+
+        (defines are evaluated lazily, see _updateDefines())
+        """
+        # {id(owner):timesReparsed} so that values that refer to
+        # each other in a cycle (which is not valid c) can't go forever
+        reparsed:typing.Dict[int,int]={}
+        while self._changedNames or self._changedMacros:
+            # {name:when} of changed enum values and of changed
+            # macros, including macros that use anything that changed
+            names=self._changedNames
+            macros=self._changedMacros
+            self._changedNames={}
+            self._changedMacros={}
+            todo=list(names.items())+list(macros.items())
+            while todo:
+                name,when=todo.pop()
+                for user in self._macroUsers.get(name,()):
+                    if macros.get(user,-1)<when:
+                        macros[user]=when
+                        todo.append((user,when))
+            affected:typing.Dict[int,_Line]={}
+            for table,isMacro in ((names,False),(macros,True)):
+                for name,when in table.items():
+                    owners=list(self._enumUsers.get(name,{}).values())
+                    if isMacro:
+                        # a macro can replace an item's own enum value
+                        owners.extend(self._enumValues.owners(name))
+                    for owner in owners:
+                        if owner.item is not None and \
+                                owner.item.parsedAt<when and \
+                                reparsed.get(id(owner),0)<_maxReparses:
+                            affected[id(owner)]=owner
+            for owner in self._dependencyOrder(affected):
+                reparsed[id(owner)]=reparsed.get(id(owner),0)+1
+                item=owner.item
+                if item is None:
+                    continue
+                # (its own old values must not feed its new ones)
+                self._removeEnums(owner,item,False)
+                enums=self._parseEnums(item)
+                changed=enums!=item.enums
+                if changed:
+                    for mapping in item.enums.values():
+                        for k in mapping:
+                            self._changed(k)
+                item.enums=enums
+                self._addEnums(owner,item,changed)
+                item.parsedAt=self._now
+
+    def _dependencyOrder(self,items:typing.Dict[int,_Line]
+        )->typing.List[_Line]:
+        """
+        order items so that each comes after the items whose
+        enum values it uses (if there is a cycle, it is broken
+        arbitrarily)
+        """
+        # {id(owner):owners of the enum values it uses}
+        deps:typing.Dict[int,typing.List[_Line]]={}
+        for key,owner in items.items():
+            item=owner.item
+            if item is None:
+                deps[key]=[]
+                continue
+            refs=dict.fromkeys(item.enumRefs)
+            todo=list(refs)
+            while todo:
+                for ref in self._macroRefs.get(todo.pop(),()):
+                    if ref not in refs:
+                        refs[ref]=None
+                        todo.append(ref)
+            deps[key]=[other for ref in refs
+                for other in self._enumValues.owners(ref)
+                if id(other) in items and other is not owner]
+        ret:typing.List[_Line]=[]
+        visited:typing.Set[int]=set()
+        for key,owner in items.items():
+            if key in visited:
+                continue
+            visited.add(key)
+            stack=[(owner,iter(deps[key]))]
+            while stack:
+                current,it=stack[-1]
+                for dep in it:
+                    if id(dep) not in visited:
+                        visited.add(id(dep))
+                        stack.append((dep,iter(deps[id(dep)])))
+                        break
+                else:
+                    stack.pop()
+                    ret.append(current)
+        return ret
+
+    def _analyze(self,start:int,end:int)->None:
+        """
+        (re)analyze all items starting within [start,end)
+        """
+        lines=self._lines
+        i=start
+        while i<end:
+            j=i+1
+            while j<len(lines) and not lines[j].itemStart:
+                j+=1
+            self._analyzeItem(i,j)
+            i=j
+
+    def _analyzeItem(self,start:int,end:int)->None:
+        """
+        analyze a single item made up of lines [start,end)
+        """
+        owner=self._lines[start]
+        itemLines=self._lines[start:end]
+        code='\n'.join([line.code for line in itemLines])
+        if not code.strip():
+            return
+        item=_ItemInfo()
+        # directives are line-based, so they can be anywhere in an item
+        # NOTE: an "#undef" only matters within the item that
+        # did the defining, so there is nothing to track
+        if '#' in code:
+            for m in _defineRe.finditer(code.replace('\\\n',' ')):
+                name=m.group('name')
+                if name not in item.defines:
+                    item.defines.append(name)
+                self._defines.add(owner,name,m.group('args'))
+                self._redefine(name)
+        if not code.lstrip().startswith('#'):
+            if 'enum' in code:
+                item.enumCode='\n'+code
+                item.enums=self._parseEnums(item)
+                if item.enums:
+                    own=set(item.enums)
+                    for mapping in item.enums.values():
+                        own.update(mapping)
+                    item.enumRefs=frozenset(
+                        _identifierRe.findall(code)).difference(own)
+                    for ref in item.enumRefs:
+                        self._enumUsers.setdefault(ref,{})[id(owner)]=owner
+                    self._addEnums(owner,item)
+                    # (it already knows about its own values)
+                    item.parsedAt=self._now
+            self._analyzeStatements(owner,item,itemLines)
+        owner.item=item
+
+    def _analyzeStatements(self,
+        owner:_Line,
+        item:_ItemInfo,
+        itemLines:typing.List[_Line])->None:
+        """
+        find functions and top-level brace scopes in an item
+        """
+        header:typing.List[str]=[]
+        scopeHeader=''
+        scopeStart=0
+        depth=0
+        for offset,line in enumerate(itemLines):
+            code=line.code
+            pos=0
+            for m in _braceRe.finditer(code):
+                tok=m.group(0)
+                if len(tok)>1:
+                    continue # a string or char literal
+                if depth==0:
+                    header.append(code[pos:m.start()])
+                    headerText=' '.join(header)
+                    header=[]
+                    if tok==';':
+                        self._addFunction(owner,item,headerText)
+                    elif tok=='{' and not _transparentRe.search(headerText):
+                        depth=1
+                        scopeStart=offset
+                        scopeHeader=headerText
+                elif tok=='{':
+                    depth+=1
+                elif tok=='}':
+                    depth-=1
+                    if depth==0:
+                        kind,name=self._scopeKindAndName(scopeHeader)
+                        if kind=='function':
+                            self._addFunction(owner,item,scopeHeader)
+                        item.scopes.append((kind,name,scopeStart,offset))
+                pos=m.end()
+            if depth==0:
+                header.append(code[pos:])
+
+    def _addFunction(self,owner:_Line,item:_ItemInfo,header:str)->None:
+        """
+        add a function prototype or definition, if that's what it is
+        """
+        if '(' not in header or _notFunctionRe.match(header) or \
+                '=' in header.split('(',1)[0]:
+            return
+        try:
+            info=cppFunctionInfo(header)
+        except (AttributeError,ValueError):
+            # not something cppFunctionInfo() understands
+            return
+        name=info.name
+        if name and info.returnType:
+            item.functions.append(name)
+            self._functions.add(owner,name,info)
+
+    @staticmethod
+    def _scopeKindAndName(header:str)->typing.Tuple[str,str]:
+        """
+        figure out what a brace scope is from the code before it
+        """
+        func=None
+        for m in _scopeNameRe.finditer(header):
+            if m.group('kind') is not None:
+                return (m.group('kind'),m.group('name'))
+            func=m.group('func')
+        if func is not None:
+            return ('function',func)
+        return ('block','')
+
+    def __repr__(self):
+        return f'ParsedCppDocument({self.lineCount} lines)'
@@ -0,0 +1,317 @@
+"""
+Turn gdb/lldb "print" output into python objects
+
+Understands nested structs, arrays (including "<repeats N times>"),
+pointers, char arrays, and both gdb and lldb styles, eg
+    $1 = {a = 1, b = {c = 0x0, d = "hi"}, e = {0 <repeats 16 times>}}
+    (Foo) foo = {
+      a = 1
+      arr = ([0] = 1, [1] = 2)
+    }
+
+The parser is iterative (no recursion) and reads its input a line at
+a time, so very deep or very large dumps parse in linear time without
+hitting the recursion limit.
+
+Can do helpful things like:
+    with open("gdb.log",encoding="utf-8") as f:
+        for name,value in parseDebuggerDump(f):
+            print(name,value)
+"""
+import typing
+import io
+import re
+from ._cppTools import cppValue2PyValue
+from .stdio import decodeCEscapeSequences
+from .instrumentation import instrumented
+
+
+class CPointer(typing.NamedTuple):
+    """
+    A pointer value, eg
+        0x601040 <global_var>  ->  CPointer(0x601040,"global_var",None)
+        0x4006f4 "abc"         ->  CPointer(0x4006f4,None,"abc")
+    """
+    address:int
+    symbol:typing.Optional[str]=None
+    target:typing.Any=None
+
+
+_dumpTokenRe=re.compile(r"""
+    (?P<ws>\s+)
+    |(?P<open>[{]|[(](?=\s*\[))
+    |(?P<close>[})])
+    |(?P<comma>,)
+    |\[(?P<index>-?[0-9]+)\]\s*=
+    |<repeats\s+(?P<repeats>[0-9]+)\s+times>
+    |(?P<string>(?:u8|[uUL])?"(?:[^"\\]|\\.)*")
+    |(?P<char>(?:u8|[uUL])?'(?:[^'\\]|\\.)*')
+    |(?P<type>[(](?:[^()]|[(][^()]*[)])*[)])
+    |(?P<key>(?:[A-Za-z_$][\w$:.]*|<(?:[^<>=]|<[^<>]*>)*>)\s*=(?!=))
+    |(?P<annotation><(?:[^<>]|<[^<>]*>)*>)
+    |(?P<word>[^\s,{}()<>"'=]+)
+    |(?P<other>.)
+    """,re.VERBOSE)
+
+
+class _Frame:
+    """
+    An open container (or the top level) while parsing
+    """
+    __slots__=('keys','values','key','parts','value','repeats',
+        'lastPiece','isDict','summarized')
+
+    def __init__(self):
+        self.keys:typing.List[typing.Optional[str]]=[]
+        self.values:typing.List[typing.Any]=[]
+        self.key:typing.Optional[str]=None
+        # the value currently being built
+        self.parts:typing.List[typing.Tuple[str,str]]=[]
+        self.value:typing.Any=None
+        self.repeats=1
+        # 0=last value was not a piece of a char array,
+        # 1=it was a string, 2=it was a repeated char
+        self.lastPiece=0
+        self.isDict=False
+        # the value is a container that followed a summary "... = {"
+        self.summarized=False
+
+    def container(self)->typing.Any:
+        """
+        get the finished container
+        """
+        if self.isDict:
+            return dict(zip(self.keys,self.values))
+        return self.values
+
+
+def _partsValue(parts:typing.List[typing.Tuple[str,str]]
+    )->typing.Tuple[typing.Any,bool]:
+    """
+    Convert the tokens of a single (non-container) value to python
+
+    returns (value,isPieceOfACharArray)
+    """
+    words=[text for kind,text in parts if kind=='word']
+    strings=[text for kind,text in parts if kind=='string']
+    chars=[text for kind,text in parts if kind=='char']
+    annotations=[text for kind,text in parts if kind=='annotation']
+    isPointerType=any([kind=='type' and text.rstrip(')').rstrip().endswith('*') # noqa: E501 # pylint: disable=line-too-long
+        for kind,text in parts])
+    if not words:
+        if strings:
+            return (''.join([_decodeLiteral(s) for s in strings]),True)
+        if chars:
+            return (_decodeLiteral(chars[0]),True)
+        if annotations:
+            return (annotations[0],False)
+        return (None,False)
+    if len(words)==1:
+        try:
+            value=cppValue2PyValue(words[0])
+        except ValueError:
+            return (words[0],False)
+        if isinstance(value,int) and not isinstance(value,bool) and \
+                (strings or annotations or isPointerType):
+            symbol=None
+            if annotations:
+                symbol=annotations[0][1:-1]
+            target=None
+            if strings:
+                target=''.join([_decodeLiteral(s) for s in strings])
+            return (CPointer(value,symbol,target),False)
+        # NOTE: a char is shown as eg 97 'a', the number is the value
+        return (value,False)
+    # eg, flag enums like "RED | BLUE"
+    return (' '.join([text for _,text in parts if _!='type']),False)
+
+def _decodeLiteral(literal:str)->str:
+    """
+    decode a c string or char literal (with any prefix)
+    """
+    quote=literal[-1]
+    return decodeCEscapeSequences(literal[literal.index(quote)+1:-1])
+
+def _lines(source:typing.Union[str,typing.Iterable[str]]
+    )->typing.Iterator[str]:
+    """
+    split any source of text into lines
+    """
+    if isinstance(source,str):
+        source=io.StringIO(source)
+    # (pieces of a line that is not finished yet, since joining them
+    # as they come in would be quadratic for one enormous line)
+    pending:typing.List[str]=[]
+    for chunk in source:
+        lines=chunk.split('\n')
+        if len(lines)>1 and pending:
+            pending.append(lines[0])
+            lines[0]=''.join(pending)
+            pending=[]
+        last=lines.pop()
+        if last:
+            pending.append(last)
+        yield from lines
+    if pending:
+        yield ''.join(pending)
+
+@instrumented('debuggerDump.parseDebuggerDump')
+def parseDebuggerDump(source:typing.Union[str,typing.Iterable[str]]
+    )->typing.Generator[typing.Tuple[typing.Optional[str],typing.Any],None,None]: # noqa: E501 # pylint: disable=line-too-long
+    """
+    Parse gdb/lldb print output
+
+    :source: the text, an open file, or any other iterable of text chunks
+
+    yields (name,value) for each top-level value as soon as it is complete,
+    where name is eg "$1" or "foo" (or None if there is no name)
+    and value is a python value, dict (for structs), or list (for arrays)
+
+    NOTE: elements expanded from "<repeats N times>" are the same object
+    """
+    root=_Frame()
+    stack=[root]
+    frame=root
+    for line in _lines(source):
+        for m in _dumpTokenRe.finditer(line):
+            kind=m.lastgroup
+            if kind=='ws':
+                continue
+            if kind in ('comma','close'):
+                _commit(frame)
+                if kind=='close':
+                    if len(stack)==1:
+                        continue # unbalanced, ignore it
+                    stack.pop()
+                    container=frame.container()
+                    frame=stack[-1]
+                    frame.value=container
+            elif kind=='open':
+                # finish whatever came before (eg a type) but keep the key
+                # (or a pretty-printer summary, eg "std::vector of length 2,
+                # capacity 2 = {1, 2}", where the container is the value)
+                frame.summarized=frame.parts[-1:]==[('other','=')]
+                frame.parts=[]
+                frame=_Frame()
+                stack.append(frame)
+            elif kind=='key':
+                key=m.group('key').rsplit('=',1)[0].strip()
+                if frame.key is not None or any([k!='type'
+                        for k,_ in frame.parts]):
+                    # part of a summary, eg "std::map with 2 elements = {"
+                    # or lldb's "v = size=2 {"
+                    frame.parts.extend([('word',key),('other','=')])
+                    continue
+                _commit(frame)
+                frame.key=key
+                frame.isDict=True
+            elif kind=='index':
+                _commit(frame)
+            elif kind=='repeats':
+                frame.repeats=int(m.group('repeats'))
+            else:
+                frame.parts.append((kind,m.group(kind))) # type: ignore
+        # a newline ends a value (and at the top level, an entry)
+        _commit(frame)
+        if frame is root and root.values:
+            yield from zip(root.keys,root.values)
+            root.keys=[]
+            root.values=[]
+            root.lastPiece=0
+    # anything left unclosed at the end
+    while len(stack)>1:
+        _commit(frame)
+        stack.pop()
+        container=frame.container()
+        frame=stack[-1]
+        frame.value=container
+    _commit(root)
+    yield from zip(root.keys,root.values)
+
+def _commit(frame:_Frame)->None:
+    """
+    add the value currently being built to a frame
+    """
+    parts=frame.parts
+    if frame.value is not None and not any([kind=='word'
+            for kind,_ in parts]):
+        value=frame.value
+        piece=0
+    elif parts:
+        if len(parts)==1:
+            kind,text=parts[0]
+            if kind=='type':
+                if frame.key is None:
+                    # only a type, eg "(Foo)" in "(Foo) foo = {"
+                    frame.parts=[]
+                    return
+                # a flag enum, eg "fl = (RED | BLUE)"
+                value,isPiece=(text[1:-1].strip(),False)
+            elif kind=='word':
+                try:
+                    value,isPiece=(cppValue2PyValue(text),False)
+                except ValueError:
+                    value,isPiece=(text,False)
+            else:
+                value,isPiece=_partsValue(parts)
+        elif all([kind=='type' for kind,_ in parts]):
+            if frame.key is None:
+                frame.parts=[]
+                return
+            value,isPiece=(parts[-1][1][1:-1].strip(),False)
+        else:
+            # NOTE: a braced value followed by a word is eg a function
+            # pointer, {void (int)} 0x401136 <main>, so braces were a type
+            value,isPiece=_partsValue(parts)
+        piece=0
+        if isPiece:
+            piece=2 if frame.repeats>1 and parts[-1][0]=='char' else 1
+            if piece==2:
+                value=value*frame.repeats
+                frame.repeats=1
+    else:
+        return
+    key=frame.key
+    summary=key is None and frame.isDict and frame.keys \
+        and frame.keys[-1] is not None
+    if summary and frame.summarized:
+        # the container after a summary that had a comma in it
+        # replaces the summary, eg "v = std::vector of length 2,
+        # capacity 2 = {1, 2}"
+        key=frame.keys.pop()
+        frame.values.pop()
+    # gdb splits char arrays with repeats into pieces, eg
+    #   "ab", '\000' <repeats 13 times>
+    if piece and key is None and frame.lastPiece and \
+            (piece==2 or frame.lastPiece==2) and frame.values:
+        frame.values[-1]+=value
+    elif summary and not piece and not frame.lastPiece \
+            and isinstance(value,str) and isinstance(frame.values[-1],str):
+        # the rest of a summary, eg "std::vector of length 0, capacity 0"
+        frame.values[-1]+=', '+value
+    elif frame.repeats>1:
+        frame.keys.extend([key]*frame.repeats)
+        frame.values.extend([value]*frame.repeats)
+    else:
+        frame.keys.append(key)
+        frame.values.append(value)
+    frame.lastPiece=piece
+    frame.key=None
+    frame.parts=[]
+    frame.value=None
+    frame.repeats=1
+    frame.summarized=False
+
+def parseDebuggerValue(text:str)->typing.Any:
+    """
+    Parse a single gdb/lldb value, eg
+        "{a = 1, b = {0 <repeats 4 times>}}"
+        returns
+        {"a":1,"b":[0,0,0,0]}
+
+    (if text contains more than one named value, returns {name:value})
+    """
+    results=list(parseDebuggerDump(text))
+    if len(results)==1:
+        return results[0][1]
+    return dict(results)
@@ -0,0 +1,573 @@
+"""
+Watch a tree of headers and keep an in-memory index of
+the headers and the constants (enums and #defines) in them
+
+Changes are picked up with inotify where available (linux),
+otherwise by polling, and only the files that changed
+are re-parsed, in a background thread pool.
+
+Can do helpful things like:
+    with HeaderTreeWatcher(CompileCommand("gcc -Iinclude foo.c")) as w:
+        w.waitUntilIdle()
+        w.findHeader("foo.h")
+        w.lookupConstant("FOO_MAX")
+"""
+import typing
+import os
+import sys
+import select
+import struct
+import threading
+import concurrent.futures
+from .includes import IncludePathsCompatible, asIncludePaths, \
+    isHeaderFilename, HeaderNotFoundException
+from .cEnums import loadCEnums
+from .preprocessor import MacroDefinitionsCompatible
+
+
+# from <sys/inotify.h>
+IN_MODIFY=0x00000002
+IN_CLOSE_WRITE=0x00000008
+IN_MOVED_FROM=0x00000040
+IN_MOVED_TO=0x00000080
+IN_CREATE=0x00000100
+IN_DELETE=0x00000200
+IN_DELETE_SELF=0x00000400
+IN_MOVE_SELF=0x00000800
+IN_Q_OVERFLOW=0x00004000
+IN_IGNORED=0x00008000
+IN_ONLYDIR=0x01000000
+IN_ISDIR=0x40000000
+IN_NONBLOCK=0o4000
+IN_CLOEXEC=0o2000000
+_watchMask=IN_CLOSE_WRITE|IN_MOVED_FROM|IN_MOVED_TO|IN_CREATE|IN_DELETE|\
+    IN_DELETE_SELF|IN_MOVE_SELF|IN_ONLYDIR
+_inotifyEvent=struct.Struct('iIII')
+
+FileEnums=typing.Dict[typing.Optional[str],typing.Dict[str,typing.Any]]
+
+
+class _Inotify:
+    """
+    Minimal ctypes wrapper around linux inotify
+    """
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        libc=ctypes.CDLL(ctypes.util.find_library('c'),use_errno=True)
+        self._ctypes=ctypes
+        self._addWatch=libc.inotify_add_watch
+        self._addWatch.argtypes=(ctypes.c_int,ctypes.c_char_p,ctypes.c_uint32)
+        self._addWatch.restype=ctypes.c_int
+        self.fd=libc.inotify_init1(IN_NONBLOCK|IN_CLOEXEC)
+        if self.fd<0:
+            errno=ctypes.get_errno()
+            raise OSError(errno,os.strerror(errno))
+        self.watches:typing.Dict[int,str]={}
+
+    def addWatch(self,directory:str)->None:
+        """
+        watch a directory (not recursive)
+        """
+        wd=self._addWatch(self.fd,os.fsencode(directory),_watchMask)
+        if wd<0:
+            errno=self._ctypes.get_errno()
+            raise OSError(errno,os.strerror(errno),directory)
+        self.watches[wd]=directory
+
+    def read(self,timeout:float)->typing.List[typing.Tuple[str,int]]:
+        """
+        wait up to timeout seconds for events
+
+        returns [(fullPath,mask)]
+        """
+        ready,_,_=select.select([self.fd],[],[],timeout)
+        if not ready:
+            return []
+        try:
+            data=os.read(self.fd,65536)
+        except BlockingIOError:
+            return []
+        ret=[]
+        pos=0
+        while pos<len(data):
+            wd,mask,_,nameLen=_inotifyEvent.unpack_from(data,pos)
+            pos+=_inotifyEvent.size
+            name=os.fsdecode(data[pos:pos+nameLen].rstrip(b'\0'))
+            pos+=nameLen
+            directory=self.watches.get(wd,'')
+            if mask&IN_IGNORED:
+                self.watches.pop(wd,None)
+                continue
+            ret.append((os.path.join(directory,name) if name else directory,
+                mask))
+        return ret
+
+    def close(self)->None:
+        """
+        stop watching everything
+        """
+        if self.fd>=0:
+            os.close(self.fd)
+            self.fd=-1
+
+
+class HeaderTreeWatcher:
+    """
+    Keeps an index of all headers in a set of include
+    paths (recursively) and the constants in them up to date
+    """
+
+    def __init__(self,
+        paths:IncludePathsCompatible,
+        defines:typing.Optional[MacroDefinitionsCompatible]=None,
+        usePolling:typing.Optional[bool]=None,
+        pollInterval:float=1.0,
+        maxWorkers:typing.Optional[int]=None,
+        onChange:typing.Optional[typing.Callable[[str],None]]=None):
+        """
+        :paths: include paths to watch (eg, a CompileCommand)
+        :defines: macro environment for parsing the headers
+            (eg, a CompileCommand)
+        :usePolling: force polling on/off (default is to
+            use inotify if available)
+        :pollInterval: seconds between scans when polling
+        :maxWorkers: size of the thread pool for re-parsing
+        :onChange: called with the filename after a file
+            has been re-parsed or removed from the index
+        """
+        self.roots=[os.path.abspath(p) for p in asIncludePaths(paths)]
+        self.defines=defines
+        self.usePolling=usePolling
+        self.pollInterval=pollInterval
+        self.onChange=onChange
+        self.errors:typing.Dict[str,Exception]={}
+        self._maxWorkers=maxWorkers
+        self._executor:typing.Optional[
+            concurrent.futures.ThreadPoolExecutor]=None
+        self._lock=threading.RLock()
+        self._headers:typing.Set[str]=set()
+        self._signatures:typing.Dict[str,typing.Tuple[int,int]]={}
+        self._enums:typing.Dict[str,FileEnums]={}
+        self._constantIndex:typing.Dict[str,typing.Set[str]]={}
+        self._generation:typing.Dict[str,int]={}
+        self._futures:typing.Dict[str,concurrent.futures.Future]={}
+        self._stopEvent=threading.Event()
+        self._thread:typing.Optional[threading.Thread]=None
+        self._inotify:typing.Optional[_Inotify]=None
+
+    def __enter__(self)->'HeaderTreeWatcher':
+        self.start()
+        return self
+
+    def __exit__(self,*args)->None:
+        self.stop()
+
+    @property
+    def watching(self)->bool:
+        """
+        whether the background watch thread is running
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def usingInotify(self)->bool:
+        """
+        whether changes are being picked up with inotify
+        (as opposed to polling)
+        """
+        return self._inotify is not None
+
+    def start(self)->None:
+        """
+        index the tree and start watching it for changes
+
+        (parsing happens in the background, use waitUntilIdle()
+        if you need everything to be parsed)
+        """
+        if self.watching:
+            return
+        # (a fresh event, so that a thread from a stop(wait=False)
+        # can't be revived by clearing the old one)
+        self._stopEvent=threading.Event()
+        if self.usePolling is not True and sys.platform.startswith('linux'):
+            try:
+                self._inotify=_Inotify()
+            except (OSError,AttributeError):
+                if self.usePolling is False:
+                    raise
+                self._inotify=None
+        # add the watches before scanning so nothing slips through
+        self.refresh()
+        target:typing.Callable[...,None]
+        args:typing.Tuple[typing.Any,...]
+        if self._inotify is not None:
+            target=self._inotifyLoop
+            args=(self._inotify,self._stopEvent)
+        else:
+            target=self._pollLoop
+            args=(self._stopEvent,)
+        self._thread=threading.Thread(target=target,args=args,
+            name='HeaderTreeWatcher',daemon=True)
+        self._thread.start()
+
+    def stop(self,wait:bool=True)->None:
+        """
+        stop watching (the index stays as it is)
+
+        (can be called from an onChange callback)
+        """
+        self._stopEvent.set()
+        thread=self._thread
+        self._thread=None
+        if thread is not None and wait \
+                and thread is not threading.current_thread():
+            thread.join()
+        if thread is None and self._inotify is not None:
+            # never got as far as starting the thread
+            self._inotify.close()
+        # otherwise the watch thread closes it, since it may
+        # be in the middle of a select() on it right now
+        self._inotify=None
+        with self._lock:
+            executor=self._executor
+            self._executor=None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def waitUntilIdle(self,timeout:typing.Optional[float]=None)->bool:
+        """
+        wait until all pending re-parses are done
+
+        returns False if timed out
+        """
+        while True:
+            with self._lock:
+                pending=list(self._futures.values())
+            if not pending:
+                return True
+            _,notDone=concurrent.futures.wait(pending,timeout)
+            if notDone:
+                return False
+
+    def refresh(self)->None:
+        """
+        scan the whole tree and re-parse anything that
+        changed since the last scan
+
+        (this happens automatically when polling, but
+        can be called any time to force a full check)
+        """
+        seen:typing.Dict[str,typing.Tuple[int,int]]={}
+        for root in self.roots:
+            self._scanDirectory(root,seen)
+        with self._lock:
+            removed=list(set(self._signatures)-set(seen))
+            for filename in removed:
+                self._removeFile(filename)
+            changed=[filename for filename,sig in seen.items()
+                if self._signatures.get(filename)!=sig]
+            self._signatures.update(seen)
+        self._notify(removed)
+        for filename in changed:
+            self._invalidate(filename)
+
+    def _scanDirectory(self,
+        directory:str,
+        seen:typing.Dict[str,typing.Tuple[int,int]])->None:
+        """
+        add all headers under a directory to seen as
+            {filename:(mtime,size)}
+        and watch every directory found (if using inotify)
+        """
+        stack=[directory]
+        while stack:
+            d=stack.pop()
+            if self._inotify is not None:
+                try:
+                    self._inotify.addWatch(d)
+                except OSError as e:
+                    print(f'WARN: unable to watch "{d}": {e}')
+            try:
+                entries=list(os.scandir(d))
+            except OSError:
+                if d==directory:
+                    print(f'Include path: "{d}" not found.')
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif isHeaderFilename(entry.name):
+                        st=entry.stat()
+                        seen[entry.path]=(st.st_mtime_ns,st.st_size)
+                except OSError:
+                    # removed while we were looking at it
+                    continue
+
+    def _pollLoop(self,stopEvent:threading.Event)->None:
+        """
+        watch for changes by scanning the tree every so often
+        """
+        while not stopEvent.wait(self.pollInterval):
+            self.refresh()
+
+    def _inotifyLoop(self,inotify:_Inotify,stopEvent:threading.Event)->None:
+        """
+        watch for changes with inotify
+        """
+        try:
+            self._watchInotify(inotify,stopEvent)
+        finally:
+            inotify.close()
+
+    def _watchInotify(self,inotify:_Inotify,stopEvent:threading.Event)->None:
+        """
+        handle inotify events until stopEvent is set
+        """
+        while not stopEvent.is_set():
+            changed:typing.Set[str]=set()
+            removed:typing.Set[str]=set()
+            newDirs:typing.List[str]=[]
+            # collect everything in a batch so that a burst of events
+            # on the same file (eg, an editor save) parses it only once
+            for path,mask in inotify.read(0.25):
+                if mask&IN_Q_OVERFLOW:
+                    self.refresh()
+                elif mask&IN_ISDIR:
+                    if mask&(IN_CREATE|IN_MOVED_TO):
+                        newDirs.append(path)
+                    elif mask&(IN_DELETE|IN_MOVED_FROM):
+                        removed.add(path)
+                elif mask&(IN_DELETE_SELF|IN_MOVE_SELF):
+                    removed.add(path)
+                elif isHeaderFilename(path):
+                    if mask&(IN_DELETE|IN_MOVED_FROM):
+                        removed.add(path)
+                        changed.discard(path)
+                    else:
+                        changed.add(path)
+                        removed.discard(path)
+            seen:typing.Dict[str,typing.Tuple[int,int]]={}
+            for d in newDirs:
+                self._scanDirectory(d,seen)
+            for filename in changed:
+                try:
+                    st=os.stat(filename)
+                except OSError:
+                    continue
+                seen[filename]=(st.st_mtime_ns,st.st_size)
+            removedFiles=[]
+            with self._lock:
+                for path in removed:
+                    prefix=path+os.sep
+                    for filename in list(self._headers):
+                        if filename==path or filename.startswith(prefix):
+                            self._removeFile(filename)
+                            removedFiles.append(filename)
+                self._signatures.update(seen)
+            self._notify(removedFiles)
+            for filename in seen:
+                self._invalidate(filename)
+
+    def _invalidate(self,filename:str)->None:
+        """
+        (re)parse a file in the background
+        """
+        with self._lock:
+            self._headers.add(filename)
+            generation=self._generation.get(filename,0)+1
+            self._generation[filename]=generation
+            old=self._futures.get(filename)
+            if old is not None:
+                # no point in finishing a parse that's already stale
+                old.cancel()
+            if self._executor is None:
+                self._executor=concurrent.futures.ThreadPoolExecutor(
+                    self._maxWorkers,thread_name_prefix='HeaderTreeWatcher')
+            future=self._executor.submit(self._parse,filename,generation)
+            self._futures[filename]=future
+        future.add_done_callback(
+            lambda f:self._parseDone(filename,f))
+
+    def _parse(self,filename:str,generation:int)->None:
+        """
+        parse a file (runs in the thread pool)
+        """
+        try:
+            enums=loadCEnums(filename,defines=self.defines)
+            error=None
+        except Exception as e: # pylint: disable=broad-except
+            enums={}
+            error=e
+        with self._lock:
+            if self._generation.get(filename)!=generation:
+                # changed again (or removed) while we were parsing
+                return
+            self._setEnums(filename,enums)
+            if error is None:
+                self.errors.pop(filename,None)
+            else:
+                print(f'WARN: unable to parse "{filename}": {error}')
+                self.errors[filename]=error
+        self._notify([filename])
+
+    def _parseDone(self,filename:str,future:concurrent.futures.Future)->None:
+        """
+        forget about a finished parse
+        """
+        with self._lock:
+            if self._futures.get(filename) is future:
+                del self._futures[filename]
+
+    def _notify(self,filenames:typing.Iterable[str])->None:
+        """
+        call onChange for each file (lock must NOT be held,
+        since the callback is free to use the watcher)
+        """
+        if self.onChange is not None:
+            for filename in filenames:
+                self.onChange(filename)
+
+    def _removeFile(self,filename:str)->None:
+        """
+        remove a file from the index (lock must be held)
+
+        (the caller is responsible for calling _notify() afterwards)
+        """
+        self._headers.discard(filename)
+        self._signatures.pop(filename,None)
+        self.errors.pop(filename,None)
+        # bump the generation so any parse in progress is ignored
+        self._generation[filename]=self._generation.get(filename,0)+1
+        future=self._futures.pop(filename,None)
+        if future is not None:
+            future.cancel()
+        self._setEnums(filename,None)
+
+    def _setEnums(self,filename:str,enums:typing.Optional[FileEnums])->None:
+        """
+        replace the constants for a file (lock must be held)
+        """
+        old=self._enums.pop(filename,None)
+        if old is not None:
+            for name in self._constantNames(old):
+                owners=self._constantIndex.get(name)
+                if owners is not None:
+                    owners.discard(filename)
+                    if not owners:
+                        del self._constantIndex[name]
+        if enums is not None:
+            self._enums[filename]=enums
+            for name in self._constantNames(enums):
+                self._constantIndex.setdefault(name,set()).add(filename)
+
+    @staticmethod
+    def _constantNames(enums:FileEnums)->typing.Iterator[str]:
+        """
+        all of the constant names in a parsed file
+        """
+        for mapping in enums.values():
+            yield from mapping
+
+    def _rank(self,filename:str)->typing.Tuple[int,str]:
+        """
+        sort key so that earlier include paths win
+        (the same as the compiler would do)
+        """
+        for i,root in enumerate(self.roots):
+            if filename.startswith(root+os.sep):
+                return (i,filename)
+        return (len(self.roots),filename)
+
+    @property
+    def headers(self)->typing.Dict[str,str]:
+        """
+        all headers as {includeName:filename}
+        where includeName is what you'd #include, eg "sys/types.h"
+        """
+        ret:typing.Dict[str,str]={}
+        with self._lock:
+            filenames=sorted(self._headers,key=self._rank)
+        for filename in filenames:
+            i=self._rank(filename)[0]
+            if i<len(self.roots):
+                name=os.path.relpath(filename,self.roots[i])
+                ret.setdefault(name.replace(os.sep,'/'),filename)
+        return ret
+
+    def findHeader(self,headerToFind:str)->str:
+        """
+        Find where a given header resides, eg
+            findHeader("sys/types.h")
+
+        Always returns only the first one found
+        (aka, the one the compiler would use)
+
+        If not found, raises HeaderNotFoundException
+        """
+        name=headerToFind.replace('/',os.sep)
+        with self._lock:
+            for root in self.roots:
+                filename=os.path.normpath(os.path.join(root,name))
+                if filename in self._headers:
+                    return filename
+        raise HeaderNotFoundException(headerToFind,self.roots)
+
+    def fileEnums(self,filename:str)->FileEnums:
+        """
+        get the constants for a single header in the same form
+        as loadCEnums() (empty if it hasn't been parsed yet)
+        """
+        with self._lock:
+            return self._enums.get(os.path.abspath(filename),{})
+
+    def lookupConstant(self,name:str,default:typing.Any=KeyError)->typing.Any:
+        """
+        look up the value of an enum value or #define by name
+
+        :default: what to return if not found
+            (if not specified, raises KeyError)
+        """
+        with self._lock:
+            owners=self._constantIndex.get(name)
+            if owners:
+                filename=min(owners,key=self._rank)
+                for mapping in self._enums[filename].values():
+                    if name in mapping:
+                        return mapping[name]
+        if default is KeyError:
+            raise KeyError(name)
+        return default
+
+    @property
+    def constants(self)->typing.Dict[str,typing.Any]:
+        """
+        all enum values and #defines in all headers as {name:value}
+        """
+        ret:typing.Dict[str,typing.Any]={}
+        with self._lock:
+            filenames=sorted(self._enums,key=self._rank,reverse=True)
+            for filename in filenames:
+                for mapping in self._enums[filename].values():
+                    ret.update(mapping)
+        return ret
+
+    @property
+    def enums(self)->typing.Dict[str,typing.Dict[str,typing.Any]]:
+        """
+        all enums in all headers as {enumName:{k:v}}
+        """
+        ret:typing.Dict[str,typing.Dict[str,typing.Any]]={}
+        with self._lock:
+            filenames=sorted(self._enums,key=self._rank,reverse=True)
+            for filename in filenames:
+                for enumName,mapping in self._enums[filename].items():
+                    if enumName is not None:
+                        ret[enumName]=mapping
+        return ret
+
+    def __repr__(self):
+        mode='inotify' if self.usingInotify else 'polling'
+        return f'HeaderTreeWatcher({len(self._headers)} headers, {mode})'
@@ -7,6 +7,7 @@ Can do helpful things like:
 """
 import typing
 import os
+from .instrumentation import instrumented
 
 
 class HeaderNotFoundException(Exception):
@@ -48,6 +49,13 @@ def asIncludePaths(inc:IncludePathsCompatible)->typing.Iterable[str]:
     return inc # type: ignore
 
 
+def isHeaderFilename(filename:str)->bool:
+    """
+    whether a filename looks like a c/c++ header
+    """
+    return filename.rsplit('.',1)[-1].lower() in ('h','hpp','h++','hxx')
+
+@instrumented('includes.headersAvailable')
 def headersAvailable(
     paths:IncludePathsCompatible,
     fullFilename:bool=True
@@ -60,8 +68,7 @@ def headersAvailable(
             print(f'Include path: "{p}" not found.')
             continue
         for f in os.listdir(p):
-            ext=f.rsplit('.',1)[-1].lower()
-            if ext in ('h','hpp','h++','hxx'):
+            if isHeaderFilename(f):
                 if fullFilename:
                     yield f'{p}{os.sep}{f}'
                 else:
@@ -88,6 +95,7 @@ def findHeadersLike(
             else:
                 yield h.rsplit(os.sep,1)[-1]
 
+@instrumented('includes.findHeader',labelArg='headerToFind')
 def findHeader(
     headerToFind:str,
     paths:IncludePathsCompatible,
@@ -107,3 +115,63 @@ def findHeader(
             return h
     suggestions=findHeadersLike(headerToFind,paths)
     raise HeaderNotFoundException(headerToFind,paths,suggestions) # type: ignore
+
+def _listHeaders(path:str,fullFilename:bool)->typing.List[str]:
+    """
+    list the headers in a single include path
+    """
+    if not os.path.exists(path):
+        print(f'Include path: "{path}" not found.')
+        return []
+    if fullFilename:
+        return [f'{path}{os.sep}{f}' for f in os.listdir(path)
+            if isHeaderFilename(f)]
+    return [f for f in os.listdir(path) if isHeaderFilename(f)]
+
+async def aheadersAvailable(
+    paths:IncludePathsCompatible,
+    fullFilename:bool=True
+    )->typing.AsyncGenerator[str,None]:
+    """
+    Same as headersAvailable() but without blocking the event loop
+
+    All of the paths are listed concurrently, but
+    the results still come out in include path order
+    """
+    import asyncio
+    from .asyncSupport import runBlocking
+    listings=[asyncio.ensure_future(runBlocking(_listHeaders,p,fullFilename))
+        for p in asIncludePaths(paths)]
+    try:
+        for listing in listings:
+            for h in await listing:
+                yield h
+    finally:
+        for listing in listings:
+            listing.cancel()
+
+async def afindHeader(
+    headerToFind:str,
+    paths:IncludePathsCompatible,
+    baseDir:typing.Optional[str]=None
+    )->str:
+    """
+    Same as findHeader() but without blocking the event loop
+
+    If not found, raises HeaderNotFoundException
+    """
+    available=[]
+    headers=aheadersAvailable(paths,baseDir is not None)
+    try:
+        async for h in headers:
+            if h.rsplit(os.sep,1)[-1]==headerToFind:
+                return h
+            available.append(h)
+    finally:
+        # stop listing any paths we no longer care about
+        await headers.aclose()
+    headerSimple=headerToFind.split('.',1)[0].lower()
+    suggestions=[h for h in available
+        if headerSimple in h.rsplit(os.sep,1)[-1].lower()]
+    raise HeaderNotFoundException(
+        headerToFind,paths,suggestions) # type: ignore
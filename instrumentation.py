@@ -0,0 +1,294 @@
+"""
+Opt-in instrumentation for the parsing pipeline
+
+Records per-stage (and per-file) call counts, timing, bytes processed,
+regex match counts and cache hit rates.  When disabled (the default)
+the only cost is a single flag check per instrumented call.
+
+Can do helpful things like:
+    with profiling() as counters:
+        loadCEnums("big.h")
+    print(counters.asDict())
+    print(counters.toPrometheus())
+"""
+import typing
+import functools
+import inspect
+import threading
+import contextlib
+import contextvars
+from time import perf_counter
+
+
+class StageCounters:
+    """
+    Counters for a single (stage,label) pair
+    """
+    __slots__=('calls','seconds','bytes','matches','cacheHits','cacheMisses')
+
+    def __init__(self):
+        self.calls=0
+        self.seconds=0.0
+        self.bytes=0
+        self.matches=0
+        self.cacheHits=0
+        self.cacheMisses=0
+
+    @property
+    def cacheHitRate(self)->typing.Optional[float]:
+        """
+        fraction of cache lookups that hit (None if no lookups)
+        """
+        lookups=self.cacheHits+self.cacheMisses
+        if not lookups:
+            return None
+        return self.cacheHits/lookups
+
+    def asDict(self)->typing.Dict[str,typing.Any]:
+        """
+        get all counters as a dict
+        """
+        ret:typing.Dict[str,typing.Any]={
+            k:getattr(self,k) for k in self.__slots__}
+        ret['cacheHitRate']=self.cacheHitRate
+        return ret
+
+
+class CounterRegistry:
+    """
+    All of the counters, keyed by (stage,label)
+
+    The label is usually the file being processed
+    """
+
+    def __init__(self):
+        self.enabled=False
+        self._lock=threading.Lock()
+        self.counters:typing.Dict[typing.Tuple[str,str],StageCounters]={}
+
+    def _get(self,stage:str,label:str)->StageCounters:
+        key=(stage,label)
+        c=self.counters.get(key)
+        if c is None:
+            c=self.counters.setdefault(key,StageCounters())
+        return c
+
+    def record(self,
+        stage:str,
+        seconds:float=0.0,
+        numBytes:int=0,
+        calls:int=1,
+        label:typing.Optional[str]=None)->None:
+        """
+        record a call to a stage
+        """
+        if label is None:
+            label=currentLabel.get()
+        with self._lock:
+            c=self._get(stage,label)
+            c.calls+=calls
+            c.seconds+=seconds
+            c.bytes+=numBytes
+
+    def count(self,
+        stage:str,
+        counter:str,
+        n:int=1,
+        label:typing.Optional[str]=None)->None:
+        """
+        increment a counter such as "matches", "cacheHits" or "cacheMisses"
+
+        NOTE: callers in hot paths should check registry.enabled first
+        """
+        if not self.enabled:
+            return
+        if label is None:
+            label=currentLabel.get()
+        with self._lock:
+            c=self._get(stage,label)
+            setattr(c,counter,getattr(c,counter)+n)
+
+    def reset(self)->None:
+        """
+        clear all counters
+        """
+        with self._lock:
+            self.counters={}
+
+    def asDict(self)->typing.Dict[str,typing.Dict[str,typing.Dict[str,typing.Any]]]: # noqa: E501 # pylint: disable=line-too-long
+        """
+        get all counters as {stage:{label:{counter:value}}}
+        """
+        ret:typing.Dict[str,typing.Dict[str,typing.Dict[str,typing.Any]]]={}
+        with self._lock:
+            for (stage,label),c in self.counters.items():
+                ret.setdefault(stage,{})[label]=c.asDict()
+        return ret
+
+    def toPrometheus(self,prefix:str='cpptools')->str:
+        """
+        get all counters in prometheus text exposition format
+        """
+        metrics=(
+            ('calls','calls_total','counter','Number of calls'),
+            ('seconds','seconds_total','counter','Time spent'),
+            ('bytes','bytes_total','counter','Bytes processed'),
+            ('matches','regex_matches_total','counter','Regex matches'),
+            ('cacheHits','cache_hits_total','counter','Cache hits'),
+            ('cacheMisses','cache_misses_total','counter','Cache misses'))
+        with self._lock:
+            items=sorted(self.counters.items())
+        ret=[]
+        for attr,name,kind,helpText in metrics:
+            ret.append(f'# HELP {prefix}_{name} {helpText}')
+            ret.append(f'# TYPE {prefix}_{name} {kind}')
+            for (stage,label),c in items:
+                label=label.replace('\\','\\\\').replace('"','\\"')
+                ret.append(f'{prefix}_{name}{{stage="{stage}",file="{label}"}} {getattr(c,attr)}') # noqa: E501 # pylint: disable=line-too-long
+        return '\n'.join(ret)+'\n'
+
+    def __repr__(self):
+        ret=[]
+        for (stage,label),c in sorted(self.counters.items()):
+            name=f'{stage}[{label}]' if label else stage
+            ret.append(f'{name}: {c.calls} calls, {c.seconds*1000:.3f} ms, {c.bytes} bytes') # noqa: E501 # pylint: disable=line-too-long
+        return '\n'.join(ret)
+
+
+registry=CounterRegistry()
+# the label (usually a filename) that nested stages are attributed to
+currentLabel:contextvars.ContextVar[str]=contextvars.ContextVar(
+    'currentLabel',default='')
+
+
+@contextlib.contextmanager
+def profiling(reset:bool=True
+    )->typing.Generator[CounterRegistry,None,None]:
+    """
+    Turn on instrumentation for the duration of a with block
+
+    :reset: clear any previous counters first
+    """
+    if reset:
+        registry.reset()
+    wasEnabled=registry.enabled
+    registry.enabled=True
+    try:
+        yield registry
+    finally:
+        registry.enabled=wasEnabled
+
+def _argGetter(func:typing.Callable,arg:typing.Union[None,int,str]
+    )->typing.Optional[typing.Callable]:
+    """
+    create a function to pull a given argument out of (args,kwargs)
+    """
+    if arg is None:
+        return None
+    params=list(inspect.signature(func).parameters)
+    if isinstance(arg,int):
+        idx=arg
+        name=params[arg]
+    else:
+        idx=params.index(arg)
+        name=arg
+    def getter(args:tuple,kwargs:dict)->typing.Any:
+        if idx<len(args):
+            return args[idx]
+        return kwargs.get(name)
+    return getter
+
+def instrumented(
+    stage:str,
+    sizeArg:typing.Union[None,int,str]=None,
+    labelArg:typing.Union[None,int,str]=None):
+    """
+    Decorator to record calls to a function
+
+    :stage: name to record under, eg "cEnums.parseCEnums"
+    :sizeArg: argument (index or name) whose len() is the bytes processed
+    :labelArg: argument (index or name) to label this call (and anything
+        it calls) with, usually a filename
+    """
+    def decorator(func:typing.Callable)->typing.Callable:
+        getSize=_argGetter(func,sizeArg)
+        getLabel=_argGetter(func,labelArg)
+
+        def begin(args:tuple,kwargs:dict
+            )->typing.Tuple[int,typing.Optional[str]]:
+            numBytes=0
+            if getSize is not None:
+                sized=getSize(args,kwargs)
+                if hasattr(sized,'__len__'):
+                    numBytes=len(sized)
+            label=None
+            if getLabel is not None:
+                label=str(getLabel(args,kwargs))
+            return (numBytes,label)
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def genWrapper(*args,**kwargs):
+                if not registry.enabled:
+                    return (yield from func(*args,**kwargs))
+                numBytes,label=begin(args,kwargs)
+                # only count time spent inside the generator, and
+                # only label that time (not the caller's code that
+                # runs while the generator is suspended)
+                stageTime=0.0
+                recordLabel=currentLabel.get() if label is None else label
+                gen=func(*args,**kwargs)
+
+                def resume(method:typing.Callable,arg:typing.Any
+                    )->typing.Any:
+                    nonlocal stageTime
+                    token=None
+                    if label is not None:
+                        token=currentLabel.set(label)
+                    start=perf_counter()
+                    try:
+                        return method(arg)
+                    finally:
+                        stageTime+=perf_counter()-start
+                        if token is not None:
+                            currentLabel.reset(token)
+                try:
+                    method:typing.Callable=gen.send
+                    arg=None
+                    while True:
+                        try:
+                            value=resume(method,arg)
+                        except StopIteration as e:
+                            return e.value
+                        try:
+                            arg=yield value
+                            method=gen.send
+                        except GeneratorExit:
+                            raise
+                        except BaseException as e: # noqa: E501 # pylint: disable=broad-exception-caught
+                            # pass it on to the generator, eg gen.throw()
+                            method=gen.throw
+                            arg=e
+                finally:
+                    resume(lambda _:gen.close(),None)
+                    registry.record(stage,stageTime,numBytes,
+                        label=recordLabel)
+            return genWrapper
+
+        @functools.wraps(func)
+        def wrapper(*args,**kwargs):
+            if not registry.enabled:
+                return func(*args,**kwargs)
+            numBytes,label=begin(args,kwargs)
+            token=None
+            if label is not None:
+                token=currentLabel.set(label)
+            start=perf_counter()
+            try:
+                return func(*args,**kwargs)
+            finally:
+                registry.record(stage,perf_counter()-start,numBytes)
+                if token is not None:
+                    currentLabel.reset(token)
+        return wrapper
+    return decorator
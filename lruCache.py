@@ -0,0 +1,118 @@
+"""
+A small, bounded, thread-safe least-recently-used cache
+
+Unlike functools.lru_cache, the key can be computed by the caller
+(eg, normalized text) and hits/misses are reported to instrumentation.
+"""
+import typing
+import threading
+from collections import OrderedDict
+from .instrumentation import registry
+
+
+K=typing.TypeVar('K')
+V=typing.TypeVar('V')
+
+
+class LruCache(typing.Generic[K,V]):
+    """
+    A bounded cache that forgets the least recently used item first
+    """
+
+    def __init__(self,maxSize:int=1024,stage:typing.Optional[str]=None):
+        """
+        :maxSize: maximum number of items to keep
+        :stage: if specified, record hits and misses under
+            this stage name in the instrumentation registry
+        """
+        if maxSize<1:
+            raise ValueError(f'Cache size must be at least 1, not {maxSize}')
+        self.maxSize=maxSize
+        self.stage=stage
+        self.hits=0
+        self.misses=0
+        self._items:'OrderedDict[K,V]'=OrderedDict()
+        self._lock=threading.Lock()
+
+    def _record(self,hit:bool)->None:
+        """
+        count a hit or miss
+        """
+        if hit:
+            self.hits+=1
+        else:
+            self.misses+=1
+        if self.stage is not None and registry.enabled:
+            registry.count(self.stage,'cacheHits' if hit else 'cacheMisses')
+
+    def get(self,key:K,default:typing.Any=None)->typing.Any:
+        """
+        get an item (and mark it as recently used)
+        """
+        with self._lock:
+            try:
+                value=self._items[key]
+            except KeyError:
+                self._record(False)
+                return default
+            self._items.move_to_end(key)
+            self._record(True)
+            return value
+
+    def put(self,key:K,value:V)->None:
+        """
+        add an item, forgetting the least recently used one if full
+        """
+        with self._lock:
+            self._items[key]=value
+            self._items.move_to_end(key)
+            if len(self._items)>self.maxSize:
+                self._items.popitem(last=False)
+
+    def getOrCompute(self,key:K,compute:typing.Callable[[],V])->V:
+        """
+        get an item, or compute and add it if not there
+
+        NOTE: compute() runs outside of the lock, so two threads
+        missing at the same time may both compute the value
+        """
+        with self._lock:
+            try:
+                value=self._items[key]
+            except KeyError:
+                self._record(False)
+            else:
+                self._items.move_to_end(key)
+                self._record(True)
+                return value
+        value=compute()
+        self.put(key,value)
+        return value
+
+    def clear(self)->None:
+        """
+        forget everything (and reset the hit/miss counts)
+        """
+        with self._lock:
+            self._items.clear()
+            self.hits=0
+            self.misses=0
+
+    @property
+    def hitRate(self)->typing.Optional[float]:
+        """
+        fraction of lookups that hit (None if no lookups)
+        """
+        lookups=self.hits+self.misses
+        if not lookups:
+            return None
+        return self.hits/lookups
+
+    def __contains__(self,key:K)->bool:
+        return key in self._items
+
+    def __len__(self)->int:
+        return len(self._items)
+
+    def __repr__(self):
+        return f'LruCache({len(self._items)}/{self.maxSize} items, {self.hits} hits, {self.misses} misses)' # noqa: E501 # pylint: disable=line-too-long
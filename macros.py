@@ -0,0 +1,578 @@
+"""
+Tools for defining and expanding c preprocessor macros
+
+Handles object-like and function-like macros, including
+stringizing (#), token pasting (##), variadics (__VA_ARGS__,
+__VA_OPT__ and the gnu ", ## __VA_ARGS__" comma elision)
+using hide sets so that recursive macros expand exactly
+the way a c compiler would.
+
+Can do helpful things like:
+    macros=MacroTable()
+    macros.define('SQUARE(x) ((x)*(x))')
+    macros.expand('SQUARE(3)') -> '((3)*(3))'
+"""
+import typing
+import re
+from .lruCache import LruCache
+
+
+_ppTokenRe=re.compile(r"""(?P<space>\s*)(?:
+    (?P<number>[.]?[0-9](?:[eEpP][+-]|[0-9A-Za-z_.'])*)
+    |(?P<char>(?:u8|[uUL])?'(?:[^'\\]|\\.)*')
+    |(?P<string>(?:u8|[uUL])?"(?:[^"\\]|\\.)*")
+    |(?P<identifier>[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<op>[.][.][.]|<<=|>>=|->|[+][+]|--|&&|[|][|]|<<|>>|<=|>=|==|!=|[#][#]|[-+*/%<>&|^!~?:(),=#\[\]{};.])
+    |(?P<other>\S))""",re.VERBOSE|re.DOTALL)
+
+# a token is (text,hideSet,spaceBefore)
+Token=typing.Tuple[str,typing.FrozenSet[str],bool]
+_noHide:typing.FrozenSet[str]=frozenset()
+# a generator that yields the generators it needs the results of
+# (instead of calling them) and returns its own result, see _run()
+_Steps=typing.Generator[typing.Any,typing.Any,typing.Any]
+
+def tokenizePreprocessor(text:str)->typing.List[str]:
+    """
+    break a line of (comment-free) code into preprocessor tokens
+    """
+    return [m.group(m.lastgroup or 0) for m in _ppTokenRe.finditer(text)
+        if m.lastgroup!='space']
+
+def _tokenize(text:str)->typing.List[Token]:
+    """
+    break code into tokens that remember their whitespace
+    """
+    return [(m.group(m.lastgroup or 0),_noHide,bool(m.group('space')))
+        for m in _ppTokenRe.finditer(text) if m.lastgroup!='space']
+
+def tokensToString(tokens:typing.Iterable[Token])->str:
+    """
+    turn tokens back into code
+    """
+    ret:typing.List[str]=[]
+    for text,_,space in tokens:
+        if space and ret:
+            ret.append(' ')
+        ret.append(text)
+    return ''.join(ret)
+
+def _stringize(tokens:typing.List[Token])->str:
+    """
+    the # operator
+    """
+    text=tokensToString(tokens)
+    ret=[]
+    for tok in _ppTokenRe.finditer(text):
+        if tok.group('space'):
+            ret.append(' ')
+        t=tok.group(tok.lastgroup or 0) if tok.lastgroup!='space' else ''
+        if tok.lastgroup in ('string','char'):
+            t=t.replace('\\','\\\\').replace('"','\\"')
+        ret.append(t)
+    return '"'+''.join(ret).strip()+'"'
+
+
+class Macro:
+    """
+    A single #define
+    """
+    __slots__=('name','params','variadic','body')
+
+    def __init__(self,
+        name:str,
+        body:typing.Union[str,typing.List[Token]]='',
+        params:typing.Optional[typing.List[str]]=None):
+        """
+        :params: None for object-like macros, otherwise the
+            list of parameter names (may end with "..." or "name...")
+        """
+        self.name=name
+        self.variadic=False
+        if params is not None:
+            params=list(params)
+            if params and params[-1].endswith('...'):
+                self.variadic=True
+                params[-1]=params[-1][:-3].strip() or '__VA_ARGS__'
+        self.params:typing.Optional[typing.Tuple[str,...]]=\
+            None if params is None else tuple(params)
+        if isinstance(body,str):
+            body=_tokenize(body.strip())
+        if body:
+            body[0]=(body[0][0],body[0][1],False)
+        self.body:typing.Tuple[Token,...]=tuple(body)
+
+    @property
+    def isFunctionLike(self)->bool:
+        """
+        whether this is a function-like macro, eg "#define F(x) x"
+        """
+        return self.params is not None
+
+    @property
+    def value(self)->str:
+        """
+        the unexpanded replacement text
+        """
+        return tokensToString(self.body)
+
+    def __eq__(self,other)->bool:
+        if not isinstance(other,Macro):
+            return False
+        return (self.name,self.params,self.variadic,self.value)==\
+            (other.name,other.params,other.variadic,other.value)
+
+    def __hash__(self)->int:
+        return hash((self.name,self.params))
+
+    def __repr__(self):
+        if self.params is None:
+            return f'#define {self.name} {self.value}'
+        params=list(self.params)
+        if self.variadic:
+            params[-1]='...' if params[-1]=='__VA_ARGS__' \
+                else params[-1]+'...'
+        return f'#define {self.name}({",".join(params)}) {self.value}'
+
+
+def _run(steps:_Steps)->typing.Any:
+    """
+    run a _Steps generator to completion
+
+    This keeps the generators that are waiting on each other in a list
+    rather than on the call stack, so that deeply nested macros
+    can't hit the recursion limit
+    """
+    stack=[steps]
+    value=None
+    error:typing.Optional[Exception]=None
+    while True:
+        try:
+            if error is None:
+                step=stack[-1].send(value)
+            else:
+                # pass it up to whatever was waiting on the result
+                step=stack[-1].throw(error)
+                error=None
+        except StopIteration as e:
+            stack.pop()
+            if not stack:
+                return e.value
+            value=e.value
+        except Exception as e: # pylint: disable=broad-except
+            stack.pop()
+            if not stack:
+                raise
+            error=e
+        else:
+            stack.append(step)
+            value=None
+
+
+class _HiddenOutside(Exception):
+    """
+    Raised when expanding without the outer hide set (see
+    MacroTable._invocation()) runs into a name that it hides
+    """
+
+    def __init__(self,name:str):
+        Exception.__init__(self,name)
+        self.name=name
+
+
+_defineRe=re.compile(r"""\s*(?P<name>[A-Za-z_][A-Za-z0-9_]*)(?:[(](?P<params>[^)]*)[)])?(?P<value>.*)""",re.DOTALL) # noqa: E501 # pylint: disable=line-too-long
+
+
+class MacroTable:
+    """
+    A set of macro definitions that can expand code
+
+    Expansions are memoized per (macro,arguments) and the memo
+    is discarded whenever a macro is defined or undefined.
+    """
+
+    def __init__(self,
+        defines:typing.Optional[typing.Mapping[str,str]]=None,
+        memoSize:int=4096):
+        """
+        :defines: {name:value} to start with
+            (name can be function-like, eg {"MAX(a,b)":"..."})
+        :memoSize: how many expansions to remember
+        """
+        self.macros:typing.Dict[str,Macro]={}
+        # {(name,args):(expanded,unfinished,namesLookedUp,macroPositions)}
+        # see _invocation()
+        self._memo:'LruCache[typing.Any,typing.Tuple[typing.List[Token],typing.List[Token],typing.FrozenSet[str],typing.Tuple[int,...]]]'=\
+            LruCache(memoSize,'macros.expand') # noqa: E501 # pylint: disable=line-too-long
+        if defines is not None:
+            for k,v in defines.items():
+                self.define(f'{k} {v}')
+
+    def __contains__(self,name:str)->bool:
+        return name in self.macros
+
+    def __getitem__(self,name:str)->Macro:
+        return self.macros[name]
+
+    def __iter__(self)->typing.Iterator[str]:
+        return iter(self.macros)
+
+    def __len__(self)->int:
+        return len(self.macros)
+
+    def get(self,name:str)->typing.Optional[Macro]:
+        """
+        get a macro by name, or None
+        """
+        return self.macros.get(name)
+
+    def define(self,directiveArgs:str)->Macro:
+        """
+        define a macro from the text after a "#define", eg
+            "SQUARE(x) ((x)*(x))"
+        """
+        m=_defineRe.match(directiveArgs)
+        if m is None:
+            raise SyntaxError(f'Bad #define "{directiveArgs}"')
+        params=None
+        if m.group('params') is not None:
+            params=[p.strip() for p in m.group('params').split(',')]
+            if params==['']:
+                params=[]
+        macro=Macro(m.group('name'),m.group('value'),params)
+        self.macros[macro.name]=macro
+        self._memo.clear()
+        return macro
+
+    def undefine(self,name:str)->None:
+        """
+        handle "#undef name"
+        """
+        if self.macros.pop(name.strip(),None) is not None:
+            self._memo.clear()
+
+    def expand(self,code:str)->str:
+        """
+        fully macro-expand a block of code
+        """
+        return tokensToString(self.expandTokens(_tokenize(code)))
+
+    def expandTokens(self,tokens:typing.Iterable[Token])->typing.List[Token]:
+        """
+        fully macro-expand a list of tokens
+        """
+        tokens=list(tokens)
+        macros=self.macros
+        if not any([t[0] in macros for t in tokens]):
+            return tokens
+        return _run(self._expand(tokens,set(),{},True))[0]
+
+    def _expand(self,tokens:typing.List[Token],
+        lookedUp:typing.Set[str],
+        outside:typing.Dict[str,int],
+        finish:bool=False)->_Steps:
+        """
+        macro-expand tokens up to the first function-like macro
+        invocation that is not finished by the end of the tokens
+
+        returns (expanded,unfinished) where unfinished are the
+        unexpanded tokens starting with that macro's name
+        (since, when the tokens are the result of another macro,
+        its arguments may come from whatever follows,
+        eg "#define h g(~" then "h 5)")
+
+        :lookedUp: adds the names of all macros that were looked up
+            (and not hidden)
+        :outside: {name:count} of outer hide sets that were left out,
+            see _invocation()
+        :finish: nothing more is coming to finish an invocation,
+            so leave the macro name be and carry on after it
+            (unfinished is always empty)
+        """
+        pending=list(tokens)
+        pending.reverse() # so that we can pop() the next one
+        out:typing.List[Token]=[]
+        while pending:
+            tok=pending.pop()
+            text,hideSet,space=tok
+            macro=self.macros.get(text)
+            if macro is None:
+                out.append(tok)
+                continue
+            if text in hideSet:
+                out.append(tok)
+                continue
+            if text in outside:
+                raise _HiddenOutside(text)
+            lookedUp.add(text)
+            if macro.params is None:
+                args=None
+                resultHide=hideSet|{text}
+            else:
+                # find the "(" (which may not be there)
+                if not pending and not finish:
+                    return (out,[tok])
+                if not pending or pending[-1][0]!='(':
+                    out.append(tok)
+                    continue
+                collected=self._collectArgs(pending,macro)
+                if collected is None:
+                    if finish:
+                        out.append(tok)
+                        continue
+                    pending.append(tok)
+                    pending.reverse()
+                    return (out,pending)
+                args,closeHide=collected
+                resultHide=(hideSet&closeHide)|{text}
+            expanded,unfinished=yield self._invocation(
+                macro,args,resultHide,lookedUp,outside)
+            if expanded:
+                out.append((expanded[0][0],expanded[0][1],space))
+                out.extend(expanded[1:])
+            elif unfinished:
+                unfinished=[(unfinished[0][0],unfinished[0][1],space)]+\
+                    unfinished[1:]
+            # an unfinished invocation may take its arguments
+            # from whatever comes next
+            pending.extend(reversed(unfinished))
+        return (out,[])
+
+    def _collectArgs(self,
+        pending:typing.List[Token],
+        macro:Macro
+        )->typing.Optional[typing.Tuple[
+            typing.List[typing.List[Token]],typing.FrozenSet[str]]]:
+        """
+        pop the arguments of a function-like macro invocation
+        from the (reversed) pending list
+
+        returns (args,hideSetOfClosingParen)
+        or None if there is no closing paren
+        """
+        numParams=len(macro.params) # type: ignore
+        args:typing.List[typing.List[Token]]=[[]]
+        depth=0
+        i=len(pending)-1 # the "("
+        while True:
+            i-=1
+            if i<0:
+                return None
+            tok=pending[i]
+            t=tok[0]
+            if t=='(':
+                depth+=1
+            elif t==')':
+                if depth==0:
+                    break
+                depth-=1
+            elif t==',' and depth==0 and \
+                    not (macro.variadic and len(args)>=numParams):
+                args.append([])
+                continue
+            args[-1].append(tok)
+        closeHide=pending[i][1]
+        del pending[i:]
+        if numParams==0 and args==[[]]:
+            args=[]
+        elif macro.variadic and len(args)==numParams-1:
+            # variadic part left out entirely
+            args.append([])
+        if len(args)!=numParams:
+            raise SyntaxError(f'Macro "{macro.name}" takes {numParams} arguments but got {len(args)}') # noqa: E501 # pylint: disable=line-too-long
+        return (args,closeHide)
+
+    def _invocation(self,
+        macro:Macro,
+        args:typing.Optional[typing.List[typing.List[Token]]],
+        hideSet:typing.FrozenSet[str],
+        lookedUp:typing.Set[str],
+        outside:typing.Dict[str,int]
+        )->_Steps:
+        """
+        fully expand a single macro invocation
+
+        returns (expanded,unfinished) the same as _expand()
+
+        The memo is keyed on only (macro,args), so it holds the expansion
+        without the outer hide set, which is the same in any context where
+        none of the macros it looked up are hidden (eg, every link of
+        a "#define A1 (A2+1)" chain is only expanded once)
+        """
+        key=(macro.name,None if args is None else
+            tuple([tuple(arg) for arg in args]))
+        outerHide=hideSet-{macro.name}
+        memo=self._memo.get(key)
+        if memo is None:
+            memoLookedUp:typing.Set[str]=set()
+            # anything hidden by the outer hide set must not be
+            # expanded in the meantime (or a cycle would never end)
+            for name in outerHide:
+                outside[name]=outside.get(name,0)+1
+            try:
+                hide=frozenset((macro.name,))
+                if args is None:
+                    body=[(t,h|hide,s) for t,h,s in macro.body]
+                else:
+                    body=yield self._substitute(macro,args,hide,
+                        memoLookedUp,outside)
+                if any([t[0] in self.macros for t in body]):
+                    expanded,unfinished=yield self._expand(body,
+                        memoLookedUp,outside)
+                else:
+                    expanded,unfinished=(body,[])
+            except _HiddenOutside as e:
+                if e.name not in outerHide:
+                    raise
+            else:
+                macroPositions=tuple([i for i,tok in enumerate(expanded)
+                    if tok[0] in self.macros])
+                memo=(expanded,unfinished,frozenset(memoLookedUp),
+                    macroPositions)
+                self._memo.put(key,memo)
+            finally:
+                for name in outerHide:
+                    outside[name]-=1
+                    if not outside[name]:
+                        del outside[name]
+        if memo is not None:
+            expanded,unfinished,memoLookedUp,macroPositions=memo
+            for name in memoLookedUp.intersection(outside):
+                raise _HiddenOutside(name)
+            if memoLookedUp.isdisjoint(outerHide):
+                lookedUp.update(memoLookedUp)
+                if not outerHide:
+                    return (expanded,unfinished)
+                # the outer hide set only matters for the names that may
+                # be expanded later on, and for whatever is left unfinished
+                if macroPositions:
+                    expanded=list(expanded)
+                    for i in macroPositions:
+                        t,h,s=expanded[i]
+                        expanded[i]=(t,h|outerHide,s)
+                return (expanded,[(t,h|outerHide,s) for t,h,s in unfinished])
+        # the outer hide set changes the result, so expand it for real
+        body=yield self._substitute(macro,args,hideSet,lookedUp,outside)
+        return (yield self._expand(body,lookedUp,outside))
+
+    def _substitute(self,
+        macro:Macro,
+        args:typing.Optional[typing.List[typing.List[Token]]],
+        hideSet:typing.FrozenSet[str],
+        lookedUp:typing.Set[str],
+        outside:typing.Dict[str,int]
+        )->_Steps:
+        """
+        replace parameters in a macro body with the arguments
+        (handling # and ##) and add hideSet to the result
+
+        :lookedUp: and :outside: see _expand()
+        """
+        body=list(macro.body)
+        params:typing.Dict[str,int]={}
+        if macro.params is not None and args is not None:
+            params={p:i for i,p in enumerate(macro.params)}
+            if macro.variadic:
+                body=self._vaOpt(body,bool(args[-1]))
+        out:typing.List[Token]=[]
+        expandedArgs:typing.Dict[int,typing.List[Token]]={}
+        i=0
+        n=len(body)
+        while i<n:
+            text,_,space=body[i]
+            nextText=body[i+1][0] if i+1<n else None
+            if text=='#' and nextText in params:
+                s=_stringize(args[params[nextText]]) # type: ignore
+                out.append((s,_noHide,space))
+                i+=2
+                continue
+            if text=='##' and i+1<n:
+                rhsText=body[i+1][0]
+                if rhsText in params:
+                    rhs=list(args[params[rhsText]]) # type: ignore
+                    if not rhs and out and out[-1][0]==',' and \
+                            macro.variadic and \
+                            params[rhsText]==len(params)-1:
+                        # gnu ", ## __VA_ARGS__" comma elision
+                        out.pop()
+                else:
+                    rhs=[body[i+1]]
+                if rhs:
+                    if out:
+                        lhs=out.pop()
+                        pasted=_tokenize(lhs[0]+rhs[0][0])
+                        if not lhs[0]:
+                            pasted=[rhs[0]]
+                        if pasted:
+                            pasted[0]=(pasted[0][0],pasted[0][1],lhs[2])
+                        out.extend(pasted)
+                        out.extend(rhs[1:])
+                    else:
+                        out.extend(rhs)
+                i+=2
+                continue
+            if text in params:
+                idx=params[text]
+                if nextText=='##':
+                    # operand of ## is not expanded
+                    arg=list(args[idx]) # type: ignore
+                    if not arg:
+                        # placemarker so we don't paste onto
+                        # whatever came before
+                        arg=[('',_noHide,space)]
+                else:
+                    if idx not in expandedArgs:
+                        arg=list(args[idx]) # type: ignore
+                        if any([t[0] in self.macros for t in arg]):
+                            arg=(yield self._expand(arg,lookedUp,outside,
+                                True))[0]
+                        expandedArgs[idx]=arg
+                    arg=list(expandedArgs[idx])
+                if arg:
+                    arg[0]=(arg[0][0],arg[0][1],space)
+                out.extend(arg)
+                i+=1
+                continue
+            out.append(body[i])
+            i+=1
+        # (most tokens share a few hide sets, so only union those once)
+        unions:typing.Dict[typing.FrozenSet[str],typing.FrozenSet[str]]={}
+        ret:typing.List[Token]=[]
+        for t,h,space in out:
+            if t:
+                hide=unions.get(h)
+                if hide is None:
+                    hide=unions[h]=h|hideSet
+                ret.append((t,hide,space))
+        return ret
+
+    def _vaOpt(self,body:typing.List[Token],hasVaArgs:bool
+        )->typing.List[Token]:
+        """
+        resolve c++20 __VA_OPT__(...) in a macro body
+        """
+        ret:typing.List[Token]=[]
+        i=0
+        while i<len(body):
+            tok=body[i]
+            if tok[0]!='__VA_OPT__' or i+1>=len(body) or body[i+1][0]!='(':
+                ret.append(tok)
+                i+=1
+                continue
+            depth=0
+            j=i+1
+            while j<len(body):
+                if body[j][0]=='(':
+                    depth+=1
+                elif body[j][0]==')':
+                    depth-=1
+                    if depth==0:
+                        break
+                j+=1
+            if hasVaArgs:
+                ret.extend(body[i+2:j])
+            i=j+1
+        return ret
+
+    def __repr__(self):
+        return '\n'.join([repr(m) for m in self.macros.values()])
@@ -0,0 +1,582 @@
+"""
+A lightweight c preprocessor pass that resolves
+#if/#ifdef/#ifndef/#elif/#else/#endif regions
+so that downstream parsers only ever see live code.
+
+Can do helpful things like:
+    cc=CompileCommand("gcc -D_WIN32 -DVERSION=3 foo.c","./")
+    for line in preprocessConditionals(code,cc):
+        ...
+"""
+import typing
+from collections.abc import Mapping
+import re
+from ._cppTools import cppRemoveComments, cppValue2PyValue
+from .macros import MacroTable, tokenizePreprocessor, tokensToString, Token, \
+    _run, _Steps
+from .stdio import decodeCEscapeSequences
+from .instrumentation import instrumented
+
+
+class PreprocessorError(Exception):
+    """
+    Exception for when a preprocessor directive cannot be understood
+    """
+    def __init__(self,msg:str,lineNumber:typing.Optional[int]=None):
+        """ """
+        if lineNumber is not None:
+            msg=f'line {lineNumber}: {msg}'
+        Exception.__init__(self,msg)
+        self.lineNumber=lineNumber
+
+
+class HasDefines(typing.Protocol):
+    """anything that has a defines member"""
+    defines:typing.Mapping[str,str]
+MacroDefinitionsCompatible=typing.Union[
+    typing.Mapping[str,typing.Any],
+    typing.Iterable[str],
+    HasDefines]
+
+def asMacroDefinitions(
+    defines:typing.Optional[MacroDefinitionsCompatible]
+    )->typing.Dict[str,str]:
+    """
+    take any MacroDefinitionsCompatible and return {name:value}
+
+    can be a mapping, a CompileCommand, or a list of
+    "NAME" or "NAME=VALUE" strings (just like -D flags)
+    """
+    if defines is None:
+        return {}
+    if hasattr(defines,"defines"):
+        defines=defines.defines # type: ignore
+    if isinstance(defines,Mapping):
+        return {str(k):('' if v is None else str(v))
+            for k,v in defines.items()}
+    if isinstance(defines,str):
+        defines=(defines,)
+    ret:typing.Dict[str,str]={}
+    for d in defines: # type: ignore
+        kv=d.split('=',1)
+        ret[kv[0]]=kv[1] if len(kv)>1 else '1'
+    return ret
+
+
+_unaryOps=('(','!','~','-','+')
+_binaryPrecedence:typing.Dict[str,int]={
+    '||':1,'&&':2,'|':3,'^':4,'&':5,
+    '==':6,'!=':6,'<':7,'<=':7,'>':7,'>=':7,
+    '<<':8,'>>':8,'+':9,'-':9,'*':10,'/':10,'%':10}
+
+def _cDivide(a:int,b:int)->int:
+    """
+    c integer division (truncates toward zero)
+    """
+    q=abs(a)//abs(b)
+    return q if (a<0)==(b<0) else -q
+
+_binaryOps:typing.Dict[str,typing.Callable[[int,int],int]]={
+    '||':lambda a,b:int(bool(a) or bool(b)),
+    '&&':lambda a,b:int(bool(a) and bool(b)),
+    '|':lambda a,b:a|b,
+    '^':lambda a,b:a^b,
+    '&':lambda a,b:a&b,
+    '==':lambda a,b:int(a==b),
+    '!=':lambda a,b:int(a!=b),
+    '<':lambda a,b:int(a<b),
+    '<=':lambda a,b:int(a<=b),
+    '>':lambda a,b:int(a>b),
+    '>=':lambda a,b:int(a>=b),
+    '<<':lambda a,b:a<<b,
+    '>>':lambda a,b:a>>b,
+    '+':lambda a,b:a+b,
+    '-':lambda a,b:a-b,
+    '*':lambda a,b:a*b,
+    '/':_cDivide,
+    '%':lambda a,b:a-_cDivide(a,b)*b}
+_comparisonOps=frozenset(('==','!=','<','<=','>','>='))
+
+# #if arithmetic is done in intmax_t/uintmax_t
+_intmaxBits=64
+_uintmaxMask=(1<<_intmaxBits)-1
+_intmaxMax=(1<<(_intmaxBits-1))-1
+
+def _cInt(value:int,unsigned:bool)->int:
+    """
+    wrap a python int to an intmax_t or uintmax_t value
+    """
+    value&=_uintmaxMask
+    if not unsigned and value>_intmaxMax:
+        value-=1<<_intmaxBits
+    return value
+
+
+class _ExpressionParser:
+    """
+    Evaluates a fully macro-expanded #if expression
+    using precedence climbing
+
+    Like a c preprocessor, values are intmax_t, or uintmax_t if they
+    have a "u" suffix (or are too big), and mixing the two converts
+    to unsigned, eg "-1 > 0u" is 1
+
+    (internally, values are (value,isUnsigned) and the parsing
+    methods are generators run by _run(), so that deeply nested
+    parentheses can't hit the recursion limit)
+    """
+
+    def __init__(self,tokens:typing.List[str]):
+        self.tokens=tokens
+        self.pos=0
+
+    def _peek(self)->typing.Optional[str]:
+        if self.pos<len(self.tokens):
+            return self.tokens[self.pos]
+        return None
+
+    def _next(self)->str:
+        tok=self._peek()
+        if tok is None:
+            raise PreprocessorError('Unexpected end of expression')
+        self.pos+=1
+        return tok
+
+    def evaluate(self)->int:
+        """
+        evaluate the whole expression
+        """
+        value=_run(self._ternary(True))
+        if self.pos<len(self.tokens):
+            raise PreprocessorError(
+                f'Unexpected "{self.tokens[self.pos]}" in expression')
+        return value[0]
+
+    def _ternary(self,live:bool)->_Steps:
+        cond=yield self._binary(1,live)
+        if self._peek()!='?':
+            return cond
+        self._next()
+        a=yield self._ternary(live and bool(cond[0]))
+        if self._next()!=':':
+            raise PreprocessorError('Expected ":" in expression')
+        b=yield self._ternary(live and not cond[0])
+        unsigned=a[1] or b[1]
+        return (_cInt((a if cond[0] else b)[0],unsigned),unsigned)
+
+    def _binary(self,minPrecedence:int,live:bool)->_Steps:
+        if self._peek() in _unaryOps:
+            lhs,lhsUnsigned=yield self._unary(live)
+        else:
+            lhs,lhsUnsigned=self._primary(self._next())
+        while True:
+            op=self._peek()
+            prec=_binaryPrecedence.get(op) # type: ignore
+            if prec is None or prec<minPrecedence:
+                return (lhs,lhsUnsigned)
+            self._next()
+            # short-circuit so we don't complain about eg "0 && 1/0"
+            rhsLive=live
+            if op=='&&':
+                rhsLive=live and bool(lhs)
+            elif op=='||':
+                rhsLive=live and not lhs
+            if self._peek() not in _unaryOps and _binaryPrecedence.get(
+                    self.tokens[self.pos+1] if self.pos+1<len(self.tokens)
+                    else '',0)<=prec:
+                # (a shortcut for the most common case)
+                rhs,rhsUnsigned=self._primary(self._next())
+            else:
+                rhs,rhsUnsigned=yield self._binary(prec+1,rhsLive)
+            if op in ('&&','||') or op in _comparisonOps:
+                unsigned=False
+            elif op in ('<<','>>'):
+                unsigned=lhsUnsigned
+            else:
+                # the usual arithmetic conversions
+                unsigned=lhsUnsigned or rhsUnsigned
+            if not rhsLive or not live:
+                lhs=0 if op!='||' else int(bool(lhs))
+                lhsUnsigned=unsigned
+                continue
+            lhs=self._operate(op,lhs,lhsUnsigned, # type: ignore
+                rhs,rhsUnsigned)
+            lhsUnsigned=unsigned
+
+    @staticmethod
+    def _operate(op:str,
+        lhs:int,lhsUnsigned:bool,
+        rhs:int,rhsUnsigned:bool)->int:
+        """
+        apply a binary operator the way c would
+        """
+        if op in ('&&','||'):
+            return _binaryOps[op](lhs,rhs)
+        if op in ('<<','>>'):
+            if rhs<0:
+                raise PreprocessorError('Negative shift count in expression')
+            if rhs>=_intmaxBits:
+                # (undefined in c, but this is what the hardware does
+                # for shifting everything out)
+                return 0 if op=='<<' or lhs>=0 else -1
+            if op=='<<':
+                return _cInt(lhs<<rhs,lhsUnsigned)
+            return lhs>>rhs
+        unsigned=lhsUnsigned or rhsUnsigned
+        lhs=_cInt(lhs,unsigned)
+        rhs=_cInt(rhs,unsigned)
+        if op in ('/','%') and rhs==0:
+            raise PreprocessorError('Division by zero in expression')
+        value=_binaryOps[op](lhs,rhs)
+        if op in _comparisonOps:
+            return value
+        return _cInt(value,unsigned)
+
+    def _unary(self,live:bool)->_Steps:
+        tok=self._next()
+        if tok=='(':
+            value=yield self._ternary(live)
+            if self._next()!=')':
+                raise PreprocessorError('Expected ")" in expression')
+            return value
+        if tok=='!':
+            return (int(not (yield self._unary(live))[0]),False)
+        if tok=='~':
+            operand,unsigned=yield self._unary(live)
+            return (_cInt(~operand,unsigned),unsigned)
+        if tok=='-':
+            operand,unsigned=yield self._unary(live)
+            return (_cInt(-operand,unsigned),unsigned)
+        if tok=='+':
+            return (yield self._unary(live))
+        return self._primary(tok)
+
+    @staticmethod
+    def _primary(tok:str)->typing.Tuple[int,bool]:
+        """
+        the value of a single literal or identifier
+        """
+        if tok[0].isalpha() or tok[0]=='_':
+            # any identifier left after macro expansion is 0
+            return (0,False)
+        try:
+            value=cppValue2PyValue(tok)
+        except ValueError as e:
+            raise PreprocessorError(
+                f'Unexpected "{tok}" in expression') from e
+        if isinstance(value,str):
+            # char literal
+            return (ord(value[0]) if value else 0,False)
+        if isinstance(value,bool):
+            return (int(value),False)
+        if not isinstance(value,int):
+            raise PreprocessorError(
+                f'Floating point "{tok}" not allowed in expression')
+        unsigned='u' in tok.lower() or value>_intmaxMax
+        return (_cInt(value,unsigned),unsigned)
+
+
+class ConditionalPreprocessor:
+    """
+    Resolves conditional preprocessor regions
+    while tracking #define and #undef in the live regions.
+    """
+
+    def __init__(self,
+        defines:typing.Optional[MacroDefinitionsCompatible]=None):
+        """
+        :defines: the starting macro environment,
+            eg {"_WIN32":"1"} or a CompileCommand
+        """
+        self.macros=MacroTable(asMacroDefinitions(defines))
+
+    def isDefined(self,name:str)->bool:
+        """
+        whether a macro is currently defined
+        """
+        return name in self.macros
+
+    def define(self,directiveArgs:str)->None:
+        """
+        handle the text after a "#define"
+        """
+        try:
+            self.macros.define(directiveArgs)
+        except SyntaxError as e:
+            raise PreprocessorError(str(e)) from e
+
+    def undefine(self,name:str)->None:
+        """
+        handle "#undef name"
+        """
+        self.macros.undefine(name)
+
+    def _expand(self,expression:str)->typing.List[str]:
+        """
+        resolve "defined" and expand macros within an #if expression
+        """
+        tokens=tokenizePreprocessor(expression)
+        resolved:typing.List[Token]=[]
+        i=0
+        while i<len(tokens):
+            tok=tokens[i]
+            i+=1
+            if tok!='defined':
+                resolved.append((tok,frozenset(),True))
+                continue
+            paren=i<len(tokens) and tokens[i]=='('
+            if paren:
+                i+=1
+            if i>=len(tokens):
+                raise PreprocessorError('Expected name after "defined"')
+            resolved.append(
+                ('1' if self.isDefined(tokens[i]) else '0',frozenset(),True))
+            i+=1
+            if paren:
+                if i>=len(tokens) or tokens[i]!=')':
+                    raise PreprocessorError('Expected ")" after "defined"')
+                i+=1
+        try:
+            expanded=[t[0] for t in self.macros.expandTokens(resolved)]
+        except SyntaxError as e:
+            raise PreprocessorError(str(e)) from e
+        # whatever function-like things are left over
+        # (eg __has_include(...)) count as 0
+        ret:typing.List[str]=[]
+        i=0
+        while i<len(expanded):
+            tok=expanded[i]
+            i+=1
+            if i<len(expanded) and expanded[i]=='(' and \
+                    (tok[0].isalpha() or tok[0]=='_'):
+                depth=0
+                while i<len(expanded):
+                    if expanded[i]=='(':
+                        depth+=1
+                    elif expanded[i]==')':
+                        depth-=1
+                        if depth==0:
+                            break
+                    i+=1
+                i+=1
+                tok='0'
+            ret.append(tok)
+        return ret
+
+    def evaluate(self,expression:str)->int:
+        """
+        evaluate an #if expression in the current macro environment
+        """
+        tokens=self._expand(expression)
+        if not tokens:
+            raise PreprocessorError('Empty expression')
+        return _ExpressionParser(tokens).evaluate()
+
+    def process(self,
+        lines:typing.Iterable[str],
+        keepLineNumbers:bool=False
+        )->typing.Generator[str,None,None]:
+        """
+        yield only the lines in live regions
+
+        NOTE: lines are expected to be comment-free
+        (see preprocessConditionals())
+
+        :keepLineNumbers: yield an empty line in place of
+            each dead or conditional-directive line
+        """
+        # stack of [parentLive,live,anyBranchTaken,sawElse]
+        stack:typing.List[typing.List[bool]]=[]
+        live=True
+        continued:typing.List[str]=[]
+        for lineNumber,line in enumerate(lines,1):
+            if continued or (line.endswith('\\') and
+                    line.lstrip().startswith('#')):
+                # join directive line continuations
+                continued.append(line[:-1] if line.endswith('\\') else line)
+                if line.endswith('\\'):
+                    if keepLineNumbers:
+                        yield ''
+                    continue
+                line=''.join(continued)
+                continued=[]
+            stripped=line.lstrip()
+            if not stripped.startswith('#'):
+                if live:
+                    yield line
+                elif keepLineNumbers:
+                    yield ''
+                continue
+            m=_directiveRe.match(stripped)
+            directive=m.group('directive') if m is not None else ''
+            args=m.group('args').strip() if m is not None else ''
+            try:
+                if directive in ('if','ifdef','ifndef'):
+                    if not live:
+                        stack.append([False,False,True,False])
+                    else:
+                        if directive=='if':
+                            cond=bool(self.evaluate(args))
+                        else:
+                            name=args.split(None,1)[0] if args else ''
+                            cond=self.isDefined(name)==(directive=='ifdef')
+                        stack.append([True,cond,cond,False])
+                        live=cond
+                elif directive in ('elif','elifdef','elifndef','else'):
+                    if not stack or stack[-1][3]:
+                        raise PreprocessorError(f'Unexpected #{directive}')
+                    top=stack[-1]
+                    if directive=='else':
+                        top[3]=True
+                    if not top[0] or top[2]:
+                        top[1]=False
+                    elif directive=='else':
+                        top[1]=True
+                    elif directive=='elif':
+                        top[1]=bool(self.evaluate(args))
+                    else:
+                        name=args.split(None,1)[0] if args else ''
+                        top[1]=self.isDefined(name)==(directive=='elifdef')
+                    top[2]=top[2] or top[1]
+                    live=top[1]
+                elif directive=='endif':
+                    if not stack:
+                        raise PreprocessorError('Unexpected #endif')
+                    stack.pop()
+                    live=stack[-1][1] if stack else True
+                else:
+                    if live:
+                        if directive=='define':
+                            self.define(args)
+                        elif directive=='undef':
+                            self.undefine(args.strip())
+                        yield line
+                    elif keepLineNumbers:
+                        yield ''
+                    continue
+            except PreprocessorError as e:
+                if e.lineNumber is not None:
+                    raise
+                raise PreprocessorError(str(e),lineNumber) from e
+            if keepLineNumbers:
+                yield ''
+        if stack:
+            raise PreprocessorError('Missing #endif')
+
+_directiveRe=re.compile(r"""#\s*(?P<directive>[A-Za-z_]*)(?P<args>.*)""",re.DOTALL) # noqa: E501 # pylint: disable=line-too-long
+
+
+@instrumented('preprocessor.preprocessConditionals',sizeArg='code')
+def preprocessConditionals(
+    code:str,
+    defines:typing.Optional[MacroDefinitionsCompatible]=None,
+    keepLineNumbers:bool=False
+    )->typing.Generator[str,None,None]:
+    """
+    Strip comments and yield only the lines of code
+    that are live given a set of macro definitions.
+
+    :defines: the macro environment, eg {"_WIN32":"1"}
+        or a CompileCommand (to use its -D flags)
+    :keepLineNumbers: yield an empty line in place of
+        each dead or conditional-directive line
+    """
+    pp=ConditionalPreprocessor(defines)
+    yield from pp.process(
+        cppRemoveComments(code).split('\n'),keepLineNumbers)
+
+def evaluatePreprocessorExpression(
+    expression:str,
+    defines:typing.Optional[MacroDefinitionsCompatible]=None
+    )->int:
+    """
+    Evaluate an #if style constant expression, eg
+        "defined(FOO) && VERSION>=3"
+    """
+    return ConditionalPreprocessor(defines).evaluate(expression)
+
+_castWordRe=re.compile(r"""(?:u?int(?:_least|_fast)?[0-9]+_t|u?intptr_t|size_t|int|unsigned|signed|long|short|char|const|volatile|[*])""") # noqa: E501 # pylint: disable=line-too-long
+
+def _stripIntegerCasts(tokens:typing.List[str])->typing.List[str]:
+    """
+    remove casts like "(uint32_t)" or "(volatile unsigned long *)"
+    which do not change the value of a constant
+    """
+    ret:typing.List[str]=[]
+    i=0
+    while i<len(tokens):
+        if tokens[i]=='(':
+            j=i+1
+            while j<len(tokens) and _castWordRe.fullmatch(tokens[j]):
+                j+=1
+            if j>i+1 and j+1<len(tokens) and tokens[j]==')' and \
+                    tokens[j+1] not in _binaryPrecedence and \
+                    tokens[j+1] not in (')','?',':',','):
+                i=j+1
+                continue
+        ret.append(tokens[i])
+        i+=1
+    return ret
+
+def _closesAtEnd(tokens:typing.List[str])->bool:
+    """
+    check if the first token is a "(" that is closed by the last token
+    (so not eg "(1<<3)|(1<<4)")
+    """
+    if tokens[0]!='(' or tokens[-1]!=')':
+        return False
+    depth=0
+    for i,t in enumerate(tokens):
+        if t=='(':
+            depth+=1
+        elif t==')':
+            depth-=1
+            if depth==0:
+                return i==len(tokens)-1
+    return False
+
+def evaluateCValue(
+    code:str,
+    macros:typing.Optional[MacroTable]=None,
+    known:typing.Optional[typing.Mapping[str,typing.Any]]=None
+    )->typing.Any:
+    """
+    Determine the final python value of some c code,
+    such as the value of a #define or an enum initializer, eg
+        "(FLAG_A|(1<<3))" -> 9
+
+    :macros: macros to expand first
+    :known: values of other named things, eg enum values
+
+    returns an int/float/str/etc if the value can be determined,
+    otherwise returns the macro-expanded code
+    """
+    tokens=tokenizePreprocessor(code)
+    if macros is not None and tokens:
+        tokens=[t[0] for t in macros.expandTokens(
+            [(t,frozenset(),True) for t in tokens])]
+    if not tokens:
+        return ''
+    if all([t[-1]=='"' for t in tokens]):
+        # string literal (or adjacent ones to concatenate)
+        return ''.join([
+            decodeCEscapeSequences(t[t.index('"')+1:-1]) for t in tokens])
+    if known:
+        # (only names, in case something bogus like "1" is known)
+        tokens=[(str(known[t]) if (t[0].isalpha() or t[0]=='_') and
+                isinstance(known.get(t),int) else t)
+            for t in tokens]
+    tokens=_stripIntegerCasts(tokens)
+    while len(tokens)>2 and _closesAtEnd(tokens):
+        tokens=tokens[1:-1]
+    if len(tokens)==1 or (len(tokens)==2 and tokens[0] in '+-'):
+        try:
+            return cppValue2PyValue(''.join(tokens))
+        except ValueError:
+            pass
+    if not any([t[0].isalpha() or t[0]=='_' for t in tokens]):
+        try:
+            return _ExpressionParser(tokens).evaluate()
+        except PreprocessorError:
+            pass
+    return tokensToString([(t,frozenset(),True) for t in tokens])
@@ -6,6 +6,7 @@ eg printf(r"I got %d problems, but \"%s\" aint one\n", 99, "print-effin")
 """
 import typing
 import regex as re
+from .instrumentation import instrumented, registry
 
 
 class PrinfIncorrectValues(Exception):
@@ -117,6 +118,7 @@ class Printf:
         """
         return self._valuePlaceholders
 
+    @instrumented('stdio.Printf.parse')
     def _fmtToTape(self):
         """
         turn the member printf format into an executable tape
@@ -131,6 +133,8 @@ class Printf:
                 self._tape.append(txt)
             # the % format decoded by the regex
             placeholder=PrintfFormatPlaceholder(**m.groupdict())
+            if registry.enabled:
+                registry.count('stdio.Printf.parse','matches')
             self._tape.append(placeholder)
             self._valuePlaceholders.append(placeholder)
             p=m.end()
@@ -139,6 +143,7 @@ class Printf:
             txt=decodeCEscapeSequences(self._fmt[p:])
             self._tape.append(txt)
 
+    @instrumented('stdio.Printf.sprintf')
     def sprintf(self,*values)->str:
         """
         Get this printf string as applied to a set of value
@@ -200,56 +205,139 @@ def printf(fmt:str,*args)->None:
     return Printf(fmt)(*args)
 
 
+_simpleEscapes:typing.Dict[str,str]={
+    'n':'\n','r':'\r','t':'\t','a':'\a','b':'\b','f':'\f','v':'\v',
+    'e':'\x1b','E':'\x1b','\\':'\\','\'':'\'','"':'"','?':'?'}
+_escapeRe=re.compile(
+    r"""\\(?:(?<oct>[0-7]{1,3})|x(?<hex>[0-9a-fA-F]+)|u(?<u16>[0-9a-fA-F]{4})|U(?<u32>[0-9a-fA-F]{8})|(?<simple>.)|$)""", # noqa: E501 # pylint: disable=line-too-long
+    re.DOTALL)
+_escapeBytesRe=re.compile(_escapeRe.pattern.encode('ascii'),re.DOTALL)
+
+def _escapedChar(value:int,escape:str)->str:
+    """
+    the character for a numeric escape sequence
+    """
+    if value>0x10ffff:
+        raise ValueError(f'Escape sequence "{escape}" out of range for a character') # noqa: E501 # pylint: disable=line-too-long
+    return chr(value)
+
+def _decodeEscape(m)->str:
+    """
+    regex callback to decode a single escape sequence
+    """
+    kind=m.lastgroup
+    if kind=='simple':
+        c=m.group('simple')
+        # unknown escapes are just the character (same as gcc)
+        return _simpleEscapes.get(c,c)
+    if kind is None:
+        # lone backslash at the end
+        return '\\'
+    return _escapedChar(int(m.group(kind),8 if kind=='oct' else 16),
+        m.group(0))
+
+@instrumented('stdio.decodeCEscapeSequences',sizeArg=0)
 def decodeCEscapeSequences(s:str)->str:
     r"""
     Decode backslashed values such as "\n"
 
+    Supports every c escape: simple escapes (\n \t \a \e ...),
+    octal (\0 \101), hex (\x41) and unicode (\u00e9 \U0001F600)
+
     see also:
         https://en.wikipedia.org/wiki/Escape_sequences_in_C
     """
-    ret=[]
-    for bs in s.split('\\'):
-        if ret:
-            if bs[0]=='n':
-                ret.append('\n')
-                ret.append(bs[1:])
-            elif bs[0]=='r':
-                ret.append('\r')
-                ret.append(bs[1:])
-            elif bs[0]=='t':
-                ret.append('\t')
-                ret.append(bs[1:])
-            elif bs[0]=='b':
-                raise NotImplementedError(
-                    r'Dont know how to add backspace ("\b") to python string')
-            elif bs[0]=='e':
-                raise NotImplementedError(
-                    r'Dont know how to add escape ("\e") to python string')
-            elif bs[0]=='f':
-                raise NotImplementedError(
-                    r'Dont know how to add formfeed ("\f") to python string')
-            elif bs[0]=='v':
-                raise NotImplementedError(
-                    r'Dont know how to add v-tab ("\v") to python string')
-            elif bs[0]=='a':
-                raise NotImplementedError(
-                    r'Dont know how to add alert/bell ("\a") to python string')
-            elif bs[0] in '01234567':
-                raise NotImplementedError(
-                    r'Dont know how to add octals to python string')
-            elif bs[0]=='x':
-                raise NotImplementedError(
-                    r'Dont know how to add hex char to python string')
-            elif bs[0] in 'uU':
-                raise NotImplementedError(
-                    r'Dont know how to add unicode char to python string')
-            else:
-                ret.append(bs)
-        else:
-            ret.append(bs)
-    return ''.join(ret)
+    if '\\' not in s:
+        return s
+    return _escapeRe.sub(_decodeEscape,s)
+
+def _decodeEscapeBytes(m,encoding:str)->bytes:
+    """
+    regex callback to decode a single escape sequence as bytes
+    """
+    kind=m.lastgroup
+    if kind=='simple':
+        c=m.group('simple').decode('latin-1')
+        return _simpleEscapes.get(c,c).encode('latin-1')
+    if kind is None:
+        return b'\\'
+    if kind in ('u16','u32'):
+        escape=m.group(0).decode('latin-1')
+        try:
+            return _escapedChar(int(m.group(kind),16),escape).encode(encoding)
+        except UnicodeEncodeError:
+            # eg, a lone surrogate like "\ud800"
+            raise ValueError(f'Escape sequence "{escape}" can not be encoded as {encoding}') from None # noqa: E501 # pylint: disable=line-too-long
+    value=int(m.group(kind),8 if kind=='oct' else 16)
+    if value>0xff:
+        raise ValueError(f'Escape sequence "{m.group(0).decode("latin-1")}" out of range for a byte') # noqa: E501 # pylint: disable=line-too-long
+    return bytes((value,))
+
+@instrumented('stdio.decodeCEscapeSequencesBytes',sizeArg=0)
+def decodeCEscapeSequencesBytes(
+    s:typing.Union[str,bytes],
+    encoding:str='utf-8'
+    )->bytes:
+    r"""
+    Decode backslashed values such as "\n" into raw bytes
+
+    Unlike decodeCEscapeSequences(), octal and hex escapes
+    become single bytes, so this can represent data that is
+    not valid in any text encoding, eg "\xff\xfe"
 
+    :encoding: used to encode regular text and unicode escapes
+    """
+    if isinstance(s,str):
+        s=s.encode(encoding)
+    if b'\\' not in s:
+        return s
+    return _escapeBytesRe.sub(lambda m:_decodeEscapeBytes(m,encoding),s)
 
-p=Printf(r"Got %d problems but %s aint one\n")
-print(p.parameters)
-#p(99,"pie")
+def _encodeTable()->typing.Dict[int,str]:
+    """
+    build the translate table used by encodeCEscapeSequences()
+    """
+    table:typing.Dict[int,str]={}
+    for i in list(range(0x20))+list(range(0x7f,0x100)):
+        # always 3 digits so the next character can't be mistaken
+        # as part of the escape (unlike hex, which is greedy)
+        table[i]=f'\\{i:03o}'
+    for k,v in _simpleEscapes.items():
+        if k not in 'eE?\'':
+            table[ord(v)]='\\'+k
+    return table
+_encodeTextTable=_encodeTable()
+_encodeBytesTable=dict(_encodeTextTable)
+for _i in range(0x80,0x100):
+    del _encodeTextTable[_i]
+_nonAsciiRe=re.compile(r"""[^\x00-\x7f]""")
+
+def _encodeNonAscii(m)->str:
+    """
+    regex callback to encode a single non-ascii character
+    """
+    c=ord(m.group(0))
+    if c>0xffff:
+        return f'\\U{c:08x}'
+    return f'\\u{c:04x}'
+
+@instrumented('stdio.encodeCEscapeSequences',sizeArg=0)
+def encodeCEscapeSequences(
+    s:typing.Union[str,bytes],
+    asciiOnly:bool=False
+    )->str:
+    r"""
+    The inverse of decodeCEscapeSequences()
+    turns a string into something that can go between quotes
+    in c code, eg 'say "hi"\n' -> 'say \"hi\"\\n'
+
+    :s: if this is bytes, all non-ascii bytes are octal escaped
+        (the inverse of decodeCEscapeSequencesBytes())
+    :asciiOnly: escape all non-ascii characters with \u or \U
+    """
+    if isinstance(s,bytes):
+        return s.decode('latin-1').translate(_encodeBytesTable)
+    ret=s.translate(_encodeTextTable)
+    if asciiOnly:
+        ret=_nonAsciiRe.sub(_encodeNonAscii,ret)
+    return ret
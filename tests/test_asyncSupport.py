@@ -0,0 +1,104 @@
+"""
+Tests for the async variants of the blocking tools
+"""
+import typing
+import sys
+import time
+import asyncio
+import threading
+import contextlib
+import pytest
+from ..asyncSupport import setConcurrencyLimit, runBlocking
+from ..cEnums import loadCEnums, aloadCEnums
+from ..includes import HeaderNotFoundException, headersAvailable, \
+    findHeader, aheadersAvailable, afindHeader
+from ..compileCommands import CompileCommand
+
+
+@contextlib.contextmanager
+def _concurrencyLimit(limit:int)->typing.Generator[None,None,None]:
+    """
+    temporarily change the concurrency limit
+    """
+    setConcurrencyLimit(limit)
+    try:
+        yield
+    finally:
+        setConcurrencyLimit(8)
+
+def _write(filename,text:str)->None:
+    with open(filename,'w',encoding='utf-8') as f:
+        f.write(text)
+
+def testALoadCEnums(tmp_path):
+    filename=str(tmp_path/'a.h')
+    _write(filename,'\ntypedef enum Color { RED, GREEN=5, BLUE } Color;\n'
+        '#ifdef BIG\n#define SIZE 100\n#else\n#define SIZE 10\n#endif\n')
+    for defines in (None,{'BIG':'1'}):
+        assert asyncio.run(aloadCEnums(filename,defines=defines))==\
+            loadCEnums(filename,defines=defines)
+    assert asyncio.run(aloadCEnums(filename))['Color']=={
+        'RED':0,'GREEN':5,'BLUE':6}
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(aloadCEnums(str(tmp_path/'missing.h')))
+
+def testAHeadersAvailable(tmp_path):
+    dirs=[]
+    for d in ('z','a','m'):
+        (tmp_path/d).mkdir()
+        dirs.append(str(tmp_path/d))
+        _write(tmp_path/d/f'{d}.h','')
+        _write(tmp_path/d/'common.h','')
+        _write(tmp_path/d/'notAHeader.c','')
+    async def collect(fullFilename:bool)->list:
+        return [h async for h in aheadersAvailable(dirs,fullFilename)]
+    # in include path order, even though they are listed concurrently
+    for fullFilename in (True,False):
+        assert asyncio.run(collect(fullFilename))==\
+            list(headersAvailable(dirs,fullFilename))
+    for baseDir in (None,str(tmp_path)):
+        assert asyncio.run(afindHeader('common.h',dirs,baseDir))==\
+            findHeader('common.h',dirs,baseDir)
+    assert asyncio.run(afindHeader('m.h',dirs,str(tmp_path)))==\
+        str(tmp_path/'m'/'m.h')
+    with pytest.raises(HeaderNotFoundException,match='commo.h'):
+        asyncio.run(afindHeader('commo.h',dirs))
+
+def testRunBlockingLimit():
+    lock=threading.Lock()
+    running=[0]
+    maxRunning=[0]
+    def work():
+        with lock:
+            running[0]+=1
+            maxRunning[0]=max(maxRunning[0],running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0]-=1
+    async def main():
+        await asyncio.gather(*[runBlocking(work) for _ in range(8)])
+    with _concurrencyLimit(2):
+        asyncio.run(main())
+    assert maxRunning[0]==2
+    with pytest.raises(ValueError):
+        setConcurrencyLimit(0)
+
+@pytest.mark.skipif(sys.platform=='win32',reason='posix shell')
+def testACompileConcurrency(tmp_path):
+    log=tmp_path/'log'
+    cc=CompileCommand(f'echo start >> "{log}"; sleep 0.2; '
+        f'echo end >> "{log}"; echo',str(tmp_path))
+    async def main():
+        return await asyncio.gather(*[cc.acompile(str(i)) for i in range(6)])
+    with _concurrencyLimit(2):
+        results=asyncio.run(main())
+    assert sorted(results)==[(0,str(i)) for i in range(6)]
+    running=0
+    maxRunning=0
+    with open(log,encoding='utf-8') as f:
+        for line in f:
+            running+=1 if line.strip()=='start' else -1
+            maxRunning=max(maxRunning,running)
+    assert maxRunning==2
+    # the same as the blocking version
+    assert cc.compile('x')==asyncio.run(cc.acompile('x'))
@@ -0,0 +1,32 @@
+"""
+Tests for loading and writing enums and #defines
+"""
+import io
+from ..cEnums import parseCEnums, writeCEnums
+
+
+def testBadMacroCallKeepsRawValue():
+    # one bad function-like macro call should not spoil the whole file
+    enums=parseCEnums('#define F(x) x\n#define X F(1,2)\n#define Y F(3)\n')
+    assert enums[None]=={'X':'F(1,2)','Y':3}
+
+_mapping={
+    None:{'SMALL':5,'BIG':0x12345678,'NEG':-3,'MIN64':-(1<<63),
+        'MAXU64':(1<<64)-1,'PI':3.5,'NAME':'a"b\n'},
+    'Color':{'RED':0,'GREEN':7,'BLUE':8},
+    'Mode':{'M0':-1,'M1':0}}
+
+def testWriteRoundTrip():
+    for baseFormat in ('int','hex','oct'):
+        for typedDefines in (True,False):
+            out=io.StringIO()
+            writeCEnums(_mapping,out,baseFormat,typedDefines)
+            assert parseCEnums(out.getvalue())==_mapping
+
+def testHeaderGuardIsNotADefine():
+    out=io.StringIO()
+    writeCEnums(_mapping,out,headerGuard='COLORS_H')
+    assert '#ifndef COLORS_H' in out.getvalue()
+    assert parseCEnums(out.getvalue())==_mapping
+    # (a real empty #define is still reported)
+    assert parseCEnums('#define FEATURE\n')[None]=={'FEATURE':''}
@@ -0,0 +1,111 @@
+"""
+Tests for laying out c structs
+
+(expected layouts are what gcc -m64, gcc -m32 and
+gcc -mms-bitfields produce)
+"""
+import struct
+from ..cStructs import parseCStructs,ABI_LP64,ABI_ILP32,ABI_LLP64
+
+
+def _offsets(layout):
+    return [(f.name,f.offset) for f in layout.fields]
+
+def testPrimitiveLayouts():
+    code='struct S { char c; long l; char c2; long long ll; char c3; double d; void *p; short s; };' # noqa: E501 # pylint: disable=line-too-long
+    lp64=parseCStructs(code,ABI_LP64)['S']
+    assert (lp64.size,lp64.alignment)==(64,8)
+    assert _offsets(lp64)==[('c',0),('l',8),('c2',16),('ll',24),('c3',32),('d',40),('p',48),('s',56)] # noqa: E501 # pylint: disable=line-too-long
+    ilp32=parseCStructs(code,ABI_ILP32)['S']
+    assert (ilp32.size,ilp32.alignment)==(40,4)
+    assert _offsets(ilp32)==[('c',0),('l',4),('c2',8),('ll',12),('c3',20),('d',24),('p',32),('s',36)] # noqa: E501 # pylint: disable=line-too-long
+    llp64=parseCStructs(code,ABI_LLP64)['S']
+    assert (llp64.size,llp64.alignment)==(56,8)
+    assert _offsets(llp64)==[('c',0),('l',4),('c2',8),('ll',16),('c3',24),('d',32),('p',40),('s',48)] # noqa: E501 # pylint: disable=line-too-long
+
+def testPack():
+    code='''
+        #pragma pack(push,2)
+        struct Pack2 { char c; int i; long long ll; };
+        #pragma pack(pop)
+        struct Natural { char c; int i; long long ll; };
+        '''
+    layouts=parseCStructs(code,ABI_LP64)
+    assert (layouts['Pack2'].size,layouts['Pack2'].alignment)==(14,2)
+    assert _offsets(layouts['Pack2'])==[('c',0),('i',2),('ll',6)]
+    assert layouts['Natural'].size==16
+
+def testPacked():
+    code='struct __attribute__((packed)) S { char c; int i; short s; };'
+    layout=parseCStructs(code,ABI_LP64)['S']
+    assert (layout.size,layout.alignment)==(7,1)
+    assert _offsets(layout)==[('c',0),('i',1),('s',5)]
+    assert layout.formatString=='<cih'
+
+def testFlexibleArray():
+    code='struct S { char n; double data[]; };'
+    for abi,size in ((ABI_LP64,8),(ABI_ILP32,4),(ABI_LLP64,8)):
+        layout=parseCStructs(code,abi)['S']
+        assert layout.size==size
+        assert layout.offsetof('data')==size
+    assert layout.flatFieldNames==['n']
+
+def testUnions():
+    code='''
+        union U { char c; int i; double d; };
+        typedef union { short s; char bytes[3]; } V;
+        struct S { char c; union U u; V v; union { int x; float y; }; };
+        '''
+    for abi,size,offsets in (
+            (ABI_LP64,24,[('c',0),('u',8),('v',16),('x',20),('y',20)]),
+            (ABI_ILP32,20,[('c',0),('u',4),('v',12),('x',16),('y',16)])):
+        layouts=parseCStructs(code,abi)
+        assert layouts['U'].isUnion
+        assert layouts['U'].size==8
+        assert layouts['V'].size==4
+        assert layouts['S'].size==size
+        assert _offsets(layouts['S'])==offsets
+    # a union decodes as its first member
+    layout=layouts['S']
+    data=struct.pack('<c3xq4s4s',b'A',-1,b'xyz\0',struct.pack('<f',1.5))
+    values=layout.unpack(data)
+    assert values['u.c']==b'\xff'
+    assert values['v.s']==ord('x')|ord('y')<<8
+    assert values['x']==struct.unpack('<i',struct.pack('<f',1.5))[0]
+
+def testBitfields():
+    code='struct S { char c; unsigned int a:3, b:7; unsigned short :0; unsigned short d:12; int e; long long f:40, g:30; };' # noqa: E501 # pylint: disable=line-too-long
+    for abi,size,offsets in (
+            (ABI_LP64,32,[('c',0),('a',1),('b',1),('d',4),('e',8),('f',16),('g',24)]), # noqa: E501 # pylint: disable=line-too-long
+            (ABI_ILP32,24,[('c',0),('a',1),('b',1),('d',4),('e',8),('f',12),('g',17)]), # noqa: E501 # pylint: disable=line-too-long
+            (ABI_LLP64,32,[('c',0),('a',4),('b',4),('d',8),('e',12),('f',16),('g',24)])): # noqa: E501 # pylint: disable=line-too-long
+        layout=parseCStructs(code,abi)['S']
+        assert layout.size==size
+        assert _offsets(layout)==offsets
+        assert layout.fields[2].bitOffset==3
+
+def testUnpackBitfields():
+    code='struct S { unsigned char a:3; signed char b:4; _Bool c:1; int d; };'
+    layout=parseCStructs(code,ABI_LP64)['S']
+    assert layout.size==8
+    assert layout.flatFieldNames==['d']
+    data=bytes([0b11110101,0,0,0])+struct.pack('<i',42)
+    assert layout.unpack(data)=={'a':5,'b':-2,'c':True,'d':42}
+
+def testUnnamedBitfieldAlignment():
+    # gcc ignores unnamed bitfields for alignment, msvc does not
+    code='struct S { char c; int :4; };'
+    assert parseCStructs(code,ABI_LP64)['S'].size==2
+    assert parseCStructs(code,ABI_LLP64)['S'].size==8
+
+def testFunctionPointersAndInlineEnums():
+    code='''
+        typedef int (*Callback)(int,int);
+        struct S { char c; int (*fn)(int,float); void (*table[2])(void); Callback cb; enum {RED,GREEN} color; };
+        ''' # noqa: E501 # pylint: disable=line-too-long
+    layout=parseCStructs(code,ABI_LP64)['S']
+    assert (layout.size,layout.alignment)==(48,8)
+    assert _offsets(layout)==[('c',0),('fn',8),('table',16),('cb',32),('color',40)] # noqa: E501 # pylint: disable=line-too-long
+    assert layout.fields[1].typeName=='int (*)(int,float)'
+    layout=parseCStructs(code,ABI_ILP32)['S']
+    assert _offsets(layout)==[('c',0),('fn',4),('table',8),('cb',16),('color',20)] # noqa: E501 # pylint: disable=line-too-long
@@ -0,0 +1,36 @@
+"""
+Tests for c integral type names, ranges and printf formats
+"""
+import pytest
+from ..c_integral_types import IntegralCType, IntegralCTypeGoal
+
+
+def testValueRanges():
+    assert (IntegralCType(8).minValue,IntegralCType(8).maxValue)==(-128,127)
+    assert (IntegralCType(8,False).minValue,IntegralCType(8,False).maxValue)==(0,255) # noqa: E501 # pylint: disable=line-too-long
+    assert IntegralCType(64).minValue==-(1<<63)
+    assert IntegralCType(64,False).maxValue==(1<<64)-1
+    # the range comes from the bits, not the bytes that house them
+    assert IntegralCType(12).maxValue==2047
+    assert IntegralCType(12,False).maxValue==4095
+
+def testPrintfStrings():
+    assert IntegralCType(8).printfString=='%hhd'
+    assert IntegralCType(64,False).printfString=='%llu'
+    assert IntegralCType(16,False,baseFormat='hex').printfString=='0x%04hX'
+    assert IntegralCType(16,False,baseFormat='hex',preferCaps=False).printfString=='0x%04hx' # noqa: E501 # pylint: disable=line-too-long
+    # enough octal digits for all of the bits, after a leading 0
+    assert IntegralCType(16,False,baseFormat='oct').printfString=='0%06ho'
+    assert IntegralCType(32,False,baseFormat='oct').printfString=='0%011lo'
+    assert IntegralCType(8,False,baseFormat='oct').scanfString=='%hho'
+
+def testCTypeNames():
+    exact=IntegralCTypeGoal.EXACT
+    assert IntegralCType(16,False,exact).cTypeName=='uint16_t'
+    assert IntegralCType(64,True,exact).cTypeName=='int64_t'
+    assert IntegralCType(12,False,IntegralCTypeGoal.LEAST).cTypeName=='uint_least16_t' # noqa: E501 # pylint: disable=line-too-long
+    assert IntegralCType(32,True,IntegralCTypeGoal.FAST,False).cTypeName=='int_fast32_t' # noqa: E501 # pylint: disable=line-too-long
+    assert IntegralCType(8,False,exact).cMaxValueName=='UINT8_MAX'
+    assert IntegralCType(8,True,exact).cMinValueName=='INT8_MIN'
+    with pytest.raises(NotImplementedError):
+        _=IntegralCType(32).cTypeName
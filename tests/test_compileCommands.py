@@ -0,0 +1,50 @@
+"""
+Tests for breaking down compile commands
+"""
+import os
+import pytest
+from ..compileCommands import ParsedCompileCommand, parseCompileCommand, \
+    _splitCommandLine
+
+
+@pytest.mark.skipif(os.sep!='/',reason='posix paths')
+def testParsedFields():
+    parsed=parseCompileCommand(
+        'gcc -iquote q -Iinc -I /abs/inc -isystem sys -idirafter after -I- '
+        '-DA -D B=2 "-DC=a b" -DA=3 -UB -std=c11 --target=arm-none-eabi '
+        '-c foo.c -o foo.o','/base')
+    assert parsed==ParsedCompileCommand(
+        compiler='gcc',
+        iquoteDirs=('/base/q',),
+        includeDirs=('/base/inc','/abs/inc'),
+        systemDirs=('/base/sys',),
+        afterDirs=('/base/after',),
+        defines=(('C','a b'),('A','3')),
+        undefines=('B',),
+        standard='c11',
+        target='arm-none-eabi')
+    assert parsed.includePaths==('/base/q','/base/inc','/abs/inc',
+        '/base/sys','/base/after')
+    assert parsed.systemIncludePaths==('/base/inc','/abs/inc',
+        '/base/sys','/base/after')
+    # only flags, no compiler
+    parsed=parseCompileCommand('-target x86_64-linux-gnu --std gnu++17','/')
+    assert (parsed.compiler,parsed.target,parsed.standard)==(
+        '','x86_64-linux-gnu','gnu++17')
+
+def testCached():
+    parsed=parseCompileCommand('cc -DX','/')
+    assert parseCompileCommand('cc -DX','/') is parsed
+
+def testSplitCommandLine():
+    assert _splitCommandLine('cc "-DA=a b" \'-I x\'',True)==[
+        'cc','-DA=a b','-I x']
+    # windows keeps backslashes and only strips quotes around a whole arg
+    assert _splitCommandLine(r'cl "-IC:\my dir" -DA="b" /c x.c',False)==[
+        'cl',r'-IC:\my dir','-DA="b"','/c','x.c']
+
+def testUnterminatedQuote():
+    assert _splitCommandLine('cc "-DA=1 -DB',True)==['cc','"-DA=1','-DB']
+    assert _splitCommandLine('cc "-DA=1 -DB',False)==['cc','"-DA=1','-DB']
+    parsed=parseCompileCommand("cc -DA=it's -DB",'/')
+    assert parsed.defines==(('A',"it's"),('B','1'))
@@ -0,0 +1,70 @@
+"""
+Tests for incrementally re-parsing an edited document
+"""
+import random
+import warnings
+from ..cppDocument import ParsedCppDocument, TextEdit
+
+
+_base='''#include <stdio.h>
+#define A 1
+#define B (A+1)
+/* comment
+   int hidden(int x);
+*/
+typedef enum Color {
+    RED,
+    GREEN = 7,
+    BLUE = B
+} Color;
+int add(int a, int b);
+extern "C" {
+void foo(int x) {
+    if (x) {
+        bar();
+    }
+}
+}
+namespace ns {
+float baz(float y);
+}
+// int notfunc(int);
+typedef enum Mode { M0 = 3, M1 = UNKNOWN } Mode;
+'''
+_snippets=['/*','*/','{','}',';','\n','//','"a{"',' ','','x',
+    'int q(int z);','#define C 5\n','#undef A\n',
+    'typedef enum E2 { X=4, Y } E2;\n']
+
+def _results(doc:ParsedCppDocument):
+    return (doc.code,doc.enums,dict(doc.functions),doc.scopes)
+
+def _randomEdit(rng:random.Random,doc:ParsedCppDocument)->TextEdit:
+    lines=doc.text.split('\n')
+    startLine=rng.randrange(len(lines))
+    endLine=min(len(lines)-1,startLine+rng.choice([0,0,0,1,2]))
+    startCol=rng.randrange(len(lines[startLine])+1)
+    endCol=rng.randrange(len(lines[endLine])+1)
+    if endLine==startLine and endCol<startCol:
+        startCol,endCol=endCol,startCol
+    return TextEdit(startLine,startCol,endLine,endCol,rng.choice(_snippets))
+
+def testRandomEditsMatchFreshParse():
+    rng=random.Random(1234)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for _ in range(40):
+            doc=ParsedCppDocument(_base)
+            for _ in range(8):
+                doc.applyEdit(_randomEdit(rng,doc))
+                assert _results(doc)==_results(ParsedCppDocument(doc.text)),\
+                    repr(doc.text)
+
+def testEnumWarningsDoNotPrint(capsys):
+    # stdout may be the json-rpc pipe of a language server
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        doc=ParsedCppDocument(_base)
+        doc.applyEdit(TextEdit(0,0,0,0,'\n'))
+        assert doc.enums['Mode']['M1']=='UNKNOWN'
+    assert 'possible error parsing UNKNOWN' in str(caught[0].message)
+    assert capsys.readouterr().out==''
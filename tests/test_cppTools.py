@@ -0,0 +1,73 @@
+"""
+Tests for parsing c++ declarations and making legal names
+"""
+from .._cppTools import cppFunctionInfo, functionInfoCache, \
+    cppIsLeagalVarName, cppMakeLegalVarName, cppMakeLegalVarNames
+
+
+def testDeclarationSpellingsShareACacheEntry():
+    functionInfoCache.clear()
+    spellings=[
+        'void myfunc(int a,float b=10)',
+        'void   myfunc( int a , float b = 10 )',
+        'void myfunc (int a, float b =10)\n']
+    infos=[cppFunctionInfo(s) for s in spellings]
+    assert (functionInfoCache.hits,functionInfoCache.misses)==(2,1)
+    assert len(functionInfoCache)==1
+    assert infos[0]==infos[1]==infos[2]
+    assert infos[0].name=='myfunc'
+    assert infos[0].parametersDict()=={'a':('int',),'b':('float',10)}
+
+def testWhitespaceInLiteralsIsKept():
+    functionInfoCache.clear()
+    cppFunctionInfo('void f(const char* s="a  b")')
+    cppFunctionInfo('void f(const char* s="a b")')
+    assert len(functionInfoCache)==2
+
+def testMakeLegalVarName():
+    assert cppMakeLegalVarName(' foo-bar.baz ')=='foo_bar_baz'
+    assert cppMakeLegalVarName('2nd')=='number2nd'
+    assert cppMakeLegalVarName('caf\u00e9')=='caf_'
+    assert cppMakeLegalVarName('')=='X_'
+    assert cppMakeLegalVarName('int')=='int_'
+    assert cppMakeLegalVarName('_Foo')=='X_Foo'
+    assert cppMakeLegalVarName('__foo')=='X__foo'
+    assert cppMakeLegalVarName('_FOO1')=='X_FOO1'
+    assert cppMakeLegalVarName('_foo')=='_foo'
+
+def testIsLegalVarName():
+    assert cppIsLeagalVarName('foo_1')
+    assert not cppIsLeagalVarName('1foo')
+    assert not cppIsLeagalVarName('foo bar')
+    assert not cppIsLeagalVarName('class')
+    # reserved names are legal c, but are not left as-is when sanitizing
+    for name in ('_Foo','__foo','_'):
+        assert cppIsLeagalVarName(name)
+        assert not cppIsLeagalVarName(name,allowReserved=False)
+        assert cppMakeLegalVarName(name)!=name
+        assert cppMakeLegalVarNames([name])[name]!=name
+    assert cppIsLeagalVarName('_foo',allowReserved=False)
+
+def testMakeLegalVarNames():
+    names=['foo-bar','foo_bar','int','foo bar','int_','_Foo','X_Foo','']
+    result=cppMakeLegalVarNames(names)
+    assert result=={
+        'foo-bar':'foo_bar_2',
+        'foo_bar':'foo_bar',
+        'int':'int__2',
+        'foo bar':'foo_bar_3',
+        'int_':'int_',
+        '_Foo':'X_Foo_2',
+        'X_Foo':'X_Foo',
+        '':'X_'}
+    # unique, legal, reversible, and the same every time
+    assert len(set(result.values()))==len(names)
+    assert all([cppIsLeagalVarName(v,False) for v in result.values()])
+    assert {v:k for k,v in result.items()}=={
+        v:k for k,v in cppMakeLegalVarNames(names).items()}
+    # duplicates only appear once
+    assert cppMakeLegalVarNames(['a','a'])=={'a':'a'}
+
+def testMakeLegalVarNamesTaken():
+    assert cppMakeLegalVarNames(['foo','x','y-'],
+        taken=['foo','foo_2','y_'])=={'foo':'foo_3','x':'x','y-':'y__2'}
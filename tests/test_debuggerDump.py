@@ -0,0 +1,61 @@
+"""
+Tests for parsing gdb/lldb print output
+"""
+from ..debuggerDump import CPointer, parseDebuggerDump, parseDebuggerValue
+
+
+def testGdb():
+    dump=list(parseDebuggerDump(
+        '$1 = {a = 1, b = {c = 0x0, d = "hi"}, e = {0 <repeats 4 times>}}\n'
+        '$2 = -1.5\n'))
+    assert dump==[
+        ('$1',{'a':1,'b':{'c':0,'d':'hi'},'e':[0,0,0,0]}),
+        ('$2',-1.5)]
+
+def testGdbCharArraysAndPointers():
+    assert parseDebuggerValue(
+        '{name = "ab", \'\\000\' <repeats 3 times>, p = 0x601040 <global>, '
+        's = 0x4006f4 "abc", fl = (RED | BLUE)}')=={
+        'name':'ab\0\0\0',
+        'p':CPointer(0x601040,'global',None),
+        's':CPointer(0x4006f4,None,'abc'),
+        'fl':'RED | BLUE'}
+    assert parseDebuggerValue('(int *) 0x7ffe0')==CPointer(0x7ffe0)
+
+def testLldb():
+    dump=list(parseDebuggerDump(
+        '(Foo) foo = {\n'
+        '  a = 1\n'
+        '  arr = ([0] = 1, [1] = 2)\n'
+        '  inner = {\n'
+        '    x = 3\n'
+        '  }\n'
+        '}\n'
+        '(int) n = 4\n'))
+    assert dump==[
+        ('foo',{'a':1,'arr':[1,2],'inner':{'x':3}}),
+        ('n',4)]
+
+def testSummaries():
+    # pretty-printer summaries before a container
+    assert parseDebuggerValue(
+        '{v = std::vector of length 2, capacity 2 = {1, 2}, n = 3}'
+        )=={'v':[1,2],'n':3}
+    assert parseDebuggerValue(
+        '$2 = std::vector of length 2, capacity 2 = {1, 2}')==[1,2]
+    assert parseDebuggerValue(
+        '$3 = std::map with 2 elements = {[1] = 2, [3] = 4}')==[2,4]
+    assert parseDebuggerValue(
+        '(std::vector<int>) v = size=2 {\n  [0] = 1\n  [1] = 2\n}')==[1,2]
+    # and without a container
+    assert parseDebuggerValue(
+        '$5 = std::vector of length 0, capacity 0'
+        )=='std::vector of length 0, capacity 0'
+    assert parseDebuggerValue(
+        '{v = std::vector of length 0, capacity 0, n = 3}'
+        )=={'v':'std::vector of length 0, capacity 0','n':3}
+
+def testChunkedInput():
+    text='$1 = {a = 1, b = 2}\n$2 = 3\n'
+    chunks=[text[i:i+3] for i in range(0,len(text),3)]
+    assert list(parseDebuggerDump(chunks))==list(parseDebuggerDump(text))
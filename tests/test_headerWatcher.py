@@ -0,0 +1,91 @@
+"""
+Tests for watching a tree of headers
+"""
+import os
+import sys
+import time
+import threading
+import pytest
+from ..headerWatcher import HeaderTreeWatcher
+
+
+_modes=[True]
+if sys.platform.startswith('linux'):
+    _modes.append(False)
+
+def _waitFor(condition,timeout:float=10.0)->bool:
+    end=time.monotonic()+timeout
+    while not condition():
+        if time.monotonic()>end:
+            return False
+        time.sleep(0.02)
+    return True
+
+def _write(filename,text:str)->None:
+    with open(filename,'w',encoding='utf-8') as f:
+        f.write(text)
+
+@pytest.mark.parametrize('usePolling',_modes)
+def testPicksUpChanges(tmp_path,usePolling):
+    _write(tmp_path/'a.h','#define A 1\n')
+    with HeaderTreeWatcher(str(tmp_path),usePolling=usePolling,
+            pollInterval=0.05) as watcher:
+        assert watcher.usingInotify==(not usePolling)
+        assert watcher.waitUntilIdle(10)
+        assert watcher.lookupConstant('A')==1
+        os.mkdir(tmp_path/'sub')
+        _write(tmp_path/'sub'/'b.h',
+            '#pragma once\ntypedef enum B { B0=5, B1 } B;\n')
+        assert _waitFor(lambda:watcher.lookupConstant('B1',None)==6)
+        assert watcher.findHeader('sub/b.h')==str(tmp_path/'sub'/'b.h')
+        os.remove(tmp_path/'a.h')
+        assert _waitFor(lambda:watcher.lookupConstant('A',None) is None)
+
+@pytest.mark.parametrize('usePolling',_modes)
+def testCallbacksCanUseTheWatcher(tmp_path,usePolling):
+    # onChange must not be called with the lock held, or this
+    # (or anything else that waits on another thread) would deadlock
+    _write(tmp_path/'a.h','#define A 1\n')
+    finished=[]
+    def onChange(filename):
+        other=threading.Thread(target=lambda:watcher.headers)
+        other.start()
+        other.join(5)
+        finished.append((filename,not other.is_alive()))
+    watcher=HeaderTreeWatcher(str(tmp_path),usePolling=usePolling,
+        pollInterval=0.05,onChange=onChange)
+    with watcher:
+        assert _waitFor(lambda:len(finished)==1)
+        os.remove(tmp_path/'a.h')
+        assert _waitFor(lambda:len(finished)==2)
+    filename=str(tmp_path/'a.h')
+    assert finished==[(filename,True),(filename,True)]
+
+def testStopFromCallback(tmp_path):
+    _write(tmp_path/'a.h','#define A 1\n')
+    watcher=HeaderTreeWatcher(str(tmp_path),usePolling=True,
+        pollInterval=0.05)
+    watcher.onChange=lambda filename:watcher.stop()
+    watcher.start()
+    os.remove(tmp_path/'a.h')
+    assert _waitFor(lambda:not watcher.watching)
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'),reason='inotify')
+def testStopWithoutWaiting(tmp_path):
+    watcher=HeaderTreeWatcher(str(tmp_path),usePolling=False)
+    watcher.start()
+    # pylint: disable=protected-access
+    inotify=watcher._inotify
+    thread=watcher._thread
+    watcher.stop(wait=False)
+    # the watch thread closes the inotify fd once it wakes up
+    thread.join(5)
+    assert not thread.is_alive()
+    assert inotify.fd==-1
+    # and restarting right away doesn't revive the old thread
+    watcher.start()
+    assert watcher.watching
+    watcher.stop(wait=False)
+    watcher.start()
+    watcher.stop()
+    assert not watcher.watching
@@ -0,0 +1,66 @@
+"""
+Tests for the opt-in instrumentation
+"""
+import pytest
+from ..instrumentation import currentLabel, instrumented, profiling
+
+
+@instrumented('test.labelled',labelArg='filename')
+def _labelled(filename:str):
+    for i in range(3):
+        yield (i,currentLabel.get())
+
+@instrumented('test.echo')
+def _echo():
+    received=[]
+    try:
+        while True:
+            value=yield len(received)
+            received.append(value)
+    except KeyError:
+        yield ('caught',received)
+
+@instrumented('test.nested',labelArg=0)
+def _nested(filename:str):
+    return list(_labelled('inner.h'))+[(None,currentLabel.get())]
+
+
+def testGeneratorLabelOnlyWhileRunning():
+    with profiling() as counters:
+        gen=_labelled('a.h')
+        assert next(gen)==(0,'a.h')
+        # the caller's code between resumes is not labelled
+        assert currentLabel.get()==''
+        other=_labelled('b.h')
+        assert next(other)==(0,'b.h')
+        assert next(gen)==(1,'a.h')
+        assert currentLabel.get()==''
+        assert list(gen)==[(2,'a.h')]
+        other.close()
+        assert currentLabel.get()==''
+    assert counters.counters[('test.labelled','a.h')].calls==1
+    assert counters.counters[('test.labelled','b.h')].calls==1
+
+def testGeneratorSendAndThrow():
+    with profiling():
+        gen=_echo()
+        assert next(gen)==0
+        assert gen.send('x')==1
+        assert gen.send('y')==2
+        assert gen.throw(KeyError('k'))==('caught',['x','y'])
+        with pytest.raises(StopIteration):
+            next(gen)
+
+def testNestedLabels():
+    with profiling() as counters:
+        assert _nested('outer.c')==[(0,'inner.h'),(1,'inner.h'),
+            (2,'inner.h'),(None,'outer.c')]
+        assert currentLabel.get()==''
+    assert ('test.labelled','inner.h') in counters.counters
+    assert ('test.nested','outer.c') in counters.counters
+
+def testDisabled():
+    assert list(_labelled('a.h'))==[(0,''),(1,''),(2,'')]
+    gen=_echo()
+    next(gen)
+    assert gen.send('x')==1
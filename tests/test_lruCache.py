@@ -0,0 +1,40 @@
+"""
+Tests for the least-recently-used cache
+"""
+import pytest
+from ..lruCache import LruCache
+
+
+def testEvictsLeastRecentlyUsed():
+    cache:LruCache[str,int]=LruCache(2)
+    cache.put('a',1)
+    cache.put('b',2)
+    assert cache.get('a')==1 # now "b" is the oldest
+    cache.put('c',3)
+    assert len(cache)==2
+    assert 'b' not in cache
+    assert cache.get('a')==1 and cache.get('c')==3
+    # re-putting an item also refreshes it
+    cache.put('a',10)
+    cache.put('d',4)
+    assert 'c' not in cache
+    assert cache.get('a')==10
+
+def testHitsAndMisses():
+    cache:LruCache[str,int]=LruCache(4)
+    assert cache.hitRate is None
+    calls=[]
+    def compute():
+        calls.append(1)
+        return 42
+    assert cache.getOrCompute('x',compute)==42
+    assert cache.getOrCompute('x',compute)==42
+    assert cache.get('missing','default')=='default'
+    assert len(calls)==1
+    assert (cache.hits,cache.misses)==(1,2)
+    cache.clear()
+    assert len(cache)==0 and (cache.hits,cache.misses)==(0,0)
+
+def testSizeMustBePositive():
+    with pytest.raises(ValueError):
+        LruCache(0)
@@ -0,0 +1,166 @@
+"""
+Tests for macro expansion, mostly the examples from
+the c standard (C11 6.10.3.5)
+"""
+from ..macros import MacroTable, tokenizePreprocessor
+from ..preprocessor import evaluateCValue
+from ..cEnums import parseCEnums
+
+
+def _table(defines:str)->MacroTable:
+    """
+    create a macro table from lines of #defines
+    """
+    macros=MacroTable()
+    for line in defines.strip().split('\n'):
+        directive,args=line[1:].split(None,1)
+        if directive=='undef':
+            macros.undefine(args)
+        else:
+            macros.define(args)
+    return macros
+
+def _assertExpands(macros:MacroTable,code:str,expected:str)->None:
+    """
+    compare tokens so that whitespace differences don't matter
+    """
+    assert tokenizePreprocessor(macros.expand(code))==\
+        tokenizePreprocessor(expected),macros.expand(code)
+
+
+_example3=_table(r"""
+#define x 3
+#define f(a) f(x * (a))
+#undef x
+#define x 2
+#define g f
+#define z z[0]
+#define h g(~
+#define m(a) a(w)
+#define w 0,1
+#define t(a) a
+#define p() int
+#define q(x) x
+#define r(x,y) x ## y
+#define str(x) # x
+""")
+
+def testExample3():
+    _assertExpands(_example3,
+        'f(y+1) + f(f(z)) % t(t(g)(0) + t)(1);',
+        'f(2 * (y+1)) + f(2 * (f(2 * (z[0])))) % f(2 * (0)) + t(1);')
+    _assertExpands(_example3,
+        'g(x+(3,4)-w) | h 5) & m\n(f)^m(m);',
+        'f(2 * (2+(3,4)-0,1)) | f(2 * (~ 5)) & f(2 * (0,1))^m(0,1);')
+    _assertExpands(_example3,
+        'p() i[q()] = { q(1), r(2,3), r(4,), r(,5), r(,) };',
+        'int i[] = { 1, 23, 4, 5, };')
+    _assertExpands(_example3,
+        'char c[2][6] = { str(hello), str() };',
+        'char c[2][6] = { "hello", "" };')
+
+def testUnfinishedInvocationIsNotMemoized():
+    # "h" expands to an unfinished "f(~" which must take its
+    # arguments from what follows, every time
+    _assertExpands(_example3,'h 5) h 6)','f(2 * (~ 5)) f(2 * (~ 6))')
+    _assertExpands(_example3,'h 7)','f(2 * (~ 7))')
+    # and with nothing to finish it, it is left alone
+    _assertExpands(_example3,'h','f(~')
+
+def testExample4():
+    macros=_table(r"""
+#define str(s) # s
+#define xstr(s) str(s)
+#define debug(s, t) printf("x" # s "= %d, x" # t "= %s", x ## s, x ## t)
+#define INCFILE(n) vers ## n
+#define glue(a, b) a ## b
+#define xglue(a, b) glue(a, b)
+#define HIGHLOW "hello"
+#define LOW LOW ", world"
+""")
+    _assertExpands(macros,'debug(1, 2);',
+        'printf("x" "1" "= %d, x" "2" "= %s", x1, x2);')
+    _assertExpands(macros,
+        r"""fputs(str(strncmp("abc\0d", "abc", '\4') == 0) str(: @\n), s);""",
+        r"""fputs("strncmp(\"abc\\0d\", \"abc\", '\\4') == 0" ": @\n", s);""")
+    _assertExpands(macros,'xstr(INCFILE(2).h)','"vers2.h"')
+    _assertExpands(macros,'glue(HIGH, LOW);','"hello";')
+    _assertExpands(macros,'xglue(HIGH, LOW)','"hello" ", world"')
+
+def testExample5():
+    macros=_table('#define t(x,y,z) x ## y ## z')
+    _assertExpands(macros,
+        'int j[] = { t(1,2,3), t(,4,5), t(6,,7), t(8,9,), '
+        't(10,,), t(,11,), t(,,12), t(,,) };',
+        'int j[] = { 123, 45, 67, 89, 10, 11, 12, };')
+
+def testExample7():
+    macros=_table(r"""
+#define debug(...) fprintf(stderr, __VA_ARGS__)
+#define showlist(...) puts(#__VA_ARGS__)
+#define report(test, ...) ((test)?puts(#test): printf(__VA_ARGS__))
+""")
+    _assertExpands(macros,'debug("Flag");','fprintf(stderr, "Flag");')
+    _assertExpands(macros,r'debug("X = %d\n", x);',
+        r'fprintf(stderr, "X = %d\n", x);')
+    _assertExpands(macros,'showlist(The first, second, and third items.);',
+        'puts("The first, second, and third items.");')
+    _assertExpands(macros,'report(x>y, "x is %d but y is %d", x, y);',
+        '((x>y)?puts("x>y"): printf("x is %d but y is %d", x, y));')
+
+def testUnmatchedOuterParentheses():
+    # the first "(" does not close at the end, so they must stay
+    assert evaluateCValue('(1<<3)|(1<<4)')==24
+    assert evaluateCValue('((1<<3)|(1<<4))')==24
+    assert evaluateCValue('(2)*(3)+(4)')==10
+
+def testParenthesizedMacros():
+    macros=_table(r"""
+#define A 3
+#define B 4
+#define MAX(a,b) ((a)>(b)?(a):(b))
+#define D MAX(A,B)
+#define E (A)|(B)
+""")
+    assert evaluateCValue('D',macros)==4
+    assert evaluateCValue('E',macros)==7
+    assert evaluateCValue('(A)*(B)',macros)==12
+    enums=parseCEnums("""
+#define A 3
+#define B 4
+typedef enum X { P=(1<<3)|(1<<4), Q=(A)*(B), R } X;
+""")
+    assert enums['X']=={'P':24,'Q':12,'R':13}
+
+def _chain(depth:int,reverse:bool=False)->str:
+    """
+    "#define A0 (A1+1)" ... "#define A{depth} 0"
+    """
+    lines=[f'#define A{i} (A{i+1}+1)' for i in range(depth)]
+    lines.append(f'#define A{depth} 0')
+    if reverse:
+        lines.reverse()
+    return '\n'.join(lines)
+
+def testDeepChains():
+    for reverse in (False,True):
+        macros=_table(_chain(900,reverse))
+        assert macros.expand('A0')=='('*900+'0'+'+1)'*900
+        enums=parseCEnums(_chain(100,reverse))[None]
+        assert all([enums[f'A{i}']==100-i for i in range(101)])
+    macros=_table('#define F(x) (x+1)')
+    assert evaluateCValue('F('*300+'0'+')'*300,macros)==300
+
+def testMemoHitsAcrossChain():
+    macros=_table(_chain(50))
+    macros.expand('A0')
+    misses=macros._memo.misses # pylint: disable=protected-access
+    assert macros.expand('A1')=='('*49+'0'+'+1)'*49
+    assert macros._memo.misses==misses # pylint: disable=protected-access
+
+def testMemoIsBounded():
+    macros=MacroTable(memoSize=4)
+    macros.define('F(x) [x]')
+    for i in range(20):
+        _assertExpands(macros,f'F({i})',f'[{i}]')
+    assert len(macros._memo)==4 # pylint: disable=protected-access
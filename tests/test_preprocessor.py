@@ -0,0 +1,97 @@
+"""
+Tests for resolving #if regions and evaluating #if expressions
+"""
+import pytest
+from ..preprocessor import PreprocessorError, preprocessConditionals, \
+    evaluatePreprocessorExpression
+from ..compileCommands import CompileCommand
+
+
+_code="""#if VERSION>=3
+three
+#elif VERSION==2
+two
+#elif defined(VERSION)
+one
+#else
+none
+#endif
+"""
+
+def _live(code:str,defines=None)->list:
+    """
+    the non-empty live lines
+    """
+    return [line for line in preprocessConditionals(code,defines) if line]
+
+def testIfElifElse():
+    assert _live(_code,{'VERSION':'4'})==['three']
+    assert _live(_code,{'VERSION':'2'})==['two']
+    assert _live(_code,{'VERSION':'1'})==['one']
+    assert _live(_code)==['none']
+
+def testNested():
+    code="""#ifdef A
+    #ifndef B
+        a
+    #else
+        ab
+    #endif
+#elif 1
+    #if 1
+        dead parent
+    #endif
+    notA
+#endif
+"""
+    assert _live(code,{'A':''})==['        a']
+    assert _live(code,{'A':'','B':''})==['        ab']
+    assert _live(code)==['        dead parent','    notA']
+
+def testDefinesInLiveRegions():
+    code="""#define X 1 /* comment */
+#if 0
+#define Y 1
+#endif
+#undef Z
+#if defined(X) && !defined(Y) && !defined(Z)
+yes
+#endif
+"""
+    assert _live(code,{'Z':'1'})==['#define X 1 ','#undef Z','yes']
+
+def testKeepLineNumbers():
+    lines=list(preprocessConditionals(_code,{'VERSION':'2'},
+        keepLineNumbers=True))
+    assert lines.index('two')==3
+    assert len(lines)==len(_code.split('\n'))
+
+def testCompileCommandDefines():
+    cc=CompileCommand('gcc -DA -DB=2 -UA "-DC=x y" -D D=4 -UD -DD','/')
+    assert cc.defines=={'B':'2','C':'x y','D':'1'}
+    code="""#ifdef A
+a
+#elif B==2 && D
+b
+#endif
+"""
+    assert _live(code,cc)==['b']
+
+def testErrors():
+    with pytest.raises(PreprocessorError,match='Missing #endif'):
+        _live('#if 1\n')
+    with pytest.raises(PreprocessorError,match='Unexpected #else'):
+        _live('#if 1\n#else\n#else\n#endif\n')
+    with pytest.raises(PreprocessorError) as e:
+        _live('\n\n#endif\n')
+    assert e.value.lineNumber==3
+
+def testIntmaxArithmetic():
+    assert evaluatePreprocessorExpression('-1>0u')==1
+    assert evaluatePreprocessorExpression('0xffffffffffffffff==-1')==1
+    assert evaluatePreprocessorExpression('-7/2')==-3
+    assert evaluatePreprocessorExpression('-7%3')==-1
+    assert evaluatePreprocessorExpression('~0u>>63')==1
+    assert evaluatePreprocessorExpression('X>2 ? X : 0',{'X':'3'})==3
+    # unknown function-like things, eg __has_include(), are 0
+    assert evaluatePreprocessorExpression('__has_include(<a.h>)')==0
@@ -0,0 +1,52 @@
+"""
+Tests for decoding and encoding c escape sequences
+"""
+import pytest
+from ..stdio import decodeCEscapeSequences, decodeCEscapeSequencesBytes, \
+    encodeCEscapeSequences, sprintf
+
+
+def testDecode():
+    assert decodeCEscapeSequences(r'a\tb\n\\\"\'\?\e')=='a\tb\n\\"\'?\x1b'
+    assert decodeCEscapeSequences(r'\101\0\1234')=='A\0S4'
+    assert decodeCEscapeSequences(r'\x41\x0001')=='A\x01'
+    assert decodeCEscapeSequences(r'é\U0001F600')=='é\U0001F600'
+    # unknown escapes are just the character, a trailing \ is kept
+    assert decodeCEscapeSequences('\\q\\')=='q\\'
+    assert decodeCEscapeSequences('no escapes')=='no escapes'
+
+def testDecodeOutOfRange():
+    with pytest.raises(ValueError,match=r'\\x110000'):
+        decodeCEscapeSequences(r'\x110000')
+    with pytest.raises(ValueError,match=r'\\U00110000'):
+        decodeCEscapeSequences(r'\U00110000')
+    with pytest.raises(ValueError,match=r'\\x100'):
+        decodeCEscapeSequencesBytes(r'\x100')
+    with pytest.raises(ValueError,match=r'\\ud800'):
+        decodeCEscapeSequencesBytes(r'\ud800')
+
+def testDecodeBytes():
+    assert decodeCEscapeSequencesBytes(r'\xff\xfe\n')==b'\xff\xfe\n'
+    assert decodeCEscapeSequencesBytes(r'é')==b'\xc3\xa9'
+    assert decodeCEscapeSequencesBytes(r'é','latin-1')==b'\xe9'
+    assert decodeCEscapeSequencesBytes(b'\\101')==b'A'
+
+def testEncode():
+    assert encodeCEscapeSequences('say "hi"\n')==r'say \"hi\"\n'
+    # octal escapes are always 3 digits so a following digit is safe
+    assert encodeCEscapeSequences('\x011')==r'\0011'
+    assert encodeCEscapeSequences('é')=='é'
+    assert encodeCEscapeSequences('é\U0001F600',asciiOnly=True)==\
+        r'\u00e9\U0001f600'
+    assert encodeCEscapeSequences(b'\xff\x00')==r'\377\000'
+
+def testRoundTrip():
+    text=''.join([chr(i) for i in range(0x300)])+'\U0001F600'
+    assert decodeCEscapeSequences(encodeCEscapeSequences(text))==text
+    assert decodeCEscapeSequences(
+        encodeCEscapeSequences(text,asciiOnly=True))==text
+    data=bytes(range(256))
+    assert decodeCEscapeSequencesBytes(encodeCEscapeSequences(data))==data
+
+def testSprintf():
+    assert sprintf(r'%d problems\t"%s"\n',99,'x')=='99 problems\t"x"\n'